@@ -0,0 +1,72 @@
+"""Memory per core of a 100k-core library, loaded as Core tuples and in a
+fondue.core.catalog.Catalog.
+
+The synthetic cores look like what 'fondue core init' writes: a VLNV, the
+core's Verilog file and, for a third of them, a Verilator test bench. Their
+strings are all distinct objects, as they are when parsed from separate
+files. Each measurement runs in a fresh interpreter and counts the memory
+still allocated (tracemalloc) once the cores are loaded.
+
+    python benchmarks/bench_catalog_memory.py [<count>]
+"""
+import os
+import subprocess
+import sys
+import tracemalloc
+
+# fondue itself, when run from a checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+COUNT = 100_000
+
+
+def _text(value):
+    # A new string object, like the YAML loader makes for every file
+    return ''.join(list(value))
+
+
+def synthetic_cores(count):
+    from fondue.core.loader import Core, Vlnv
+    from fondue.resolver import parse_dependency
+    for i in range(count):
+        name = f'core{i}'
+        files = {_text('common'): (_text(f'{name}.v'),)}
+        if i % 3 == 0:
+            files[_text('sim')] = (_text('verilator-main.cpp'),
+                                   _text(f'{name}.h'))
+        depends = ((parse_dependency(f'core{i // 2} >=1.0'),) if i else ())
+        yield Core(Vlnv(_text('acme'), _text(f'lib{i % 20}'), _text(name),
+                        _text(f'1.{i % 7}')),
+                   files, f'/libraries/acme/lib{i % 20}/{name}/{name}.ffc',
+                   depends)
+
+
+def measure(kind, count):
+    from fondue.core.catalog import Catalog
+    tracemalloc.start()
+    if kind == 'tuples':
+        cores = list(synthetic_cores(count))
+    else:
+        cores = Catalog(synthetic_cores(count))
+    (current, _) = tracemalloc.get_traced_memory()
+    assert len(cores) == count
+    return current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else COUNT
+    print(f"{'storage':>10} {'total':>12} {'per core':>10}")
+    for kind in ('tuples', 'catalog'):
+        result = subprocess.run(
+            [sys.executable, __file__, kind, str(count)],
+            capture_output=True, text=True, check=True)
+        size = int(result.stdout)
+        print(f"{kind:>10} {size / 2**20:>9.1f}MiB {size / count:>8.0f} B")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        print(measure(sys.argv[1], int(sys.argv[2])))
+    else:
+        main()
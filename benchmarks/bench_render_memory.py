@@ -0,0 +1,64 @@
+"""Peak memory of TemplateRepo.render_template as the output grows.
+
+Each measurement runs in a fresh interpreter so that peak RSS is not
+inherited from earlier runs. With streaming (the default) peak RSS should
+stay flat; with stream=False it grows with the size of the output.
+
+    python benchmarks/bench_render_memory.py
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+# fondue itself, when run from a checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+# A register map, one line per register, about 60 bytes each
+SOURCE = (
+    "// {{ name }}\n"
+    "{% for i in registers %}"
+    "localparam [31:0] {{ name }}_reg{{ i }} = 32'h{{ '%08x' % i }};\n"
+    "{% endfor %}"
+)
+
+
+def measure(count, stream):
+    import jinja2
+    from fondue.templates import Template, TemplateRepo
+
+    repo = TemplateRepo('core_init/default')
+    template = Template(repo, jinja2.Environment().from_string(SOURCE))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'regs.v')
+        arguments = {'name': 'regs', 'registers': range(count)}
+        repo.render_template(template, path, arguments, stream=stream)
+        size = os.path.getsize(path)
+    # ru_maxrss is in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return size, peak
+
+
+def main():
+    print(f"{'output':>12} {'stream':>12} {'render':>12}")
+    for count in SIZES:
+        row = []
+        for stream in (True, False):
+            result = subprocess.run(
+                [sys.executable, __file__, str(count), str(int(stream))],
+                capture_output=True, text=True, check=True)
+            size, peak = map(int, result.stdout.split())
+            row.append(peak)
+        print(f"{size / 2**20:>9.1f}MiB "
+              f"{row[0] / 1024:>9.1f}MiB {row[1] / 1024:>9.1f}MiB")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        print(*measure(int(sys.argv[1]), bool(int(sys.argv[2]))))
+    else:
+        main()
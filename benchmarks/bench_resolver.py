@@ -0,0 +1,58 @@
+"""Time fondue.resolver.Resolver on synthetic dependency graphs.
+
+Every core has several versions, and each version depends on a few
+lower-numbered cores through a version range around its own version, the
+way newer releases of a library usually need newer releases of what it
+builds on. A tenth of the cores are required by a single top-level core.
+
+    python benchmarks/bench_resolver.py [<cores>]
+"""
+import os
+import random
+import sys
+import time
+
+# fondue itself, when run from a checkout
+sys.path.insert(0, os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+from fondue.core.loader import Core, Vlnv  # noqa: E402
+from fondue.resolver import Resolver, parse_dependency  # noqa: E402
+
+VERSIONS = 6
+DEPENDS = 3
+
+
+def make_library(count, seed=0):
+    rng = random.Random(seed)
+    cores = []
+    for i in range(count):
+        for v in range(1, VERSIONS + 1):
+            depends = []
+            for j in sorted(rng.sample(range(i), min(i, DEPENDS))):
+                # Newer versions want newer dependencies, within a window
+                low = max(1, v - rng.randint(1, 3))
+                high = min(VERSIONS, v + rng.randint(0, 2)) + 1
+                depends.append(parse_dependency(
+                    f'lib:cores:c{j} >={low}.0,<{high}.0'))
+            cores.append(Core(Vlnv('lib', 'cores', f'c{i}', f'{v}.0'), {},
+                              f'c{i}-{v}.ffc', tuple(depends)))
+    root = Core(Vlnv('lib', 'cores', 'top', '1.0'), {}, 'top.ffc',
+                tuple(parse_dependency(f'c{i}')
+                      for i in range(count - count // 10, count)))
+    return cores, root
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    cores, root = make_library(count)
+    start = time.perf_counter()
+    resolver = Resolver(cores)
+    selected = resolver.resolve([root])
+    elapsed = time.perf_counter() - start
+    print(f"{count} cores x {VERSIONS} versions: resolved {len(selected)} "
+          f"cores in {elapsed * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
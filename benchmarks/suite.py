@@ -0,0 +1,525 @@
+"""Benchmarks for fondue's hot paths, with stored baselines.
+
+Each benchmark is set up once, run once to warm up, and then timed
+--repeat times; the best time per call is what gets compared, as it is the
+least noisy. Fast benchmarks are run several times per measurement.
+
+    python benchmarks/suite.py                      # run everything
+    python benchmarks/suite.py -k render            # only matching names
+    python benchmarks/suite.py --save out.json      # record a baseline
+    python benchmarks/suite.py --compare base.json  # report regressions
+
+--compare exits with status 1 if any benchmark got slower than
+--threshold. Baselines are only meaningful on the machine which recorded
+them; benchmarks/baselines/ holds the reference ones. --scale shrinks (or
+grows) the large synthetic scenarios, e.g. --scale 0.1 for a quick run;
+--compare refuses a baseline recorded with another --scale.
+"""
+import argparse
+import contextlib
+import fnmatch
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# The benchmarks' helpers, and fondue itself when run from a checkout
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_ROOT = os.path.dirname(_HERE)
+sys.path.insert(0, _HERE)
+sys.path.insert(0, _ROOT)
+
+from fondue import __version__  # noqa: E402
+
+# name -> (factory, repeat); factory(directory, scale) sets up a benchmark
+# in a scratch directory and returns the function to time
+BENCHMARKS = {}
+
+_MIN_MEASUREMENT = 0.05
+
+
+def benchmark(name, repeat=5):
+    def register(factory):
+        BENCHMARKS[name] = (factory, repeat)
+        return factory
+    return register
+
+
+def _fresh(directory):
+    """Names of new subdirectories of `directory`, one per call."""
+    count = iter(range(sys.maxsize))
+    return lambda: os.path.join(directory, f'run{next(count)}')
+
+
+def _fondue(*argv):
+    command = [sys.executable, '-c', 'import fondue.main; fondue.main.main()']
+    command.extend(argv)
+    # The same fondue as this process, from wherever the suite is run
+    path = os.environ.get('PYTHONPATH')
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        [_ROOT] + ([path] if path else [])))
+    return lambda: subprocess.run(command, check=True, env=env,
+                                  stdout=subprocess.DEVNULL)
+
+
+@benchmark('cli.help', repeat=10)
+def cli_help(directory, scale):
+    return _fondue('--help')
+
+
+@benchmark('cli.core_help', repeat=10)
+def cli_core_help(directory, scale):
+    return _fondue('core', '--help')
+
+
+@benchmark('templates.repo')
+def templates_repo(directory, scale):
+    import fondue.templates
+
+    def run():
+        # Start from nothing but the on-disk caches, like a new process
+        fondue.templates._environments.clear()
+        fondue.templates.template_index.cache_clear()
+        fondue.templates.TemplateRepo('core_init/default')
+    return run
+
+
+@benchmark('templates.get_templates')
+def templates_get(directory, scale):
+    import fondue.templates
+    repo = fondue.templates.TemplateRepo('core_init/default')
+    return lambda: (repo.get_templates('default'),
+                    repo.get_templates('verilator'))
+
+
+def _init_args(name, template=None, sim_tool=None, directory=None):
+    return {'name': name, 'vendor': 'acme', 'library': 'bench',
+            'version': '1.0', 'template': template, 'sim_tool': sim_tool,
+            'directory': directory}
+
+
+def _render(template, sim_tool):
+    def factory(directory, scale):
+        from fondue.core import init
+        args = _init_args('bench', template, sim_tool)
+        templates = init._gather_templates(args)
+        target = _fresh(directory)
+
+        def run():
+            path = target()
+            os.mkdir(path)
+            init._render_templates(templates, args, path)
+        return run
+    return factory
+
+
+def _register_renders():
+    from fondue.templates import list_templates, list_tools
+    for template in [None] + list_templates('core_init'):
+        for sim_tool in [None] + list_tools('core_init'):
+            name = f'render.{template or "default"}.{sim_tool or "none"}'
+            benchmark(name)(_render(template, sim_tool))
+
+
+_register_renders()
+
+
+@benchmark('core.session_render')
+def core_session_render(directory, scale):
+    from fondue.core.init import CoreSession
+    session = CoreSession(sim_tool='verilator')
+    return lambda: session.render('bench', vendor='acme', library='bench',
+                                  version='1.0')
+
+
+@benchmark('core.init')
+def core_init(directory, scale):
+    from fondue.core import init
+    target = _fresh(directory)
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            init.run(_init_args('bench', sim_tool='verilator',
+                                directory=target()))
+    return run
+
+
+def _write_library(root, count):
+    for i in range(count):
+        path = os.path.join(root, f'group{i % 100}', f'core{i}')
+        os.makedirs(path)
+        with open(os.path.join(path, f'core{i}.ffc'), 'w') as f:
+            f.write(f'vlnv:\n  vendor: acme\n  library: bench\n'
+                    f'  name: core{i}\n  version: "1.{i % 7}"\n'
+                    f'files:\n  common: core{i}.v\n')
+
+
+@benchmark('index.scan_10k', repeat=3)
+def index_scan(directory, scale):
+    from fondue.core.index import CoreIndex
+    root = os.path.join(directory, 'library')
+    _write_library(root, int(10000 * scale))
+    target = _fresh(directory)
+
+    def run():
+        with CoreIndex(target() + '.sqlite') as index:
+            index.scan([root])
+    return run
+
+
+@benchmark('index.rescan_10k')
+def index_rescan(directory, scale):
+    from fondue.core.index import CoreIndex
+    root = os.path.join(directory, 'library')
+    _write_library(root, int(10000 * scale))
+    path = os.path.join(directory, 'index.sqlite')
+    with CoreIndex(path) as index:
+        index.scan([root])
+
+    def run():
+        with CoreIndex(path) as index:
+            index.scan([root])
+    return run
+
+
+_VERILOG_SOURCE = '''
+module {name} #(parameter W = 8) (input clk, input rst, output [W-1:0] q);
+  // Count, and pass the count through the previous module
+  reg [W-1:0] count;
+  always @(posedge clk) begin
+    if (rst) count <= {{W{{1'b0}}}}; else count <= count + 1'b1;
+  end
+  {child} #(.W(W)) u_child (.clk(clk), .rst(rst), .q(q));
+endmodule
+'''
+
+
+def _write_sources(root, count, modules_per_file=20):
+    for i in range(count):
+        path = os.path.join(root, f'core{i}')
+        os.makedirs(path)
+        with open(os.path.join(path, f'core{i}.ffc'), 'w') as f:
+            f.write(f'vlnv:\n  name: core{i}\n  version: "1.0"\n'
+                    f'files:\n  common: core{i}.v\n')
+        with open(os.path.join(path, f'core{i}.v'), 'w') as f:
+            for j in range(modules_per_file):
+                f.write(_VERILOG_SOURCE.format(name=f'm{i}_{j}',
+                                               child=f'm{i}_{j - 1}'))
+
+
+@benchmark('hdl.scan_1mb')
+def hdl_scan(directory, scale):
+    from fondue.hdl import scan_file
+    _write_sources(directory, 1, modules_per_file=int(3000 * scale))
+    path = os.path.join(directory, 'core0', 'core0.v')
+    return lambda: scan_file(path)
+
+
+@benchmark('index.sources_2k', repeat=3)
+def index_sources(directory, scale):
+    from fondue.core.index import CoreIndex
+    root = os.path.join(directory, 'library')
+    _write_sources(root, int(2000 * scale))
+    target = _fresh(directory)
+
+    def run():
+        with CoreIndex(target() + '.sqlite') as index:
+            index.scan([root])
+            index.scan_sources()
+    return run
+
+
+@benchmark('index.rescan_sources_2k')
+def index_rescan_sources(directory, scale):
+    from fondue.core.index import CoreIndex
+    root = os.path.join(directory, 'library')
+    _write_sources(root, int(2000 * scale))
+    path = os.path.join(directory, 'index.sqlite')
+    with CoreIndex(path) as index:
+        index.scan([root])
+        index.scan_sources()
+
+    def run():
+        with CoreIndex(path) as index:
+            index.scan_sources()
+    return run
+
+
+@benchmark('core.init_batch_500', repeat=3)
+def core_init_batch(directory, scale):
+    from fondue.core import init_batch
+    target = _fresh(directory)
+    count = int(500 * scale)
+
+    def run():
+        base = target()
+        init_batch.run([_init_args(f'core{i}', sim_tool='verilator',
+                                   directory=os.path.join(base, f'core{i}'))
+                        for i in range(count)])
+    return run
+
+
+@benchmark('store.checkout_500')
+def store_checkout(directory, scale):
+    from fondue.core.store import CoreStore
+    core = os.path.join(directory, 'core')
+    os.makedirs(core)
+    with open(os.path.join(core, 'big.ffc'), 'w') as f:
+        f.write('vlnv:\n  name: big\n  version: "1.0"\n')
+    for i in range(int(500 * scale)):
+        with open(os.path.join(core, f'file{i}.v'), 'w') as f:
+            f.write(_VERILOG_SOURCE.format(name=f'm{i}', child='leaf') * 10)
+    store = CoreStore(os.path.join(directory, 'store'))
+    stored = store.add(os.path.join(core, 'big.ffc'))
+    target = _fresh(directory)
+    return lambda: store.checkout(stored, target())
+
+
+@benchmark('registry.pull_500', repeat=3)
+def registry_pull(directory, scale):
+    import threading
+    from fondue.core.store import CoreStore
+    from fondue.registry.client import RegistryClient
+    from fondue.registry.serve import RegistryServer
+    library = os.path.join(directory, 'library')
+    _write_sources(library, int(500 * scale), modules_per_file=5)
+    store = CoreStore(os.path.join(directory, 'registry'))
+    for name in os.listdir(library):
+        store.add(os.path.join(library, name, name + '.ffc'))
+    server = RegistryServer(('127.0.0.1', 0), store)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    digests = [core.digest for core in store.cores()]
+    target = _fresh(directory)
+
+    def run():
+        with RegistryClient(server.url, CoreStore(target())) as client:
+            client.pull_many(digests)
+    return run
+
+
+def _write_checked_library(root, count):
+    _write_library(root, count)
+    for i in range(count):
+        with open(os.path.join(root, f'group{i % 100}', f'core{i}',
+                               f'core{i}.v'), 'w') as f:
+            f.write(_VERILOG_SOURCE.format(name=f'core{i}', child='leaf'))
+
+
+@benchmark('check.library_10k', repeat=3)
+def check_library(directory, scale):
+    from fondue.core.check import CheckCache, check_cores
+    from fondue.project.build import project_cores
+    root = os.path.join(directory, 'library')
+    _write_checked_library(root, int(10000 * scale))
+    paths = project_cores(root)
+    target = _fresh(directory)
+    return lambda: check_cores(paths, cache=CheckCache(target()))
+
+
+@benchmark('check.recheck_10k')
+def check_recheck(directory, scale):
+    from fondue.core.check import CheckCache, check_cores
+    from fondue.project.build import project_cores
+    root = os.path.join(directory, 'library')
+    _write_checked_library(root, int(10000 * scale))
+    paths = project_cores(root)
+    path = os.path.join(directory, 'check.pickle')
+    check_cores(paths, cache=CheckCache(path))
+    return lambda: check_cores(paths, cache=CheckCache(path))
+
+
+@benchmark('update.library_1k', repeat=3)
+def update_library(directory, scale):
+    from fondue.core.init import CoreSession, read_record, write_record
+    from fondue.core.update import core_directories, update_cores
+    from fondue.templates import snapshot_dir
+    session = CoreSession(sim_tool='verilator')
+    for i in range(int(1000 * scale)):
+        session.write(f'core{i}', os.path.join(directory, f'core{i}'))
+    directories = core_directories(directory)
+    # Generated by older templates, which differ in one file
+    (_, digest) = read_record(directories[0])
+    old = snapshot_dir('0' * 64)
+    shutil.copytree(snapshot_dir(digest), old)
+    for path in [os.path.join(old, 'core_init', 'default', 'default',
+                              'name.v.j2')] + [
+            os.path.join(x, f'{os.path.basename(x)}.v') for x in directories]:
+        with open(path) as f:
+            text = f.read()
+        with open(path, 'w') as f:
+            f.write('// old\n' + text)
+    for core in directories:
+        write_record(core, read_record(core)[0], '0' * 64)
+    return lambda: update_cores(directories, dry_run=True)
+
+
+@benchmark('watch.update_10k')
+def watch_update(directory, scale):
+    from fondue.core.index import CoreIndex
+    from fondue.watch import Watch
+    library = os.path.join(directory, 'library')
+    _write_library(library, int(10000 * scale))
+    project = os.path.join(directory, 'project')
+    os.makedirs(project)
+    with open(os.path.join(project, 'top.ffc'), 'w') as f:
+        f.write('vlnv:\n  name: top\nfiles:\n  common: top.v\n'
+                'depends:\n  - core5\n')
+    core = os.path.join(library, 'group5', 'core5', 'core5.ffc')
+    with open(core) as f:
+        text = f.read()
+    index = CoreIndex()
+    watch = Watch(index, [library], [project],
+                  os.path.join(directory, 'out'))
+    watch.update()
+    edits = iter(range(sys.maxsize))
+
+    def run():
+        # Edit a core file the project uses: its file lists change too
+        with open(core, 'w') as f:
+            f.write(text.replace('core5.v', f'core5.v extra{next(edits)}.v'))
+        watch.update({core})
+    return run
+
+
+@benchmark('resolver.5k', repeat=3)
+def resolver(directory, scale):
+    from bench_resolver import make_library
+    from fondue.resolver import Resolver
+    (cores, root) = make_library(int(5000 * scale))
+    return lambda: Resolver(cores).resolve([root])
+
+
+def measure(func, repeat):
+    """Best and median seconds per call of `func` over `repeat` runs."""
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    number = 1
+    if elapsed < _MIN_MEASUREMENT:
+        number = max(1, int(_MIN_MEASUREMENT / max(elapsed, 1e-6)))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return {'min': min(times), 'median': statistics.median(times),
+            'repeat': repeat, 'number': number}
+
+
+def _reset_caches():
+    """Forget the per-process caches which remember the cache directory,
+    as every benchmark gets a fresh one."""
+    import fondue.core.loader
+    import fondue.templates
+    fondue.templates.template_index.cache_clear()
+    fondue.templates._bytecode_cache.cache_clear()
+    fondue.templates._environments.clear()
+    fondue.core.loader._default_cache = None
+
+
+def run(patterns=(), scale=1.0, repeat=None, echo=print):
+    results = {}
+    for (name, (factory, default_repeat)) in BENCHMARKS.items():
+        if patterns and not any(fnmatch.fnmatch(name, f'*{x}*')
+                                for x in patterns):
+            continue
+        directory = tempfile.mkdtemp(prefix='fondue-bench-')
+        old_cache = os.environ.get('FONDUE_CACHE_DIR')
+        os.environ['FONDUE_CACHE_DIR'] = os.path.join(directory, 'cache')
+        _reset_caches()
+        try:
+            func = factory(directory, scale)
+            results[name] = measure(func, repeat or default_repeat)
+        finally:
+            if old_cache is None:
+                del os.environ['FONDUE_CACHE_DIR']
+            else:
+                os.environ['FONDUE_CACHE_DIR'] = old_cache
+            _reset_caches()
+            shutil.rmtree(directory, ignore_errors=True)
+        echo(f"{name:<36} {_format(results[name]['min']):>10}")
+    return results
+
+
+def _format(seconds):
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:.1f} us'
+    if seconds < 1:
+        return f'{seconds * 1e3:.1f} ms'
+    return f'{seconds:.2f} s'
+
+
+def compare(baseline, results, threshold):
+    """The comparison report, and whether anything regressed."""
+    lines = [f"{'benchmark':<36} {'baseline':>10} {'current':>10} "
+             f"{'ratio':>7}"]
+    regressed = False
+    for (name, result) in results.items():
+        base = baseline.get(name)
+        if base is None:
+            lines.append(f"{name:<36} {'-':>10} "
+                         f"{_format(result['min']):>10} {'new':>7}")
+            continue
+        ratio = result['min'] / base['min']
+        note = ''
+        if ratio > 1 + threshold:
+            note = '  slower'
+            regressed = True
+        elif ratio < 1 / (1 + threshold):
+            note = '  faster'
+        lines.append(f"{name:<36} {_format(base['min']):>10} "
+                     f"{_format(result['min']):>10} {ratio:>6.2f}x{note}")
+    return '\n'.join(lines), regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('-k', dest='patterns', action='append', default=[],
+                        help="Only run benchmarks whose name contains this")
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int)
+    parser.add_argument('--save', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Relative slowdown which counts as a "
+                        "regression (default: 0.2)")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # The scenarios differ in size, so the times cannot be compared
+        if baseline.get('scale', 1.0) != args.scale:
+            parser.error(f"{args.compare} was recorded with --scale "
+                         f"{baseline.get('scale', 1.0)}, not {args.scale}")
+
+    results = run(args.patterns, scale=args.scale, repeat=args.repeat)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({
+                'fondue': __version__,
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'cpus': os.cpu_count(),
+                'scale': args.scale,
+                'benchmarks': results,
+            }, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if args.compare:
+        (report, regressed) = compare(baseline['benchmarks'], results,
+                                      args.threshold)
+        print()
+        print(report)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+
+from fondue.permissions import current_umask
+
+
+def cache_dir(*parts):
+    """Return (and create) a directory in fondue's per-user cache.
+
+    The cache lives in $FONDUE_CACHE_DIR if set, otherwise in
+    $XDG_CACHE_HOME/fondue (defaulting to ~/.cache/fondue).
+    """
+    base = os.environ.get('FONDUE_CACHE_DIR')
+    if not base:
+        xdg = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        base = os.path.join(xdg, 'fondue')
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def write_atomic(path, data, mode='w'):
+    """Write `data` to `path` so readers never see a partial file."""
+    (fd, tmp) = tempfile.mkstemp(
+        prefix=f'.{os.path.basename(path)}.', suffix='.tmp',
+        dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, mode) as f:
+            # mkstemp creates private files; give it the usual permissions
+            os.fchmod(fd, 0o666 & ~current_umask())
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def write_if_changed(path, data):
+    """Write `data` to `path` unless it already holds exactly that.
+
+    Leaving unchanged files alone keeps their mtimes, so tools which go by
+    mtime do not rebuild anything. Returns whether the file was written.
+    """
+    try:
+        with open(path) as f:
+            if f.read() == data:
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    write_atomic(path, data)
+    return True
@@ -0,0 +1,148 @@
+"""The fondue console entry point.
+
+If a 'fondue daemon' is running, the command line is handed to it together
+with our stdin, stdout and stderr, and we just wait for its exit status.
+Otherwise the command runs in this process. This module is imported on
+every invocation, so it must not import click or the rest of fondue until
+it falls back to running in-process.
+"""
+import os
+import sys
+import json
+import stat
+import socket
+import struct
+
+from fondue import __version__
+from fondue.permissions import current_umask
+
+PROTOCOL = 2
+
+_HEADER = struct.Struct('!I')
+
+
+def socket_path():
+    """The daemon socket: $FONDUE_DAEMON_SOCKET, or a per-user default."""
+    path = os.environ.get('FONDUE_DAEMON_SOCKET')
+    if path:
+        return path
+    base = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(base, f'fondue-{os.getuid()}', 'daemon.sock')
+
+
+def check_directory(path):
+    """Why the socket directory `path` cannot be trusted, or None if it is
+    a directory (not a symlink) owned by us with mode 0700."""
+    try:
+        st = os.lstat(path)
+    except OSError as e:
+        return f"Cannot use '{path}': {e.strerror}"
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or \
+            stat.S_IMODE(st.st_mode) != 0o700:
+        return (f"'{path}' must be a directory owned by you, with mode "
+                "0700")
+    return None
+
+
+def peer_uid(sock):
+    """The user id of the process at the other end of the Unix socket
+    `sock`, or None if the platform cannot tell."""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    size = struct.calcsize('3i')
+    return struct.unpack('3i', sock.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, size))[1]
+
+
+def send_message(sock, message, fds=()):
+    data = json.dumps(message).encode()
+    data = _HEADER.pack(len(data)) + data
+    if fds:
+        sent = socket.send_fds(sock, [data], list(fds))
+        data = data[sent:]
+    sock.sendall(data)
+
+
+def receive_message(sock, maxfds=0):
+    """Read one message, and up to `maxfds` file descriptors sent with it.
+
+    Returns (message, fds), or (None, fds) if the connection was closed.
+    """
+    buffer = b''
+    fds = []
+    while len(buffer) < _HEADER.size or \
+            len(buffer) < _HEADER.size + _HEADER.unpack_from(buffer)[0]:
+        if maxfds:
+            (data, received, _, _) = socket.recv_fds(sock, 65536, maxfds)
+            fds.extend(received)
+            maxfds = 0
+        else:
+            data = sock.recv(65536)
+        if not data:
+            return (None, fds)
+        buffer += data
+    (length,) = _HEADER.unpack_from(buffer)
+    return (json.loads(buffer[_HEADER.size:_HEADER.size + length]), fds)
+
+
+def forward(argv, path=None):
+    """Run `argv` in the daemon listening at `path`.
+
+    Returns the exit status of the command, or None if no daemon could run
+    it, in which case nothing has run.
+
+    Nothing is sent unless the socket is in a directory only we can use,
+    and the daemon runs as us: the request carries our environment and
+    our stdin, stdout and stderr.
+    """
+    path = path or socket_path()
+    if not os.path.exists(path) or check_directory(os.path.dirname(
+            os.path.abspath(path))):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(path)
+            if peer_uid(sock) not in (None, os.getuid()):
+                print(f"fondue: ignoring '{path}', which another user "
+                      "listens on", file=sys.stderr)
+                return None
+            send_message(sock, {
+                'protocol': PROTOCOL,
+                'version': __version__,
+                'prog': os.path.basename(sys.argv[0]),
+                'argv': list(argv),
+                'cwd': os.getcwd(),
+                'env': dict(os.environ),
+                'umask': current_umask(),
+            }, fds=(0, 1, 2))
+            (reply, _) = receive_message(sock)
+        except OSError:
+            return None
+        if not reply or not reply.get('accepted'):
+            return None
+
+        # From here on the command is running in the daemon; closing the
+        # connection (as on Ctrl-C) interrupts it.
+        try:
+            (reply, _) = receive_message(sock)
+        except KeyboardInterrupt:
+            return 130
+        except OSError:
+            reply = None
+    if reply is None:
+        print("fondue: lost the connection to the fondue daemon",
+              file=sys.stderr)
+        return 1
+    return reply['status']
+
+
+def main():
+    argv = sys.argv[1:]
+    if not os.environ.get('FONDUE_NO_DAEMON') and argv[:1] != ['daemon']:
+        status = forward(argv)
+        if status is not None:
+            sys.exit(status)
+
+    from fondue.main import main as run
+    run()
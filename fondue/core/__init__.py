@@ -6,4 +6,28 @@ from fondue.main import ComplexCLI
 
 logger = logging.getLogger(__name__)
 
-group = ComplexCLI(__file__, __name__, short_help="Work with core files.")
+commands = {
+    'build': ('fondue.core.build:cmd', 'Builds a core with Verilator.'),
+    'check': ('fondue.core.check:cmd',
+              'Checks that core files are well formed.'),
+    'filelist': ('fondue.core.filelist:cmd',
+                 'Writes file lists and tool scripts for a core.'),
+    'find': ('fondue.core.find:cmd', 'Finds indexed cores by name or VLNV.'),
+    'index': ('fondue.core.index:cmd',
+              'Updates the index of core libraries.'),
+    'init': ('fondue.core.init:cmd', 'Initializes a core.'),
+    'init-batch': ('fondue.core.init_batch:cmd',
+                   'Initializes many cores from a manifest.'),
+    'list': ('fondue.core.list:cmd', 'Lists indexed cores.'),
+    'modules': ('fondue.core.modules:cmd',
+                'Finds the cores which declare HDL modules.'),
+    'resolve': ('fondue.core.resolve:cmd',
+                'Resolves the dependencies of a core.'),
+    'sim': ('fondue.core.sim:cmd',
+            'Builds and runs a Verilator simulation.'),
+    'update': ('fondue.core.update:cmd',
+               'Re-renders cores from their templates.'),
+}
+
+group = ComplexCLI(commands, 'fondue.core.commands',
+                   short_help="Work with core files.")
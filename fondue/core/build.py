@@ -0,0 +1,298 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import logging
+import functools
+import subprocess
+import collections
+from tempfile import mkdtemp
+
+import click
+
+from fondue import __version__
+from fondue.cache import cache_dir, write_atomic
+from fondue.core.loader import CoreFormatError, load_core
+from fondue.core.resolve import default_core, resolve_core
+from fondue.resolver import ResolutionError
+from fondue.timing import record
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the cache key or the layout of cache entries changes
+_CACHE_FORMAT = 2
+
+# Written into the object directory, so an unchanged build is a single read
+KEY_FILE = '.fondue-build'
+
+_HDL = ('.v', '.sv')
+_HDL_INCLUDES = ('.vh', '.svh')
+_CXX = ('.c', '.cc', '.cpp', '.cxx')
+_CXX_INCLUDES = ('.h', '.hh', '.hpp')
+
+BuildResult = collections.namedtuple('BuildResult',
+                                     'obj_dir top key status elapsed')
+
+
+class BuildError(Exception):
+    pass
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def tool_version(tool):
+    try:
+        result = subprocess.run([tool, '--version'], capture_output=True,
+                                text=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise BuildError(f"Cannot run '{tool}': {e}")
+    return result.stdout.strip()
+
+
+def resolved_cores(path):
+    """The core at `path` and its dependencies, dependencies first."""
+    root = load_core(path)
+    if not root.depends:
+        # No need to scan the core index
+        return [root]
+    return [core for (core, requires) in resolve_core(path)]
+
+
+def source_files(cores, sim=False):
+    """Absolute paths of the files in the `files:` sections of `cores`.
+
+    The 'sim' section is only used for the last core, the one being
+    built, and only when building a simulation.
+    """
+    files = []
+    for core in cores:
+        base = os.path.dirname(os.path.abspath(core.path))
+        for (section, names) in core.files.items():
+            if section == 'sim' and not (sim and core is cores[-1]):
+                continue
+            files.extend(os.path.join(base, name) for name in names)
+    return files
+
+
+def core_options(core, sim=False):
+    """The Verilator flags the core file of `core` asks for: its 'common'
+    options, and its 'sim' options when building a simulation."""
+    return [flag for (section, flags) in core.options.items()
+            if section == 'common' or (sim and section == 'sim')
+            for flag in flags]
+
+
+def _include_dirs(files, suffixes):
+    dirs = []
+    for path in files:
+        if path.endswith(suffixes):
+            directory = os.path.dirname(path)
+            if directory not in dirs:
+                dirs.append(directory)
+    return dirs
+
+
+def verilator_includes(files):
+    """Verilator arguments for the include directories of `files`."""
+    arguments = ['-I' + x for x in _include_dirs(files, _HDL_INCLUDES)]
+    for directory in _include_dirs(files, _CXX_INCLUDES):
+        arguments += ['-CFLAGS', '-I' + directory]
+    return arguments
+
+
+def verilator_sources(files, sim=False):
+    """The files Verilator is given: HDL, and C++ for simulations."""
+    sources = [x for x in files if x.endswith(_HDL)]
+    if sim:
+        sources += [x for x in files if x.endswith(_CXX)]
+    return sources
+
+
+def verilator_command(verilator, obj_dir, top, files, options=(), sim=False,
+                      jobs=None):
+    command = [verilator, '--cc', '--build', '--Mdir', obj_dir,
+               '--top-module', top]
+    if sim:
+        command.append('--exe')
+    if jobs:
+        command += ['-j', str(jobs)]
+    command += verilator_includes(files)
+    command += options
+    command += verilator_sources(files, sim)
+    return command
+
+
+def build_key(base, files, top, options, sim, version):
+    """The cache key of a build: a digest of its inputs' contents.
+
+    The Makefiles Verilator writes name the sources by absolute path, so
+    the cache is per checkout: the key includes `base`, the directory of
+    the core file.
+    """
+    inputs = {
+        'format': _CACHE_FORMAT,
+        'base': os.path.abspath(base),
+        'fondue': __version__,
+        'verilator': version,
+        'top': top,
+        'sim': sim,
+        'options': list(options),
+        'files': [(os.path.relpath(path, base), file_digest(path))
+                  for path in files],
+    }
+    return hashlib.sha256(json.dumps(inputs).encode()).hexdigest()
+
+
+def _read_key(obj_dir):
+    try:
+        with open(os.path.join(obj_dir, KEY_FILE)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _store(obj_dir, entry):
+    """Copy a finished object directory into the cache."""
+    staging = mkdtemp(prefix='.', dir=os.path.dirname(entry))
+    try:
+        shutil.copytree(obj_dir, os.path.join(staging, 'obj_dir'),
+                        symlinks=True)
+        # A concurrent build of the same inputs may have got there first,
+        # in which case the rename fails and its entry is kept.
+        os.rename(os.path.join(staging, 'obj_dir'), entry)
+    except OSError as e:
+        logger.debug(f"Not caching '{obj_dir}': {e}")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def _restore(entry, obj_dir):
+    """Replace `obj_dir` with the cache entry `entry`.
+
+    Only an object directory fondue built (which has a KEY_FILE) or an
+    empty one is replaced, so that a mistaken --obj-dir never deletes
+    anything else.
+    """
+    if os.path.lexists(obj_dir):
+        if os.path.islink(obj_dir) or not os.path.isdir(obj_dir) or (
+                os.listdir(obj_dir) and
+                not os.path.exists(os.path.join(obj_dir, KEY_FILE))):
+            raise BuildError(f"Refusing to replace '{obj_dir}', which was "
+                             "not built by fondue")
+        shutil.rmtree(obj_dir)
+    shutil.copytree(entry, obj_dir, symlinks=True)
+
+
+def build(path, sim=False, top=None, options=(), obj_dir=None,
+          verilator='verilator', jobs=None, output=None):
+    """Verilate (and compile) the core at `path` and its dependencies.
+
+    Builds are cached by the contents of every listed file, the Verilator
+    version and the options: those of the core file (see core_options()),
+    then `options`. A build whose key matches the object directory
+    does nothing; one whose key is in the cache restores the cached object
+    directory instead of running Verilator.
+
+    Verilator's output goes to the file `output` if given.
+    """
+    start = time.perf_counter()
+    cores = resolved_cores(path)
+    core = cores[-1]
+    base = os.path.dirname(os.path.abspath(core.path))
+    top = top or core.vlnv.name
+    # One per core file, as a directory can hold several
+    obj_dir = os.path.abspath(obj_dir or os.path.join(
+        base, 'obj_dir', os.path.splitext(os.path.basename(core.path))[0]))
+    files = source_files(cores, sim=sim)
+    options = core_options(core, sim) + list(options)
+    try:
+        key = build_key(base, files, top, options, sim,
+                        tool_version(verilator))
+    except OSError as e:
+        raise BuildError(f"Cannot read '{e.filename}': {e.strerror}")
+
+    def result(status):
+        elapsed = time.perf_counter() - start
+        record('core.build', elapsed, core=top, sim=sim, status=status)
+        return BuildResult(obj_dir, top, key, status, elapsed)
+
+    if _read_key(obj_dir) == key:
+        return result('up to date')
+
+    entry = os.path.join(cache_dir('builds'), key)
+    if os.path.isdir(entry):
+        logger.info(f"Restoring {top} from the build cache")
+        _restore(entry, obj_dir)
+        write_atomic(os.path.join(obj_dir, KEY_FILE), key)
+        return result('restored')
+
+    # Mark the directory as fondue's, but out of date until this succeeds
+    os.makedirs(obj_dir, exist_ok=True)
+    write_atomic(os.path.join(obj_dir, KEY_FILE), '')
+    command = verilator_command(verilator, obj_dir, top, files,
+                                options=options, sim=sim, jobs=jobs)
+    logger.debug(' '.join(command))
+    returncode = subprocess.run(
+        command, stdout=output,
+        stderr=None if output is None else subprocess.STDOUT).returncode
+    if returncode:
+        raise BuildError(f"Verilator failed with exit status {returncode}")
+    _store(obj_dir, entry)
+    write_atomic(os.path.join(obj_dir, KEY_FILE), key)
+    return result('built')
+
+
+def build_options(f):
+    """The options shared by 'fondue core build' and 'fondue core sim'."""
+    for option in reversed([
+        click.option("--top", metavar="<module>",
+                     help="Top-level module (default: the core name)"),
+        click.option("--option", "-O", "options", multiple=True,
+                     metavar="<flag>",
+                     help="Extra Verilator flag (may be repeated)"),
+        click.option("--obj-dir", type=click.Path(file_okay=False),
+                     help="Output directory (default: obj_dir/<name> next "
+                     "to the core file <name>.ffc)"),
+        click.option("--jobs", "-j", type=click.IntRange(min=1),
+                     help="Parallel compile jobs"),
+        click.option("--verilator", envvar='VERILATOR', default='verilator',
+                     show_default=True, metavar="<path>",
+                     help="Verilator executable ($VERILATOR)"),
+    ]):
+        f = option(f)
+    return f
+
+
+def run_build(core, sim, **kwargs):
+    try:
+        result = build(core or default_core(), sim=sim, **kwargs)
+    except (BuildError, CoreFormatError, ResolutionError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{result.top}: {result.status} in "
+               f"{result.elapsed * 1000:.0f} ms ({result.obj_dir})")
+    return result
+
+
+@click.command('build',
+               options_metavar="[<options>]",
+               short_help='Builds a core with Verilator.')
+@click.argument("core", metavar="[<core>]", required=False,
+                type=click.Path(exists=True, dir_okay=False))
+@build_options
+def cmd(core, **kwargs):
+    """ Verilates and compiles <core> and its dependencies.
+
+        <core> defaults to the only .ffc file in the current directory.
+        Builds are cached by the contents of the files listed in the core
+        files and the Verilator flags: repeating a build of unchanged files
+        restores the cached object directory without running Verilator.
+    """
+    run_build(core, sim=False, **kwargs)
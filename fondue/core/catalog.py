@@ -0,0 +1,144 @@
+import sys
+import array
+
+from fondue.core.loader import Core, Vlnv, format_vlnv
+
+# Stands for the core's name in stored paths and file names, which are
+# mostly named after the core: 'uart.v' is stored as '\0.v' and shared by
+# every core which has a file named like that.
+_NAME = '\0'
+
+
+class CatalogCore():
+    """A core in a Catalog, with the fields of a
+    fondue.core.loader.Core. Its files are kept by the catalog."""
+
+    __slots__ = ('vlnv', 'depends', '_catalog', '_path', '_files',
+                 '_options')
+
+    def __init__(self, vlnv, depends, catalog, path, files, options):
+        self.vlnv = vlnv
+        self.depends = depends
+        self._catalog = catalog
+        self._path = path
+        self._files = files
+        self._options = options
+
+    @property
+    def path(self):
+        name = self._catalog._names[self._path]
+        return name.replace(_NAME, self.vlnv.name)
+
+    @property
+    def files(self):
+        return self._catalog._decode(self._files, self.vlnv.name)
+
+    @property
+    def options(self):
+        return self._catalog._decode(self._options, self.vlnv.name)
+
+    def as_core(self):
+        return Core(self.vlnv, self.files, self.path, self.depends,
+                    self.options)
+
+    def __repr__(self):
+        return f'<CatalogCore {format_vlnv(self.vlnv)} {self.path!r}>'
+
+
+class Catalog():
+    """Many loaded cores, stored compactly.
+
+    Every core is a CatalogCore. VLNV fields and dependencies are shared
+    between the cores which have the same ones, and the paths and files of
+    all the cores are ids in a table of distinct names, with the files and
+    options in one array. Cores can be looked up by VLNV and by name without
+    scanning.
+    """
+
+    def __init__(self, cores=()):
+        self._cores = []
+        self._by_vlnv = {}
+        # name -> the core, or a list if several cores have that name
+        self._by_name = {}
+        # Every path, section, file name and option once, and the id of each
+        self._names = []
+        self._ids = {}
+        # Per core, for its files and then its options: the number of
+        # sections, then for each section its name, the number of entries
+        # and the entries
+        self._sections = array.array('I')
+        self._depends = {}
+        self.extend(cores)
+
+    def __len__(self):
+        return len(self._cores)
+
+    def __iter__(self):
+        return iter(self._cores)
+
+    def _id(self, name, core_name=None):
+        if core_name and _NAME not in name:
+            name = name.replace(core_name, _NAME)
+        i = self._ids.get(name)
+        if i is None:
+            i = self._ids[name] = len(self._names)
+            self._names.append(name)
+        return i
+
+    def _encode(self, sections, core_name):
+        offset = len(self._sections)
+        encoded = [len(sections)]
+        for (section, names) in sections.items():
+            encoded += [self._id(section), len(names)]
+            encoded += [self._id(name, core_name) for name in names]
+        self._sections.extend(encoded)
+        return offset
+
+    def _decode(self, offset, core_name):
+        data = self._sections
+        names = self._names
+        files = {}
+        position = offset + 1
+        for _ in range(data[offset]):
+            (section, count) = data[position:position + 2]
+            position += 2
+            files[names[section]] = tuple(
+                names[i].replace(_NAME, core_name)
+                for i in data[position:position + count])
+            position += count
+        return files
+
+    def add(self, core):
+        """Add a core (anything with the fields of a Core). Returns its
+        CatalogCore."""
+        vlnv = Vlnv(*(None if x is None else sys.intern(x)
+                      for x in core.vlnv))
+        depends = self._depends.setdefault(tuple(core.depends),
+                                           tuple(core.depends))
+        record = CatalogCore(vlnv, depends, self,
+                             self._id(core.path, vlnv.name),
+                             self._encode(core.files, vlnv.name),
+                             self._encode(core.options, vlnv.name))
+        self._cores.append(record)
+        self._by_vlnv.setdefault(vlnv, record)
+        named = self._by_name.setdefault(vlnv.name, record)
+        if isinstance(named, list):
+            named.append(record)
+        elif named is not record:
+            self._by_name[vlnv.name] = [named, record]
+        return record
+
+    def extend(self, cores):
+        for core in cores:
+            self.add(core)
+
+    def get(self, vlnv):
+        """The first core added with the VLNV `vlnv`, or None."""
+        return self._by_vlnv.get(Vlnv(*vlnv))
+
+    def named(self, name):
+        """The cores named `name`, in the order they were added."""
+        named = self._by_name.get(name)
+        if named is None:
+            return []
+        return list(named) if isinstance(named, list) else [named]
@@ -0,0 +1,275 @@
+import os
+import time
+import pickle
+import hashlib
+import logging
+import subprocess
+import collections
+import concurrent.futures
+
+import click
+
+from fondue import __version__
+from fondue.cache import cache_dir, write_atomic
+from fondue.core.build import (_HDL, _HDL_INCLUDES, BuildError, source_files,
+                               tool_version, verilator_includes,
+                               verilator_sources)
+from fondue.core.index import CoreIndex, library_roots
+from fondue.core.loader import CoreFormatError, Vlnv, read_core
+from fondue.core.resolve import lock_path, read_lock
+from fondue.project.build import project_cores
+from fondue.timing import span
+
+logger = logging.getLogger(__name__)
+
+# The sections a core file may have
+SECTIONS = ('vlnv', 'files', 'depends', 'options')
+
+# Below this many core files, checking them is quicker than starting
+# processes
+_MIN_PARALLEL_CHECK = 16
+
+_CACHE_FORMAT = 1
+
+# stamps maps the core file and every file it uses to its (mtime, size), or
+# None if it is missing. digests maps the linted files to their sha256, and
+# lint is (Verilator version, problems) once the core was linted.
+_Result = collections.namedtuple('_Result', 'stamps problems digests lint')
+
+CoreCheck = collections.namedtuple('CoreCheck', 'path problems checked')
+
+
+def _stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def lint_command(verilator, files):
+    """The Verilator command which lints the HDL files among `files`."""
+    return ([verilator, '--lint-only', '-Wall'] + verilator_includes(files) +
+            verilator_sources(files))
+
+
+def _lint(verilator, files):
+    if not verilator_sources(files):
+        return []
+    try:
+        result = subprocess.run(lint_command(verilator, files),
+                                capture_output=True, text=True)
+    except OSError as e:
+        return [f"Cannot run '{verilator}': {e}"]
+    problems = [line for line in (result.stdout + result.stderr).splitlines()
+                if line.startswith('%')]
+    if result.returncode and not problems:
+        problems.append(f"'{verilator}' failed with status "
+                        f"{result.returncode}")
+    return problems
+
+
+def check_core(path, verilator=None, version=None, old=None):
+    """Check the core file at `path`. Returns a _Result.
+
+    With `verilator` (whose version is `version`), the HDL files of a well
+    formed core are linted too, along with those of its dependencies if it
+    has an up to date lockfile. The lint problems of `old`, an earlier
+    result, are reused if none of those files changed.
+    """
+    problems = []
+    stamps = {path: _stamp(path)}
+    try:
+        (data, core) = read_core(path)
+    except (OSError, CoreFormatError) as e:
+        return _Result(stamps, [str(e)], {}, None)
+
+    for section in data:
+        if section not in SECTIONS:
+            problems.append(f"'{path}': unknown section '{section}'")
+    for (field, value) in zip(Vlnv._fields, core.vlnv):
+        if value is not None and (':' in value or value.split() != [value]):
+            problems.append(f"'{path}': VLNV field '{field}' must not "
+                            "contain ':' or spaces")
+    base = os.path.dirname(path)
+    for (section, names) in core.files.items():
+        for name in names:
+            full = os.path.normpath(os.path.join(base, name))
+            stamps[full] = _stamp(full)
+            if not os.path.isfile(full):
+                problems.append(f"'{path}': {section} file '{name}' does "
+                                "not exist")
+    if problems or verilator is None:
+        return _Result(stamps, problems, {}, None)
+
+    cores = [core]
+    if core.depends:
+        stamps[lock_path(path)] = _stamp(lock_path(path))
+        ordered = read_lock(lock_path(path), core)
+        if ordered is not None:
+            cores = [x for (x, requires) in ordered]
+    files = source_files(cores)
+    hdl = [x for x in files if x.endswith(_HDL + _HDL_INCLUDES)]
+    digests = {}
+    for full in hdl:
+        stamps.setdefault(full, _stamp(full))
+        try:
+            digests[full] = _digest(full)
+        except OSError:
+            digests[full] = None
+    if old is not None and old.lint and old.lint[0] == version and \
+            old.digests == digests:
+        lint = old.lint
+    else:
+        lint = (version, _lint(verilator, files))
+    return _Result(stamps, problems, digests, lint)
+
+
+class CheckCache():
+    """The results of 'fondue core check', by core file.
+
+    A result is reused as long as the core file and the files it uses
+    keep their mtimes and sizes, so rechecking an unchanged library only
+    stats files.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(cache_dir(), 'check.pickle')
+        self._path = path
+        try:
+            with open(path, 'rb') as f:
+                version, entries = pickle.load(f)
+        except Exception:
+            version, entries = None, {}
+        if version != (__version__, _CACHE_FORMAT):
+            entries = {}
+        self._entries = entries
+
+    def get(self, path, version=None):
+        """The result for `path` if it is still valid, linted with
+        Verilator `version` if given."""
+        entry = self._entries.get(path)
+        if entry is None or any(_stamp(x) != stamp
+                                for (x, stamp) in entry.stamps.items()):
+            return None
+        if version is not None and not entry.problems and (
+                entry.lint is None or entry.lint[0] != version):
+            return None
+        return entry
+
+    def previous(self, path):
+        """The last result for `path`, valid or not, or None."""
+        return self._entries.get(path)
+
+    def put(self, path, result):
+        self._entries[path] = result
+
+    def save(self):
+        data = pickle.dumps(((__version__, _CACHE_FORMAT), self._entries),
+                            pickle.HIGHEST_PROTOCOL)
+        try:
+            write_atomic(self._path, data, mode='wb')
+        except OSError as e:
+            logger.debug(f"Cannot save check cache '{self._path}': {e}")
+
+
+def check_cores(paths, verilator=None, jobs=None, cache=None):
+    """Check the core files `paths`, linting them with `verilator` if
+    given, in `jobs` processes (default: one per CPU).
+
+    Only cores which changed since they were last checked are checked
+    again. Returns a CoreCheck for each path, in the same order.
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    cache = cache or CheckCache()
+    version = verilator and tool_version(verilator)
+    results = {}
+    stale = []
+    for path in paths:
+        result = cache.get(path, version)
+        if result is None:
+            stale.append(path)
+        else:
+            results[path] = result
+
+    with span('core.check', cores=len(paths), checked=len(stale)):
+        arguments = (stale, [verilator] * len(stale), [version] * len(stale),
+                     [cache.previous(path) for path in stale])
+        if jobs == 1 or len(stale) < _MIN_PARALLEL_CHECK:
+            checked = list(map(check_core, *arguments))
+        else:
+            workers = jobs or os.cpu_count() or 1
+            with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+                checked = list(executor.map(
+                    check_core, *arguments,
+                    chunksize=max(1, len(stale) // (workers * 4))))
+        for (path, result) in zip(stale, checked):
+            cache.put(path, result)
+            results[path] = result
+    if stale:
+        cache.save()
+
+    stale = set(stale)
+    return [CoreCheck(path, results[path].problems +
+                      (results[path].lint[1] if results[path].lint else []),
+                      path in stale)
+            for path in paths]
+
+
+@click.command('check',
+               options_metavar="[<options>]",
+               short_help='Checks that core files are well formed.')
+@click.argument("roots", metavar="[<root>...]", nargs=-1,
+                type=click.Path(exists=True, file_okay=False))
+@click.option("--lint", is_flag=True, default=False,
+              help="Also lint the HDL files of every core with Verilator")
+@click.option("--verilator", envvar='VERILATOR', default='verilator',
+              show_default=True, metavar="<path>",
+              help="Verilator executable ($VERILATOR)")
+@click.option("-j", "--jobs", type=click.IntRange(min=1), metavar="<n>",
+              help="Check cores in this many processes "
+              "(default: one per CPU)")
+def cmd(roots, lint, verilator, jobs):
+    """ Checks every .ffc core file below the <root> directories.
+
+        <root> defaults to the indexed core libraries and those in
+        $FONDUE_LIBRARY_PATH. Core files must be valid, have no unknown
+        sections, and every file they list must exist. With --lint, the
+        HDL files of each core (and of its dependencies, if its lockfile is
+        up to date) are linted with 'verilator --lint-only -Wall'.
+
+        Results are cached: cores whose files did not change since the
+        last check are not checked again.
+    """
+    if not roots:
+        with CoreIndex() as index:
+            roots = sorted(set(index.roots()) |
+                           {os.path.abspath(x) for x in library_roots()})
+        if not roots:
+            raise click.UsageError("No <root> given and no core libraries "
+                                   "are indexed")
+    paths = [path for root in roots for path in project_cores(root)]
+    start = time.perf_counter()
+    try:
+        results = check_cores(paths, verilator if lint else None, jobs)
+    except BuildError as e:
+        raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - start
+    bad = [result for result in results if result.problems]
+    for result in bad:
+        for problem in result.problems:
+            click.echo(problem)
+    click.echo(f"Checked {len(results)} cores in {elapsed * 1000:.1f} ms "
+               f"({sum(x.checked for x in results)} new or changed)")
+    if bad:
+        raise click.ClickException(f"{len(bad)} of {len(results)} cores "
+                                   "have problems")
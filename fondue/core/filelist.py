@@ -0,0 +1,148 @@
+import os
+import logging
+import collections
+
+import click
+
+from fondue.cache import write_if_changed
+from fondue.core.build import (_HDL_INCLUDES, _include_dirs, resolved_cores,
+                               source_files, verilator_includes,
+                               verilator_sources)
+from fondue.core.loader import CoreFormatError, format_vlnv
+from fondue.core.resolve import default_core
+from fondue.hdl import VERILOG, VHDL, language
+from fondue.resolver import ResolutionError
+from fondue.timing import span
+
+logger = logging.getLogger(__name__)
+
+FileList = collections.namedtuple('FileList', 'path changed')
+
+
+def _sources(files, lang):
+    return [x for x in files
+            if language(x) == lang and not x.endswith(_HDL_INCLUDES)]
+
+
+def format_f(files, sim=False):
+    """A .f file list, as most simulators read."""
+    lines = ['+incdir+' + x for x in _include_dirs(files, _HDL_INCLUDES)]
+    return lines + _sources(files, VERILOG)
+
+
+def format_vc(files, sim=False):
+    """A Verilator command file, for 'verilator -f'."""
+    lines = []
+    for argument in verilator_includes(files):
+        if lines and lines[-1] == '-CFLAGS':
+            lines[-1] += ' ' + argument
+        else:
+            lines.append(argument)
+    return lines + verilator_sources(files, sim)
+
+
+def format_tcl(files, sim=False):
+    """A synthesis script reading the sources, in Vivado's dialect."""
+    lines = []
+    directories = _include_dirs(files, _HDL_INCLUDES)
+    if directories:
+        lines.append('set_property include_dirs [list ' +
+                     ' '.join(f'{{{x}}}' for x in directories) +
+                     '] [current_fileset]')
+    for path in files:
+        if path.endswith(_HDL_INCLUDES):
+            continue
+        elif path.endswith('.sv'):
+            lines.append(f'read_verilog -sv {{{path}}}')
+        elif language(path) == VERILOG:
+            lines.append(f'read_verilog {{{path}}}')
+        elif language(path) == VHDL:
+            lines.append(f'read_vhdl {{{path}}}')
+    return lines
+
+
+# format -> (comment leader, lines of the file list)
+FORMATS = {
+    'f': ('//', format_f),
+    'vc': ('//', format_vc),
+    'tcl': ('#', format_tcl),
+}
+
+
+def _render(core, fmt, files, sim):
+    (comment, lines) = FORMATS[fmt]
+    header = (f'{comment} Generated by fondue for '
+              f'{format_vlnv(core.vlnv)}; do not edit')
+    return '\n'.join([header] + lines(files, sim)) + '\n'
+
+
+def render_filelist(cores, fmt, sim=False):
+    """The file list in format `fmt` for the last of `cores`, which must be
+    in dependency order."""
+    return _render(cores[-1], fmt, source_files(cores, sim), sim)
+
+
+def write_filelists(path, output, formats, sim=False, cores=None):
+    """Write the file lists of the core at `path` to `output`.<format>.
+
+    `cores` is the result of resolved_cores(path), if already known. Only
+    files whose contents change are written. Returns a FileList for every
+    format.
+    """
+    with span('core.filelist', core=os.path.basename(output)) as fields:
+        cores = cores or resolved_cores(path)
+        files = source_files(cores, sim)
+        written = []
+        for fmt in formats:
+            target = f'{output}.{fmt}'
+            written.append(FileList(target, write_if_changed(
+                target, _render(cores[-1], fmt, files, sim))))
+        fields['changed'] = sum(x.changed for x in written)
+    return written
+
+
+def filelist_options(f):
+    for option in reversed([
+        click.option("--format", "-f", "formats", multiple=True,
+                     type=click.Choice(sorted(FORMATS)),
+                     help="Format to write (may be repeated; default: all)"),
+        click.option("--output-dir", "-o", metavar="<directory>",
+                     default='.', show_default=True,
+                     type=click.Path(file_okay=False),
+                     help="Directory to write the file lists to"),
+        click.option("--sim", is_flag=True, default=False,
+                     help="Include the simulation sources"),
+    ]):
+        f = option(f)
+    return f
+
+
+def echo_filelists(written):
+    for filelist in written:
+        status = 'written' if filelist.changed else 'unchanged'
+        click.echo(f"{filelist.path}: {status}")
+
+
+@click.command('filelist',
+               options_metavar="[<options>]",
+               short_help='Writes file lists and tool scripts for a core.')
+@click.argument("core", metavar="[<core>]", required=False,
+                type=click.Path(exists=True, dir_okay=False))
+@filelist_options
+def cmd(core, formats, output_dir, sim):
+    """ Writes the files of <core> and its dependencies for EDA tools.
+
+        <core> defaults to the only .ffc file in the current directory.
+        The formats are .f file lists (f), Verilator command files (vc)
+        and synthesis scripts for Vivado (tcl), named after the core.
+        Files whose contents would not change are not touched, so their
+        mtimes only change when the sources do.
+    """
+    path = core or default_core()
+    name = os.path.splitext(os.path.basename(path))[0]
+    try:
+        written = write_filelists(path, os.path.join(output_dir, name),
+                                  formats or sorted(FORMATS), sim=sim)
+    except (CoreFormatError, ResolutionError) as e:
+        raise click.ClickException(str(e))
+    echo_filelists(written)
@@ -0,0 +1,25 @@
+import logging
+
+import click
+
+from fondue.core.index import CoreIndex
+from fondue.core.list import echo_cores
+
+logger = logging.getLogger(__name__)
+
+
+@click.command('find',
+               options_metavar="[<options>]",
+               short_help='Finds indexed cores by name or VLNV.')
+@click.argument("pattern", metavar="<pattern>")
+def cmd(pattern):
+    """ Finds cores in the core index.
+
+        <pattern> is a glob matched against the name and the full
+        vendor:library:name:version of each core.
+    """
+    with CoreIndex() as index:
+        cores = index.find(pattern)
+    if not cores:
+        raise click.ClickException(f"No core matches '{pattern}'")
+    echo_cores(cores)
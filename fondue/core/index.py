@@ -0,0 +1,683 @@
+import os
+import json
+import time
+import logging
+import sqlite3
+import hashlib
+import collections
+import concurrent.futures
+
+import click
+
+from fondue.cache import cache_dir
+from fondue.core.catalog import Catalog
+from fondue.core.loader import Core, CoreFormatError, Vlnv, parse_core
+from fondue.hdl import SourceInfo, language, scan_file
+from fondue.resolver import format_dependency, parse_dependency
+from fondue.timing import span
+
+logger = logging.getLogger(__name__)
+
+ScanStats = collections.namedtuple('ScanStats', 'cores listed parsed removed')
+SourceStats = collections.namedtuple('SourceStats',
+                                     'sources hashed scanned removed')
+
+# Bump whenever _SCHEMA changes; older indexes are then rebuilt from scratch.
+_SCHEMA_VERSION = 4
+
+_TABLES = ('roots', 'dirs', 'cores', 'core_sources', 'sources', 'contents',
+           'modules')
+
+# Below this many files, scanning them is quicker than starting processes
+_MIN_PARALLEL_SCAN = 16
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS roots (
+    path TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    parent TEXT,
+    root TEXT NOT NULL,
+    mtime INTEGER NOT NULL,
+    ino INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS dirs_root ON dirs(root);
+CREATE TABLE IF NOT EXISTS cores (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    vendor TEXT,
+    library TEXT,
+    name TEXT,
+    version TEXT,
+    files TEXT,
+    depends TEXT,
+    options TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS cores_dir ON cores(dir);
+CREATE INDEX IF NOT EXISTS cores_name ON cores(name);
+CREATE TABLE IF NOT EXISTS core_sources (
+    core TEXT NOT NULL,
+    path TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS core_sources_core ON core_sources(core);
+CREATE INDEX IF NOT EXISTS core_sources_path ON core_sources(path);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sources_digest ON sources(digest);
+CREATE TABLE IF NOT EXISTS contents (
+    digest TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS modules (
+    digest TEXT NOT NULL,
+    name TEXT NOT NULL,
+    declared INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS modules_digest ON modules(digest);
+CREATE INDEX IF NOT EXISTS modules_name ON modules(name, declared);
+'''
+
+_VLNV_SQL = ("COALESCE(vendor, '') || ':' || COALESCE(library, '') || ':' || "
+             "name || ':' || COALESCE(version, '')")
+
+
+def library_roots():
+    """The core library roots configured in $FONDUE_LIBRARY_PATH."""
+    path = os.environ.get('FONDUE_LIBRARY_PATH', '')
+    return [root for root in path.split(os.pathsep) if root]
+
+
+class CoreIndex():
+    """A persistent index of the .ffc core files below some library roots.
+
+    Every directory is recorded with its mtime and inode. Adding, removing
+    or renaming an entry changes a directory's mtime, so a rescan only lists
+    directories which changed, and only stats the .ffc files in the others.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(cache_dir(), 'cores.sqlite')
+        self._db = sqlite3.connect(path)
+        # The index can always be rebuilt: commit without waiting for the
+        # disk, which 'fondue watch' does after every change
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.execute('PRAGMA synchronous = NORMAL')
+        (version,) = self._db.execute('PRAGMA user_version').fetchone()
+        if version != _SCHEMA_VERSION:
+            self._db.executescript(
+                ''.join(f'DROP TABLE IF EXISTS {table}; '
+                        for table in _TABLES) +
+                f'PRAGMA user_version = {_SCHEMA_VERSION};'
+            )
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def roots(self):
+        return [row[0] for row in
+                self._db.execute('SELECT path FROM roots ORDER BY path')]
+
+    def add_root(self, root):
+        root = os.path.abspath(root)
+        with self._db:
+            self._db.execute('INSERT OR IGNORE INTO roots VALUES (?)', (root,))
+        return root
+
+    def remove_root(self, root):
+        root = os.path.abspath(root)
+        with self._db:
+            self._db.execute('DELETE FROM roots WHERE path = ?', (root,))
+            paths = [row[0] for row in self._db.execute(
+                'SELECT path FROM dirs WHERE root = ?', (root,))]
+            self._db.execute('DELETE FROM dirs WHERE root = ?', (root,))
+            self._db.executemany('DELETE FROM cores WHERE dir = ?',
+                                 ((path,) for path in paths))
+
+    def scan(self, roots=None):
+        """Bring the index up to date with the filesystem.
+
+        Scans `roots` (default: every known root), which are added to the
+        index if needed. Returns the ScanStats of the scan.
+        """
+        if roots is None:
+            roots = self.roots()
+        totals = ScanStats(0, 0, 0, 0)
+        for root in roots:
+            root = self.add_root(root)
+            with span('core.index.scan', root=root) as fields, self._db:
+                stats = _Scan(self._db, root).run()
+                fields.update(stats._asdict())
+            totals = ScanStats(*(a + b for (a, b) in zip(totals, stats)))
+        return totals
+
+    def update(self, paths):
+        """Bring the index up to date with changes to `paths` only.
+
+        Each path is looked at through the closest indexed directory
+        above it, which is listed again along with what is known below it.
+        Paths outside the indexed roots are ignored. Returns the ScanStats
+        of the directories which were looked at.
+        """
+        roots = self.roots()
+        targets = collections.defaultdict(set)
+        for path in paths:
+            path = os.path.abspath(path)
+            for root in roots:
+                if path.startswith(root + os.sep):
+                    targets[root].add(os.path.dirname(path))
+        totals = ScanStats(0, 0, 0, 0)
+        for (root, directories) in targets.items():
+            with span('core.index.update', root=root) as fields, self._db:
+                stats = ScanStats(0, 0, 0, 0)
+                done = []
+                for directory in sorted(directories):
+                    if any(directory == x or directory.startswith(x + os.sep)
+                           for x in done):
+                        continue
+                    directory = self._indexed_dir(root, directory)
+                    if directory is None:
+                        # Not scanned yet
+                        stats = _Scan(self._db, root).run()
+                        break
+                    done.append(directory)
+                    stats = ScanStats(*(a + b for (a, b) in zip(
+                        stats, _Scan(self._db, root, directory).rescan())))
+                fields.update(stats._asdict())
+            totals = ScanStats(*(a + b for (a, b) in zip(totals, stats)))
+        return totals
+
+    def _indexed_dir(self, root, path):
+        """`path`, or the closest directory above it which is indexed."""
+        while True:
+            if self._db.execute('SELECT 1 FROM dirs WHERE path = ?',
+                                (path,)).fetchone():
+                return path
+            if path == root:
+                return None
+            path = os.path.dirname(path)
+
+    def _query(self, where='', params=()):
+        rows = self._db.execute(
+            'SELECT vendor, library, name, version, path, files, depends, '
+            'options '
+            'FROM cores '
+            f'WHERE error IS NULL {where} '
+            'ORDER BY name, vendor, library, version, path', params)
+        for row in rows:
+            (files, options) = ({section: tuple(names) for (section, names)
+                                 in json.loads(column).items()}
+                                for column in (row[5], row[7]))
+            depends = tuple(parse_dependency(x) for x in json.loads(row[6]))
+            yield Core(Vlnv(*row[:4]), files, row[4], depends, options)
+
+    def cores(self, vendor=None, library=None, name=None):
+        where = ''
+        params = []
+        for (field, value) in (('vendor', vendor), ('library', library),
+                               ('name', name)):
+            if value is not None:
+                where += f' AND {field} = ?'
+                params.append(value)
+        return list(self._query(where, params))
+
+    def vlnvs(self, paths):
+        """The VLNVs of the valid indexed core files among `paths`, by
+        path."""
+        vlnvs = {}
+        for path in paths:
+            row = self._db.execute(
+                'SELECT vendor, library, name, version FROM cores '
+                'WHERE path = ? AND error IS NULL', (path,)).fetchone()
+            if row:
+                vlnvs[path] = Vlnv(*row)
+        return vlnvs
+
+    def catalog(self):
+        """Every indexed core, in a fondue.core.catalog.Catalog."""
+        return Catalog(self._query())
+
+    def find(self, pattern):
+        """Find cores whose name or full VLNV matches the glob `pattern`."""
+        return list(self._query(f'AND (name GLOB ? OR {_VLNV_SQL} GLOB ?)',
+                                (pattern, pattern)))
+
+    def errors(self):
+        return self._db.execute(
+            'SELECT path, error FROM cores WHERE error IS NOT NULL '
+            'ORDER BY path').fetchall()
+
+    def scan_sources(self, jobs=None):
+        """Bring the modules of the indexed cores' HDL files up to date.
+
+        Only files whose mtime or size changed are hashed, and only contents
+        which were never seen before are scanned, `jobs` processes at a time.
+        Returns the SourceStats of the scan.
+        """
+        (files, core_sources) = _core_sources(self._db.execute(
+            'SELECT path, files FROM cores WHERE error IS NULL'))
+        with span('core.index.sources') as fields, self._db:
+            self._db.execute('DELETE FROM core_sources')
+            self._db.executemany('INSERT INTO core_sources VALUES (?, ?)',
+                                 core_sources)
+            scan = _SourceScan(self._db, jobs)
+            scan.update(files, prune=True)
+            stats = SourceStats(len(scan.digests), scan.hashed, scan.scanned,
+                                scan.removed)
+            fields.update(stats._asdict())
+        return stats
+
+    def update_sources(self, paths, jobs=None):
+        """Like scan_sources(), for changes to `paths` only.
+
+        The HDL files of the core files among `paths` are listed again,
+        and the HDL files among them which belong to an indexed core are
+        scanned if they changed. Unused contents are kept until the next
+        scan_sources(). Returns the SourceStats of the update.
+        """
+        paths = [os.path.abspath(path) for path in paths]
+        cores = [path for path in paths if path.endswith('.ffc')]
+        with span('core.index.update_sources') as fields, self._db:
+            (files, core_sources) = _core_sources(self._db.execute(
+                'SELECT path, files FROM cores WHERE error IS NULL AND '
+                f'path IN ({", ".join("?" * len(cores))})', cores))
+            self._db.executemany('DELETE FROM core_sources WHERE core = ?',
+                                 ((core,) for core in cores))
+            self._db.executemany('INSERT INTO core_sources VALUES (?, ?)',
+                                 core_sources)
+            for path in paths:
+                lang = language(path)
+                if lang and self._db.execute(
+                        'SELECT 1 FROM core_sources WHERE path = ?',
+                        (path,)).fetchone():
+                    files[path] = lang
+            scan = _SourceScan(self._db, jobs)
+            scan.update(files)
+            stats = SourceStats(len(scan.digests), scan.hashed, scan.scanned,
+                                scan.removed)
+            fields.update(stats._asdict())
+        return stats
+
+    def source_modules(self, paths, jobs=None):
+        """The SourceInfo of each HDL file in `paths`, in the same order.
+
+        Files need not belong to an indexed core. Files which are not HDL
+        or do not exist are left out.
+        """
+        files = {os.path.abspath(path): language(path) for path in paths}
+        files = {path: lang for (path, lang) in files.items() if lang}
+        with self._db:
+            scan = _SourceScan(self._db, jobs)
+            scan.update(files)
+        infos = {}
+        for (path, digest) in scan.digests.items():
+            if path not in files:
+                continue
+            modules = ([], [])
+            for (name, declared) in self._db.execute(
+                    'SELECT name, declared FROM modules WHERE digest = ? '
+                    'ORDER BY name', (digest,)):
+                modules[0 if declared else 1].append(name)
+            infos[path] = SourceInfo(digest, *map(tuple, modules))
+        return [infos[path] for path in files if path in infos]
+
+    def providers(self, module):
+        """(core, source file) pairs for the indexed HDL files which
+        declare `module`. Run scan_sources() first."""
+        rows = self._db.execute(
+            'SELECT DISTINCT cs.core, s.path FROM modules m '
+            'JOIN sources s ON s.digest = m.digest '
+            'JOIN core_sources cs ON cs.path = s.path '
+            'WHERE m.name = ? AND m.declared', (module,)).fetchall()
+        cores = {core.path: core for core in self._query(
+            f'AND path IN ({", ".join("?" * len(rows))})',
+            [row[0] for row in rows])}
+        return [(cores[core], path) for (core, path) in rows
+                if core in cores]
+
+
+def _core_sources(rows):
+    """The HDL files of the cores in (core path, files) `rows`: path ->
+    language, and (core path, path) pairs."""
+    files = {}
+    core_sources = []
+    for (core, sections) in rows:
+        base = os.path.dirname(core)
+        for names in json.loads(sections).values():
+            for name in names:
+                lang = language(name)
+                if lang:
+                    path = os.path.normpath(os.path.join(base, name))
+                    files[path] = lang
+                    core_sources.append((core, path))
+    return (files, core_sources)
+
+
+class _Scan():
+    def __init__(self, db, root, top=None):
+        """Load what is known below `root`, or only at and below its
+        directory `top`."""
+        self._db = db
+        self._root = root
+        self._top = top
+        # Paths below top sort between top + '/' and top + '0'
+        where = ('d.root = ?' if top is None else
+                 '(d.path = ? OR (d.path > ? AND d.path < ?))')
+        params = ((root,) if top is None else
+                  (top, top + os.sep, top + chr(ord(os.sep) + 1)))
+        self._dirs = {}
+        self._parents = {}
+        self._children = collections.defaultdict(list)
+        for (path, parent, mtime, ino) in db.execute(
+                f'SELECT path, parent, mtime, ino FROM dirs d WHERE {where}',
+                params):
+            self._dirs[path] = (mtime, ino)
+            self._parents[path] = parent
+            self._children[parent].append(path)
+        self._cores = collections.defaultdict(dict)
+        for (path, directory, mtime, size) in db.execute(
+                'SELECT c.path, c.dir, c.mtime, c.size FROM cores c '
+                f'JOIN dirs d ON c.dir = d.path WHERE {where}', params):
+            self._cores[directory][path] = (mtime, size)
+        self._listed = 0
+        self._parsed = 0
+        self._removed = 0
+
+    def run(self):
+        try:
+            st = os.stat(self._root)
+        except OSError:
+            st = None
+        if st is None or not os.path.isdir(self._root):
+            logger.warning(f"Core library root '{self._root}' does not exist")
+            for path in list(self._children[None]):
+                self._forget_dir(path)
+        else:
+            self._scan_dir(self._root, None, st)
+        count = self._db.execute(
+            'SELECT COUNT(*) FROM cores c JOIN dirs d ON c.dir = d.path '
+            'WHERE d.root = ? AND c.error IS NULL', (self._root,)).fetchone()
+        return ScanStats(count[0], self._listed, self._parsed, self._removed)
+
+    def rescan(self):
+        """List `top` again, and look at what is known below it."""
+        try:
+            st = os.stat(self._top, follow_symlinks=False)
+        except OSError:
+            st = None
+        if st is None or not os.path.isdir(self._top):
+            self._forget_dir(self._top)
+        else:
+            self._scan_dir(self._top, self._parents[self._top], st,
+                           force=True)
+        cores = sum(len(x) for x in self._cores.values())
+        return ScanStats(cores, self._listed, self._parsed, self._removed)
+
+    def _scan_dir(self, path, parent, st, force=False):
+        known = self._dirs.get(path)
+        if known == (st.st_mtime_ns, st.st_ino) and not force:
+            # Nothing was added or removed here; only look at what we know.
+            for core in list(self._cores[path]):
+                self._check_core(core, path)
+            for child in list(self._children[path]):
+                try:
+                    child_st = os.stat(child, follow_symlinks=False)
+                except FileNotFoundError:
+                    self._forget_dir(child)
+                else:
+                    self._scan_dir(child, path, child_st)
+            return
+
+        self._listed += 1
+        self._db.execute('INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?)',
+                         (path, parent, self._root, st.st_mtime_ns,
+                          st.st_ino))
+        subdirs = {}
+        cores = {}
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs[entry.path] = entry.stat(follow_symlinks=False)
+                    elif entry.name.endswith('.ffc') and entry.is_file():
+                        cores[entry.path] = entry.stat()
+                except OSError:
+                    continue
+
+        for child in list(self._children[path]):
+            if child not in subdirs:
+                self._forget_dir(child)
+        for core in list(self._cores[path]):
+            if core not in cores:
+                self._forget_core(core, path)
+        for (core, core_st) in cores.items():
+            self._check_core(core, path, core_st)
+        self._children[path] = list(subdirs)
+        for (child, child_st) in subdirs.items():
+            self._scan_dir(child, path, child_st)
+
+    def _check_core(self, path, directory, st=None):
+        if st is None:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                self._forget_core(path, directory)
+                return
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self._cores[directory].get(path) == stamp:
+            return
+
+        self._parsed += 1
+        self._cores[directory][path] = stamp
+        try:
+            core = parse_core(path)
+        except (OSError, CoreFormatError) as e:
+            row = (None,) * 7 + (str(e),)
+        else:
+            depends = [format_dependency(x) for x in core.depends]
+            row = tuple(core.vlnv) + (json.dumps(core.files),
+                                      json.dumps(depends),
+                                      json.dumps(core.options), None)
+        self._db.execute(
+            'INSERT OR REPLACE INTO cores VALUES '
+            '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (path, directory) + stamp + row)
+
+    def _forget_core(self, path, directory):
+        self._removed += 1
+        del self._cores[directory][path]
+        self._db.execute('DELETE FROM cores WHERE path = ?', (path,))
+
+    def _forget_dir(self, path):
+        for child in self._children.pop(path, []):
+            self._forget_dir(child)
+        for core in list(self._cores.pop(path, {})):
+            self._removed += 1
+            self._db.execute('DELETE FROM cores WHERE path = ?', (core,))
+        self._dirs.pop(path, None)
+        self._db.execute('DELETE FROM dirs WHERE path = ?', (path,))
+
+
+class _SourceScan():
+    def __init__(self, db, jobs=None):
+        self._db = db
+        self._jobs = jobs
+        self.digests = {}
+        self.hashed = 0
+        self.scanned = 0
+        self.removed = 0
+
+    def update(self, files, prune=False):
+        """Bring the sources in `files` (path -> language) up to date.
+
+        With `prune`, forget every other source, and all contents which
+        no source has any more.
+        """
+        known = {}
+        query = 'SELECT path, mtime, size, digest FROM sources'
+        if not prune:
+            query += f' WHERE path IN ({", ".join("?" * len(files))})'
+        for (path, mtime, size, digest) in self._db.execute(
+                query, () if prune else list(files)):
+            known[path] = ((mtime, size), digest)
+
+        changed = {}
+        for (path, lang) in files.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                if path in known:
+                    self._forget(path)
+                continue
+            stamp = (st.st_mtime_ns, st.st_size)
+            if path in known and known[path][0] == stamp:
+                self.digests[path] = known[path][1]
+            else:
+                changed[path] = (lang, stamp)
+        if prune:
+            for path in known:
+                if path not in files:
+                    self._forget(path)
+
+        # Hash changed files first: renamed, copied or touched files need
+        # not be scanned again.
+        unseen = {}
+        copies = []
+        for (path, (lang, stamp)) in changed.items():
+            try:
+                digest = _file_digest(path)
+            except OSError:
+                continue
+            self.hashed += 1
+            if digest in unseen:
+                copies.append((path, stamp, digest))
+            elif self._known(digest):
+                self._record(path, stamp, digest)
+            else:
+                unseen[digest] = (path, lang, stamp)
+
+        for (path, lang, stamp, info) in self._scan(unseen.values()):
+            if info is None:
+                continue
+            self.scanned += 1
+            if not self._known(info.digest):
+                self._db.execute('INSERT INTO contents VALUES (?)',
+                                 (info.digest,))
+                self._db.executemany(
+                    'INSERT INTO modules VALUES (?, ?, ?)',
+                    [(info.digest, name, 1) for name in info.declares] +
+                    [(info.digest, name, 0) for name in info.instantiates])
+            self._record(path, stamp, info.digest)
+        for (path, stamp, digest) in copies:
+            if self._known(digest):
+                self._record(path, stamp, digest)
+        for (path, (lang, stamp)) in changed.items():
+            if path not in self.digests and path in known:
+                self._forget(path)
+
+        if prune:
+            self._db.execute('DELETE FROM contents WHERE digest NOT IN '
+                             '(SELECT digest FROM sources)')
+            self._db.execute('DELETE FROM modules WHERE digest NOT IN '
+                             '(SELECT digest FROM contents)')
+
+    def _known(self, digest):
+        return self._db.execute('SELECT 1 FROM contents WHERE digest = ?',
+                                (digest,)).fetchone() is not None
+
+    def _record(self, path, stamp, digest):
+        self.digests[path] = digest
+        self._db.execute('INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?)',
+                         (path,) + stamp + (digest,))
+
+    def _forget(self, path):
+        self.removed += 1
+        self._db.execute('DELETE FROM sources WHERE path = ?', (path,))
+
+    def _scan(self, files):
+        files = list(files)
+        if self._jobs == 1 or len(files) < _MIN_PARALLEL_SCAN:
+            for (path, lang, stamp) in files:
+                yield (path, lang, stamp, _scan_file(path, lang))
+            return
+        with concurrent.futures.ProcessPoolExecutor(self._jobs) as executor:
+            workers = self._jobs or os.cpu_count() or 1
+            chunksize = max(1, len(files) // (workers * 4))
+            infos = executor.map(_scan_file, [x[0] for x in files],
+                                 [x[1] for x in files], chunksize=chunksize)
+            for ((path, lang, stamp), info) in zip(files, infos):
+                yield (path, lang, stamp, info)
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _scan_file(path, lang):
+    try:
+        return scan_file(path, lang)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Cannot scan '{path}': {e}")
+        return None
+
+
+@click.command('index',
+               options_metavar="[<options>]",
+               short_help='Updates the index of core libraries.')
+@click.argument("roots", metavar="[<root>...]", nargs=-1,
+                type=click.Path(file_okay=False))
+@click.option("--remove", "remove", multiple=True, metavar="<root>",
+              help="Stop indexing a library root")
+@click.option("--rebuild", is_flag=True, default=False,
+              help="Discard the index and scan everything again")
+@click.option("-j", "--jobs", type=click.IntRange(min=1), metavar="<n>",
+              help="Scan HDL files in this many processes "
+              "(default: one per CPU)")
+def cmd(roots, remove, rebuild, jobs):
+    """ Scans core libraries for .ffc core files.
+
+        The given <root> directories are remembered and rescanned on every
+        later run, along with the directories in $FONDUE_LIBRARY_PATH.
+        Rescans only look at directories which changed.
+
+        The HDL files of every core are scanned for the modules they
+        declare and instantiate (see 'fondue core modules'). Only files
+        with new contents are scanned again.
+    """
+    with CoreIndex() as index:
+        for root in remove:
+            index.remove_root(root)
+        known = index.roots()
+        if rebuild:
+            for root in known:
+                index.remove_root(root)
+        start = time.perf_counter()
+        stats = index.scan(sorted(set(known) | {
+            os.path.abspath(root) for root in library_roots() + list(roots)
+        }))
+        sources = index.scan_sources(jobs)
+        elapsed = time.perf_counter() - start
+    click.echo(f"Indexed {stats.cores} cores in {elapsed * 1000:.1f} ms "
+               f"({stats.listed} directories listed, "
+               f"{stats.parsed} core files read, "
+               f"{sources.scanned} HDL files scanned)")
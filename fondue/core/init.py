@@ -1,22 +1,34 @@
 import os
+import json
 import errno
+import stat
 import logging
 import shutil
 import collections
-import distutils.dir_util
 import copy
-import pkg_resources
 from os import listdir
 from os.path import exists, isdir
-from distutils.errors import DistutilsFileError
-from tempfile import TemporaryDirectory
+from tempfile import mkdtemp
 
-from fondue.templates import TemplateRepo
+from fondue.cache import write_if_changed
+from fondue.permissions import current_umask
+from fondue.templates import (TemplateRepo, list_templates, list_tools,
+                              snapshot_templates, templates_digest)
+from fondue.timing import span
 
 import click
 
 logger = logging.getLogger(__name__)
 
+# Below a core directory: what 'fondue core update' needs to re-render it,
+# the arguments it was created with and the digest of the templates then
+# (which fondue.templates.snapshot_templates() keeps)
+RECORD_DIR = '.fondue'
+RECORD_NAME = 'init.json'
+
+_RECORD_ARGUMENTS = ('name', 'vendor', 'library', 'version', 'template',
+                     'sim_tool')
+
 
 def _validate_directory(directory):
     """Validate directory for new core.
@@ -44,7 +56,8 @@ def _validate_directory(directory):
             )
 
 
-def _render_templates(templates, arguments, directory):
+def _outputs(templates, arguments):
+    """Yield (file name, template, arguments, base) for every output file."""
     for (path, template) in templates.items():
         args = copy.copy(arguments)
         if template.parent:
@@ -54,6 +67,11 @@ def _render_templates(templates, arguments, directory):
 
         file_name = os.path.splitext(path)[0]  # remove j2 suffix
         file_name = file_name.replace('name', args['name'])
+        yield (file_name, template, args, base)
+
+
+def _render_templates(templates, arguments, directory):
+    for (file_name, template, args, base) in _outputs(templates, arguments):
         template.repo.render_template(
             template,
             os.path.join(directory, file_name),
@@ -62,17 +80,111 @@ def _render_templates(templates, arguments, directory):
         )
 
 
+def _render(templates, arguments):
+    """Render `templates` in memory: {file name: contents}."""
+    files = {}
+    for (file_name, template, args, base) in _outputs(templates, arguments):
+        if base:
+            args['base'] = base._template
+        files[file_name] = template.render(**args)
+    return files
+
+
+def write_record(directory, args, digest=None):
+    """Record how the core in `directory` was generated: from `args`, with
+    the templates whose digest is `digest` (default: the current ones,
+    which are then snapshotted)."""
+    record = {key: args.get(key) for key in _RECORD_ARGUMENTS}
+    if digest is None:
+        try:
+            digest = snapshot_templates()
+        except OSError as e:
+            logger.warning(f"Cannot keep a copy of the templates ({e}): "
+                           "'fondue core update' will report every "
+                           "changed file as a conflict")
+            digest = templates_digest()
+    record['templates'] = digest
+    path = os.path.join(directory, RECORD_DIR, RECORD_NAME)
+    write_if_changed(path, json.dumps(record, indent=2, sort_keys=True) +
+                     '\n')
+
+
+def read_record(directory):
+    """The arguments the core in `directory` was created with, and the
+    digest of the templates it was generated from.
+
+    Raises ValueError if it was not created by 'fondue core init'.
+    """
+    path = os.path.join(directory, RECORD_DIR, RECORD_NAME)
+    try:
+        with open(path) as f:
+            record = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"'{directory}' was not created by "
+                         "'fondue core init'")
+    except (OSError, ValueError) as e:
+        raise ValueError(f"Cannot read '{path}': {e}")
+    if not isinstance(record, dict) or not record.get('name'):
+        raise ValueError(f"Invalid core record '{path}'")
+    return ({key: record.get(key) for key in _RECORD_ARGUMENTS},
+            record.get('templates'))
+
+
+def _staging_directory(directory):
+    """Create a directory to render a new core into.
+
+    It is created next to the final directory where possible, so that
+    committing is a single rename.
+    """
+    parent = os.path.dirname(os.path.abspath(directory))
+    try:
+        os.makedirs(parent, exist_ok=True)
+        return mkdtemp(prefix=f'.{os.path.basename(directory)}.', dir=parent)
+    except OSError:
+        return mkdtemp()
+
+
+def _rename(source, dest):
+    try:
+        os.rename(source, dest)
+    except OSError as e:
+        if e.errno in (errno.EEXIST, errno.ENOTEMPTY, errno.ENOTDIR):
+            message = (
+                f"Error committing to directory '{dest}' "
+                f"(race condition): {e.strerror}"
+            )
+            logger.error(message)
+            raise FileExistsError(errno.EEXIST, message)
+        raise
+
+
 def _commit_directory(source, dest):
     _validate_directory(dest)
 
+    # mkdtemp creates private directories; give the core the permissions it
+    # would have had if it had been created in place.
+    if exists(dest):
+        mode = os.stat(dest).st_mode
+    else:
+        mode = 0o777 & ~current_umask()
+    os.chmod(source, stat.S_IMODE(mode))
+
     try:
-        distutils.dir_util.copy_tree(source, dest)
-    except DistutilsFileError as e:
-        logger.error(
-            f"Error committing to directory '{directory}' "
-            f"(race condition): {e.args[0]}"
-        )
-        raise
+        _rename(source, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # Different filesystems: copy next to the destination and rename
+        # that, so a directory created there meanwhile is never merged into
+        staging = mkdtemp(prefix=f'.{os.path.basename(dest)}.',
+                          dir=os.path.dirname(os.path.abspath(dest)))
+        try:
+            copy = os.path.join(staging, 'core')
+            shutil.copytree(source, copy)
+            _rename(copy, dest)
+        finally:
+            shutil.rmtree(staging)
+        shutil.rmtree(source)
 
 
 def _update_templates(orig_templates, new_templates):
@@ -83,9 +195,11 @@ def _update_templates(orig_templates, new_templates):
         orig_templates[name] = template
 
 
-def _gather_templates(args):
+def _gather_templates(args, root=None):
+    """The templates for `args`, from the snapshot directory `root` if
+    given (see fondue.templates.snapshot_dir())."""
     # default template
-    template_repo = TemplateRepo('core_init/default')
+    template_repo = TemplateRepo('core_init/default', root)
 
     # default tool
     templates = template_repo.get_templates('default')
@@ -97,7 +211,7 @@ def _gather_templates(args):
 
     # top-level template
     if args['template']:
-        template_repo = TemplateRepo('core_init/' + args['template'])
+        template_repo = TemplateRepo('core_init/' + args['template'], root)
         top_templates = template_repo.get_templates('default')
         _update_templates(templates, top_templates)
 
@@ -109,10 +223,6 @@ def _gather_templates(args):
     return templates
 
 
-templates = pkg_resources.resource_listdir('fondue',
-                                           'static/templates/core_init')
-
-
 @click.command('init',
                options_metavar="[<options>]",
                short_help='Initializes a core.')
@@ -122,10 +232,10 @@ templates = pkg_resources.resource_listdir('fondue',
 @click.option("--version", help="The version of the core (used in VLNV)")
 @click.option("--template",
               help="The top-level template to use",
-              type=click.Choice(templates))
+              type=click.Choice(list_templates('core_init')))
 @click.option("--sim-tool",
               help="The sim tool template to use",
-              type=click.Choice(['verilator']))
+              type=click.Choice(list_tools('core_init')))
 @click.option("--directory",
               help="The directory in which to create the core "
               "(defaults to <name>)",
@@ -134,22 +244,96 @@ def cmd(**kwargs):
     run(kwargs)
 
 
+def _core_directory(args):
+    if args['directory']:
+        return os.path.expanduser(args['directory'])
+    return args['name']
+
+
+def _create(args, templates):
+    """Render already gathered templates into a new core directory."""
+    directory = _core_directory(args)
+
+    _validate_directory(directory)
+
+    staging = _staging_directory(directory)
+    try:
+        with span('core.init.render', core=args['name']):
+            _render_templates(templates, args, staging)
+            write_record(staging, args)
+
+        with span('core.init.commit', core=args['name']):
+            _commit_directory(staging, directory)
+    finally:
+        if exists(staging):
+            shutil.rmtree(staging)
+
+
 def run(args):
     """ This command initializes a new fondue core file.
 
         The <name> argument is the name of the core to be created.
     """
-    print(args)
-    if args['directory']:
-        directory = os.path.expanduser(args['directory'])
-    else:
-        directory = args['name']
-
-    _validate_directory(directory)
+    logger.debug(f"Initializing core: {args}")
+    with span('core.init.validate'):
+        _validate_directory(_core_directory(args))
 
-    with TemporaryDirectory() as tmpdir:
+    with span('core.init.templates'):
         templates = _gather_templates(args)
 
-        _render_templates(templates, args, tmpdir)
+    _create(args, templates)
+
+
+class CoreSession():
+    """Creates cores from one set of templates, gathered once.
+
+    For using fondue from Python: nothing is printed, and cores are rendered
+    either into a dictionary or straight into a directory.
+
+        session = CoreSession(sim_tool='verilator')
+        files = session.render('uart', vendor='acme')  # {'uart.ffc': ...}
+        session.write('spi', 'cores/spi')
+    """
 
-        _commit_directory(tmpdir, directory)
+    def __init__(self, template=None, sim_tool=None):
+        if template and template not in list_templates('core_init'):
+            raise ValueError(f"Unknown template '{template}'")
+        if sim_tool and sim_tool not in list_tools('core_init'):
+            raise ValueError(f"Unknown sim tool '{sim_tool}'")
+        self.template = template
+        self.sim_tool = sim_tool
+        self.templates = _gather_templates({'template': template,
+                                            'sim_tool': sim_tool})
+
+    def arguments(self, name, vendor=None, library=None, version=None):
+        return {'name': name, 'vendor': vendor, 'library': library,
+                'version': version, 'template': self.template,
+                'sim_tool': self.sim_tool}
+
+    def render(self, name, **vlnv):
+        """Render a core in memory.
+
+        Returns a dictionary from paths relative to the core directory to
+        file contents.
+        """
+        with span('core.init.render', core=name):
+            return _render(self.templates, self.arguments(name, **vlnv))
+
+    def write(self, name, directory, **vlnv):
+        """Render a core directly into `directory`.
+
+        The directory must be empty or not exist. Unlike 'fondue core init',
+        files are not staged elsewhere first, so a failure can leave a
+        partial core behind. Returns the paths written.
+        """
+        _validate_directory(directory)
+        arguments = self.arguments(name, **vlnv)
+        files = []
+        with span('core.init.render', core=name):
+            for (file_name, template, args, base) in _outputs(
+                    self.templates, arguments):
+                path = os.path.join(directory, file_name)
+                template.repo.render_template(template, path, args, base=base)
+                files.append(file_name)
+            write_record(directory, arguments)
+        return [os.path.join(directory, x) for x in files]
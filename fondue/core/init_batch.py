@@ -0,0 +1,156 @@
+import os
+import logging
+import functools
+import concurrent.futures
+
+import click
+import yaml
+
+from fondue.core import init
+from fondue.core.loader import _Loader
+from fondue.templates import list_templates, list_tools
+
+logger = logging.getLogger(__name__)
+
+_ARGUMENTS = ('name', 'vendor', 'library', 'version', 'template', 'sim_tool',
+              'directory')
+
+
+def load_manifest(path):
+    """Load the list of cores to create from a YAML manifest.
+
+    The manifest is either a list of cores or a mapping with a 'cores' list.
+    Each core is a mapping with the same keys as the options of
+    'fondue core init' ('name' is required). Scalars are not converted, so
+    versions like 1.10 stay strings.
+    """
+    with open(path) as f:
+        data = yaml.load(f, Loader=_Loader)
+    if isinstance(data, dict):
+        data = data.get('cores')
+    if not isinstance(data, list):
+        message = f"Manifest '{path}' does not contain a list of cores"
+        logger.error(message)
+        raise ValueError(message)
+    return data
+
+
+def _normalize(entry):
+    if not isinstance(entry, dict) or not entry.get('name'):
+        raise ValueError(f"Invalid manifest entry {entry!r}: missing name")
+    if not isinstance(entry['name'], str):
+        raise ValueError(f"Invalid manifest entry {entry!r}: "
+                         "the name is not a string")
+    entry = {str(key).replace('-', '_'): value
+             for (key, value) in entry.items()}
+    unknown = set(entry) - set(_ARGUMENTS)
+    if unknown:
+        raise ValueError(
+            f"Invalid manifest entry for '{entry['name']}': "
+            f"unknown keys {', '.join(sorted(unknown))}"
+        )
+    args = {key: entry.get(key) for key in _ARGUMENTS}
+    for (key, value) in args.items():
+        if value is not None and not isinstance(value, str):
+            raise ValueError(
+                f"Invalid manifest entry for '{args['name']}': "
+                f"'{key}' is not a string"
+            )
+    if args['template'] and args['template'] not in list_templates('core_init'):
+        raise ValueError(f"Unknown template '{args['template']}'")
+    if args['sim_tool'] and args['sim_tool'] not in list_tools('core_init'):
+        raise ValueError(f"Unknown sim tool '{args['sim_tool']}'")
+    return args
+
+
+@functools.lru_cache(maxsize=None)
+def _templates(template, sim_tool):
+    # Each worker gathers every distinct template set at most once.
+    return init._gather_templates({'template': template, 'sim_tool': sim_tool})
+
+
+def _create(args):
+    try:
+        init._create(args, _templates(args['template'], args['sim_tool']))
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def run(entries, jobs=None):
+    """Create many cores, `jobs` at a time (default: one per CPU).
+
+    Failing cores are logged and skipped. Returns a list of
+    (name, error message) pairs, one per failed core.
+    """
+    failures = []
+    cores = []
+    directories = set()
+    for entry in entries:
+        try:
+            args = _normalize(entry)
+        except ValueError as e:
+            name = entry.get('name') if isinstance(entry, dict) else None
+            if not isinstance(name, str):
+                name = None
+            failures.append((name, str(e)))
+            continue
+        directory = os.path.abspath(init._core_directory(args))
+        if directory in directories:
+            failures.append((args['name'],
+                             f"Directory '{directory}' is used by "
+                             "more than one core"))
+            continue
+        directories.add(directory)
+        cores.append(args)
+
+    # Keep cores sharing a template set together, so chunks handed to the
+    # same worker reuse its gathered templates.
+    cores.sort(key=lambda x: (x['template'] or '', x['sim_tool'] or ''))
+
+    if jobs == 1 or len(cores) <= 1:
+        results = map(_create, cores)
+        executor = None
+    else:
+        executor = concurrent.futures.ProcessPoolExecutor(jobs)
+        workers = jobs or os.cpu_count() or 1
+        chunksize = max(1, len(cores) // (workers * 4))
+        results = executor.map(_create, cores, chunksize=chunksize)
+
+    try:
+        for (args, error) in zip(cores, results):
+            if error is not None:
+                failures.append((args['name'], error))
+    finally:
+        if executor:
+            executor.shutdown()
+
+    for (name, error) in failures:
+        logger.error(f"Failed to create core '{name}': {error}")
+    return failures
+
+
+@click.command('init-batch',
+               options_metavar="[<options>]",
+               short_help='Initializes many cores from a manifest.')
+@click.argument("manifest", metavar="<manifest>",
+                type=click.Path(exists=True, dir_okay=False))
+@click.option("--jobs", "-j", type=click.IntRange(min=1), metavar="<n>",
+              help="The number of cores to create in parallel "
+              "(defaults to the number of CPUs)")
+def cmd(manifest, jobs):
+    """ Initializes every core listed in the YAML file <manifest>.
+
+        Each entry takes the same values as the options of 'fondue core
+        init'. Cores which cannot be created are reported without stopping
+        the others.
+    """
+    try:
+        entries = load_manifest(manifest)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    failures = run(entries, jobs)
+    if failures:
+        raise click.ClickException(
+            f"{len(failures)} of {len(entries)} cores could not be created"
+        )
@@ -0,0 +1,31 @@
+import logging
+
+import click
+
+from fondue.core.index import CoreIndex
+from fondue.core.loader import format_vlnv
+
+logger = logging.getLogger(__name__)
+
+
+def echo_cores(cores):
+    if not cores:
+        return
+    width = max(len(format_vlnv(core.vlnv)) for core in cores)
+    for core in cores:
+        click.echo(f"{format_vlnv(core.vlnv):<{width}}  {core.path}")
+
+
+@click.command('list',
+               options_metavar="[<options>]",
+               short_help='Lists indexed cores.')
+@click.option("--vendor", help="Only list cores from this vendor")
+@click.option("--library", help="Only list cores from this library")
+@click.option("--name", help="Only list cores with this name")
+def cmd(vendor, library, name):
+    """ Lists the cores in the core index.
+
+        Run 'fondue core index' to update the index.
+    """
+    with CoreIndex() as index:
+        echo_cores(index.cores(vendor=vendor, library=library, name=name))
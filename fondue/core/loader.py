@@ -0,0 +1,209 @@
+import os
+import atexit
+import pickle
+import logging
+import collections
+
+import yaml
+
+from fondue import __version__
+from fondue.cache import cache_dir, write_atomic
+from fondue.resolver import parse_dependency
+
+try:
+    from yaml import CSafeLoader as _BaseLoader
+except ImportError:
+    from yaml import SafeLoader as _BaseLoader
+
+logger = logging.getLogger(__name__)
+
+Vlnv = collections.namedtuple('Vlnv', 'vendor library name version')
+
+# files maps each section name to a tuple of file names, depends is a tuple
+# of fondue.resolver.Dependency, and options maps sections ('common', 'sim')
+# to a tuple of Verilator flags for builds of the core itself
+Core = collections.namedtuple('Core', 'vlnv files path depends options',
+                              defaults=((), {}))
+
+_CACHE_FORMAT = 3
+
+
+class CoreFormatError(ValueError):
+    pass
+
+
+class _Loader(_BaseLoader):
+    pass
+
+
+# Versions like 1.10 must not turn into floats, so only resolve the implicit
+# types which cannot appear in a VLNV or a file name.
+_Loader.yaml_implicit_resolvers = {
+    first: [(tag, regexp) for (tag, regexp) in resolvers
+            if tag not in ('tag:yaml.org,2002:float', 'tag:yaml.org,2002:int')]
+    for (first, resolvers) in _BaseLoader.yaml_implicit_resolvers.items()
+}
+
+
+def format_vlnv(vlnv):
+    return ':'.join(field or '' for field in vlnv)
+
+
+def _error(path, message):
+    return CoreFormatError(f"Invalid core file '{path}': {message}")
+
+
+def _scalar(value):
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def _validate(path, data):
+    if not isinstance(data, dict):
+        raise _error(path, "not a mapping")
+
+    vlnv = data.get('vlnv')
+    if not isinstance(vlnv, dict):
+        raise _error(path, "missing 'vlnv' section")
+    unknown = set(vlnv) - set(Vlnv._fields)
+    if unknown:
+        raise _error(path, f"unknown VLNV fields {', '.join(sorted(unknown))}")
+    for (field, value) in vlnv.items():
+        if isinstance(value, (dict, list)):
+            raise _error(path, f"VLNV field '{field}' is not a string")
+    if not vlnv.get('name'):
+        raise _error(path, "missing VLNV name")
+
+    files = _sections(path, data, 'files')
+    options = _sections(path, data, 'options')
+
+    depends = data.get('depends') or []
+    if not isinstance(depends, list):
+        raise _error(path, "'depends' is not a list")
+    try:
+        depends = tuple(parse_dependency(x) for x in depends)
+    except ValueError as e:
+        raise _error(path, str(e))
+
+    return Core(Vlnv(*(_scalar(vlnv.get(x)) for x in Vlnv._fields)),
+                files, path, depends, options)
+
+
+def _sections(path, data, key):
+    value = data.get(key) or {}
+    if not isinstance(value, dict):
+        raise _error(path, f"'{key}' is not a mapping")
+    sections = {}
+    for (section, names) in value.items():
+        # Sections are either a list or whitespace separated names
+        if names is None:
+            names = []
+        elif isinstance(names, str):
+            names = names.split()
+        elif not isinstance(names, list) or any(
+                isinstance(x, (dict, list)) for x in names):
+            raise _error(path, f"{key} section '{section}' is not a list")
+        sections[str(section)] = tuple(str(x) for x in names)
+    return sections
+
+
+def read_core(path):
+    """The YAML data of the core file at `path`, and its Core.
+
+    Like parse_core(), but the CoreFormatError of an invalid core file is
+    not logged.
+    """
+    path = os.fspath(path)
+    with open(path, 'rb') as f:
+        try:
+            data = yaml.load(f, Loader=_Loader)
+        except yaml.YAMLError as e:
+            raise _error(path, str(e).replace('\n', ' '))
+    return (data, _validate(path, data))
+
+
+def parse_core(path):
+    """Parse and validate the core file at `path`, bypassing the cache."""
+    try:
+        return read_core(path)[1]
+    except CoreFormatError as e:
+        logger.error(str(e))
+        raise
+
+
+class CoreCache():
+    """Parsed core files, keyed by path and checked against mtime and size.
+
+    The cache is a single pickle file, so loading it once makes every
+    subsequent lookup a dictionary access.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            try:
+                path = os.path.join(cache_dir(), 'cores.pickle')
+            except OSError as e:
+                # Parse every core file instead
+                logger.debug(f"Not caching parsed core files: {e}")
+        self._path = path
+        self._dirty = False
+        try:
+            with open(path, 'rb') as f:
+                version, entries = pickle.load(f)
+        except Exception:
+            version, entries = None, {}
+        if version != (__version__, _CACHE_FORMAT):
+            entries = {}
+        self._entries = entries
+
+    def load(self, path):
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        core = parse_core(path)
+        self._entries[path] = (stamp, core)
+        self._dirty = True
+        return core
+
+    def discard(self, path):
+        if self._entries.pop(os.path.abspath(path), None) is not None:
+            self._dirty = True
+
+    def save(self):
+        if not self._dirty or self._path is None:
+            return
+        data = pickle.dumps(((__version__, _CACHE_FORMAT), self._entries),
+                            pickle.HIGHEST_PROTOCOL)
+        try:
+            write_atomic(self._path, data, mode='wb')
+        except OSError as e:
+            logger.debug(f"Cannot save core cache '{self._path}': {e}")
+        else:
+            self._dirty = False
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = CoreCache()
+        atexit.register(_default_cache.save)
+    return _default_cache
+
+
+def load_core(path, cache=None):
+    """Load the core file at `path`, using the on-disk cache."""
+    return (cache or default_cache()).load(path)
+
+
+def load_cores(paths, cache=None):
+    """Load many core files at once and save the cache afterwards."""
+    cache = cache or default_cache()
+    try:
+        return [cache.load(path) for path in paths]
+    finally:
+        cache.save()
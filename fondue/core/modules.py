@@ -0,0 +1,93 @@
+import os
+import logging
+
+import click
+
+from fondue.core.build import resolved_cores
+from fondue.core.index import CoreIndex, library_roots
+from fondue.core.loader import CoreFormatError, format_vlnv
+from fondue.core.resolve import default_core
+from fondue.resolver import ResolutionError
+
+logger = logging.getLogger(__name__)
+
+
+def missing_modules(index, path, jobs=None):
+    """Modules instantiated by the core at `path` or its dependencies, but
+    declared by none of them, mapped to their (core, file) providers in
+    `index`."""
+    files = []
+    for core in resolved_cores(path):
+        base = os.path.dirname(os.path.abspath(core.path))
+        for names in core.files.values():
+            files.extend(os.path.join(base, name) for name in names)
+    declared = set()
+    instantiated = set()
+    for info in index.source_modules(files, jobs):
+        declared.update(info.declares)
+        instantiated.update(info.instantiates)
+    return {module: index.providers(module)
+            for module in sorted(instantiated - declared)}
+
+
+def _echo_providers(providers, indent=''):
+    width = max(len(format_vlnv(core.vlnv)) for (core, _) in providers)
+    for (core, path) in providers:
+        click.echo(f"{indent}{format_vlnv(core.vlnv):<{width}}  {path}")
+
+
+@click.command('modules',
+               options_metavar="[<options>]",
+               short_help='Finds the cores which declare HDL modules.')
+@click.argument("modules", metavar="[<module>...]", nargs=-1)
+@click.option("--core", metavar="<core>",
+              type=click.Path(exists=True, dir_okay=False),
+              help="The core to check (default: the only .ffc file in the "
+              "current directory)")
+@click.option("-j", "--jobs", type=click.IntRange(min=1), metavar="<n>",
+              help="Scan HDL files in this many processes "
+              "(default: one per CPU)")
+def cmd(modules, core, jobs):
+    """ Finds the indexed cores whose HDL files declare <module>.
+
+        Without <module>, checks that every module instantiated by the HDL
+        files of <core> and its dependencies is declared by one of them,
+        and suggests indexed cores for those which are not.
+
+        Only HDL files which changed since the last run are scanned.
+    """
+    with CoreIndex() as index:
+        index.scan(sorted(set(index.roots()) |
+                          {os.path.abspath(x) for x in library_roots()}))
+        index.scan_sources(jobs)
+
+        if modules:
+            unknown = []
+            for module in modules:
+                providers = index.providers(module)
+                if not providers:
+                    unknown.append(module)
+                    continue
+                click.echo(f"{module}:")
+                _echo_providers(providers, indent='  ')
+            if unknown:
+                raise click.ClickException(
+                    "No indexed core declares " +
+                    ", ".join(f"'{x}'" for x in unknown))
+            return
+
+        try:
+            missing = missing_modules(index, core or default_core(), jobs)
+        except (CoreFormatError, ResolutionError) as e:
+            raise click.ClickException(str(e))
+
+    for (module, providers) in missing.items():
+        if providers:
+            click.echo(f"Missing module '{module}', declared by:")
+            _echo_providers(providers, indent='  ')
+        else:
+            click.echo(f"Missing module '{module}', not declared by any "
+                       "indexed core")
+    if missing:
+        raise click.ClickException(
+            f"{len(missing)} instantiated modules are not declared")
@@ -0,0 +1,147 @@
+import os
+import glob
+import hashlib
+import logging
+
+import click
+import yaml
+
+from fondue.cache import write_atomic
+from fondue.core.index import CoreIndex, library_roots
+from fondue.core.list import echo_cores
+from fondue.core.loader import CoreFormatError, format_vlnv, load_core
+from fondue.resolver import ResolutionError, Resolver, format_dependency
+from fondue.timing import span
+
+try:
+    from yaml import CSafeDumper as _Dumper, CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeDumper as _Dumper, SafeLoader as _Loader
+
+logger = logging.getLogger(__name__)
+
+# The lockfile of <name>.ffc is <name>.lock, so cores sharing a directory
+# each have their own
+LOCK_SUFFIX = '.lock'
+
+
+def _inputs(core):
+    """A digest of everything in `core` which affects its resolution."""
+    text = '\n'.join([format_vlnv(core.vlnv)] +
+                     [format_dependency(x) for x in core.depends])
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def lock_path(core_path):
+    return os.path.splitext(os.path.abspath(core_path))[0] + LOCK_SUFFIX
+
+
+def is_lock(path):
+    """Whether `path` is the lockfile of a core file next to it."""
+    (stem, ext) = os.path.splitext(path)
+    return ext == LOCK_SUFFIX and os.path.exists(stem + '.ffc')
+
+
+def write_lock(path, root, ordered):
+    """Write the resolved cores, dependencies first, to the lockfile."""
+    base = os.path.dirname(os.path.abspath(path))
+    data = {
+        'inputs': _inputs(root),
+        'cores': [{
+            'vlnv': format_vlnv(core.vlnv),
+            'path': os.path.relpath(os.path.abspath(core.path), base),
+            'requires': [format_vlnv(x.vlnv) for x in requires],
+        } for (core, requires) in ordered],
+    }
+    write_atomic(path, yaml.dump(data, Dumper=_Dumper, sort_keys=False))
+
+
+def read_lock(path, root):
+    """Load the resolved cores from the lockfile at `path`.
+
+    Returns the (core, required cores) pairs in dependency order, or None
+    if there is no usable lockfile for `root`.
+    """
+    try:
+        with open(path) as f:
+            data = yaml.load(f, Loader=_Loader)
+    except FileNotFoundError:
+        return None
+    except (OSError, yaml.YAMLError) as e:
+        logger.warning(f"Ignoring unreadable lockfile '{path}': {e}")
+        return None
+    if not isinstance(data, dict) or data.get('inputs') != _inputs(root):
+        logger.info(f"Lockfile '{path}' is out of date")
+        return None
+
+    base = os.path.dirname(os.path.abspath(path))
+    cores = {}
+    ordered = []
+    try:
+        for entry in data['cores']:
+            core = load_core(os.path.join(base, entry['path']))
+            if format_vlnv(core.vlnv) != entry['vlnv']:
+                raise ValueError(f"'{core.path}' is no longer "
+                                 f"{entry['vlnv']}")
+            cores[entry['vlnv']] = core
+            ordered.append((core, tuple(cores[x]
+                                        for x in entry['requires'])))
+    except (OSError, CoreFormatError, ValueError, KeyError, TypeError) as e:
+        logger.info(f"Lockfile '{path}' is out of date: {e}")
+        return None
+    return ordered
+
+
+def resolve_core(path, update=False):
+    """Resolve the dependencies of the core file at `path`.
+
+    The result is kept in a lockfile next to the core file and reused
+    until the core's dependencies change, or `update` is set. Returns
+    (core, required cores) pairs, dependencies first.
+    """
+    root = load_core(path)
+    lock = lock_path(path)
+    if not update:
+        ordered = read_lock(lock, root)
+        if ordered is not None:
+            return ordered
+
+    with CoreIndex() as index:
+        index.scan(sorted(set(index.roots()) |
+                          {os.path.abspath(x) for x in library_roots()}))
+        cores = [core for core in index.catalog() if core.path != root.path]
+    with span('core.resolve', core=root.vlnv.name, candidates=len(cores)):
+        resolver = Resolver(cores + [root])
+        ordered = resolver.order(resolver.resolve([root]))
+    write_lock(lock, root, ordered)
+    return ordered
+
+
+def default_core():
+    paths = glob.glob('*.ffc')
+    if len(paths) != 1:
+        raise click.UsageError("No <core> given and there is not exactly "
+                               "one .ffc file in the current directory")
+    return paths[0]
+
+
+@click.command('resolve',
+               options_metavar="[<options>]",
+               short_help='Resolves the dependencies of a core.')
+@click.argument("core", metavar="[<core>]", required=False,
+                type=click.Path(exists=True, dir_okay=False))
+@click.option("--update", is_flag=True, default=False,
+              help="Resolve again even if the lockfile is up to date")
+def cmd(core, update):
+    """ Picks a version of every core which <core> depends on.
+
+        <core> defaults to the only .ffc file in the current directory.
+        Dependencies are looked up in the core index, and the result is
+        written to a lockfile next to <core> (uart.lock for uart.ffc), which
+        is reused until the dependencies of <core> change.
+    """
+    try:
+        ordered = resolve_core(core or default_core(), update=update)
+    except (CoreFormatError, ResolutionError) as e:
+        raise click.ClickException(str(e))
+    echo_cores([core for (core, requires) in ordered])
@@ -0,0 +1,38 @@
+import os
+import logging
+import subprocess
+
+import click
+
+from fondue.core.build import build_options, run_build
+
+logger = logging.getLogger(__name__)
+
+
+@click.command('sim',
+               options_metavar="[<options>]",
+               short_help='Builds and runs a Verilator simulation.')
+@click.option("--core", metavar="<core>",
+              type=click.Path(exists=True, dir_okay=False),
+              help="The core to simulate (default: the only .ffc file in "
+              "the current directory)")
+@build_options
+@click.option("--no-run", is_flag=True, default=False,
+              help="Only build the simulation")
+@click.argument("args", metavar="[-- <args>...]", nargs=-1)
+@click.pass_context
+def cmd(ctx, core, no_run, args, **kwargs):
+    """ Builds the simulation of a core and runs it with <args>.
+
+        The simulation also uses the files in the 'sim' section of the
+        core file. Builds are cached like those of 'fondue core build'.
+    """
+    result = run_build(core, sim=True, **kwargs)
+    if no_run:
+        return
+    executable = os.path.join(result.obj_dir, f'V{result.top}')
+    try:
+        returncode = subprocess.run([executable] + list(args)).returncode
+    except OSError as e:
+        raise click.ClickException(f"Cannot run '{executable}': {e}")
+    ctx.exit(returncode)
@@ -0,0 +1,284 @@
+import os
+import re
+import json
+import stat
+import errno
+import fcntl
+import shutil
+import hashlib
+import logging
+import collections
+from tempfile import mkstemp
+
+from fondue.cache import cache_dir, write_atomic
+from fondue.core.loader import Vlnv, format_vlnv, load_core
+from fondue.core.resolve import is_lock
+from fondue.resolver import satisfies, version_key
+from fondue.timing import span
+
+logger = logging.getLogger(__name__)
+
+# files is a tuple of (path relative to the core directory, object name)
+StoredCore = collections.namedtuple('StoredCore', 'vlnv digest files')
+
+# Never stored: build products and per-checkout state
+_SKIP = {'obj_dir'}
+
+# The sha256 of the contents, marked if the file is executable
+OBJECT_NAME = re.compile(r'[0-9a-f]{64}(\.x)?$')
+
+_FICLONE = 0x40049409
+
+_CHUNK = 1024 * 1024
+
+
+def store_dir():
+    """The store: $FONDUE_STORE_DIR, or a directory in fondue's cache."""
+    return os.environ.get('FONDUE_STORE_DIR') or cache_dir('store')
+
+
+def _core_files(directory):
+    for (root, dirs, files) in os.walk(directory):
+        dirs[:] = sorted(x for x in dirs
+                         if not x.startswith('.') and x not in _SKIP)
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            if not (name.startswith('.') or name in _SKIP or
+                    is_lock(path)):
+                yield (os.path.relpath(path, directory).replace(os.sep, '/'),
+                       path)
+
+
+# Never allowed in a VLNV field: they would let a core be filed, or checked
+# out, outside of the directory meant for it
+_VLNV_FORBIDDEN = ('/', '\\', '\0', ':', '..')
+
+
+def check_vlnv(vlnv):
+    """`vlnv` as a Vlnv, if it is safe to name files and directories after:
+    four fields, each None or a string without '/', '\\', NUL, ':' or
+    '..', and a name. Raises ValueError otherwise."""
+    if not isinstance(vlnv, (list, tuple)) or len(vlnv) != len(Vlnv._fields):
+        raise ValueError(f"Invalid VLNV {vlnv!r}")
+    for field in vlnv:
+        if field is not None and (
+                not isinstance(field, str) or field in ('', '.') or
+                any(x in field for x in _VLNV_FORBIDDEN)):
+            raise ValueError(f"Invalid VLNV {vlnv!r}")
+    if not vlnv[2]:
+        raise ValueError(f"Invalid VLNV {vlnv!r}: missing name")
+    return Vlnv(*vlnv)
+
+
+def _check_file(path, name):
+    if not isinstance(path, str) or not isinstance(name, str):
+        raise ValueError(f"Invalid file entry {path!r}: {name!r}")
+    parts = path.split('/')
+    if path.startswith('/') or '..' in parts or '' in parts or \
+            '\0' in path:
+        raise ValueError(f"Invalid file name '{path}'")
+    if not OBJECT_NAME.match(name):
+        raise ValueError(f"Invalid object name '{name}'")
+
+
+def tree_digest(vlnv, files):
+    """The digest of a core: its VLNV and its sorted (file name, object
+    name) pairs."""
+    return hashlib.sha256(json.dumps([list(vlnv), files]).encode()
+                          ).hexdigest()
+
+
+def select(dependency, entries):
+    """The (vlnv, value) pair from `entries` with the highest version which
+    the fondue.resolver.Dependency `dependency` allows, or None."""
+    best = None
+    for (vlnv, value) in entries:
+        if any(wanted is not None and wanted != actual for
+               (wanted, actual) in zip(dependency[:3], vlnv[:3])):
+            continue
+        if not satisfies(vlnv.version, dependency.constraint):
+            continue
+        if best is None or version_key(vlnv.version or '') > \
+                version_key(best[0].version or ''):
+            best = (vlnv, value)
+    return best
+
+
+def _link(source, dest):
+    """Make `dest` a copy of the store object `source`, as cheaply as the
+    filesystem allows. Returns how: 'linked', 'cloned' or 'copied'."""
+    try:
+        os.link(source, dest)
+        return 'linked'
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK,
+                           errno.ENOTSUP):
+            raise
+    mode = stat.S_IMODE(os.stat(source).st_mode)
+    with open(source, 'rb') as src, open(dest, 'wb') as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            how = 'cloned'
+        except OSError:
+            shutil.copyfileobj(src, dst, _CHUNK)
+            how = 'copied'
+    os.chmod(dest, mode)
+    return how
+
+
+class CoreStore():
+    """Core versions shared by every project, stored by content.
+
+    Every distinct file is stored once, as a read-only object named after
+    its sha256. A stored core is a manifest mapping its files to objects,
+    filed under its VLNV and a digest of that mapping. Checking a core out
+    hard links the objects where possible, so it copies no data; the files
+    of a checkout are read-only for the same reason.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or store_dir()
+        self._objects = os.path.join(self.path, 'objects')
+        self._cores = os.path.join(self.path, 'cores')
+        self._digests = os.path.join(self.path, 'digests')
+
+    def object_path(self, name):
+        return os.path.join(self._objects, name[:2], name[2:])
+
+    def add_object(self, fileobj, executable=False, digest=None):
+        """Store the contents of the binary file object `fileobj`, read in
+        one pass. Returns the object name.
+
+        With `digest`, the contents must have that sha256.
+        """
+        os.makedirs(self._objects, exist_ok=True)
+        (fd, tmp) = mkstemp(prefix='.', dir=self._objects)
+        try:
+            h = hashlib.sha256()
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in iter(lambda: fileobj.read(_CHUNK), b''):
+                    h.update(chunk)
+                    out.write(chunk)
+            if digest is not None and h.hexdigest() != digest:
+                raise ValueError(f"Expected contents with sha256 {digest}, "
+                                 f"got {h.hexdigest()}")
+            name = h.hexdigest() + ('.x' if executable else '')
+            os.chmod(tmp, 0o555 if executable else 0o444)
+            path = self.object_path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                os.link(tmp, path)
+            except FileExistsError:
+                pass
+            return name
+        finally:
+            os.remove(tmp)
+
+    def _add_file(self, path):
+        executable = bool(os.stat(path).st_mode & stat.S_IXUSR)
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(_CHUNK), b''):
+                h.update(chunk)
+            name = h.hexdigest() + ('.x' if executable else '')
+            if not os.path.exists(self.object_path(name)):
+                f.seek(0)
+                name = self.add_object(f, executable)
+        return name
+
+    def add_manifest(self, vlnv, files):
+        """Record a core made of already stored objects. `files` maps paths
+        relative to the core directory to object names."""
+        vlnv = check_vlnv(vlnv)
+        directory = os.path.join(self._cores, format_vlnv(vlnv))
+        if os.path.dirname(os.path.realpath(directory)) != \
+                os.path.realpath(self._cores):
+            raise ValueError(f"Invalid VLNV {format_vlnv(vlnv)}")
+        files = sorted(files.items())
+        for (path, name) in files:
+            _check_file(path, name)
+            if not os.path.exists(self.object_path(name)):
+                raise ValueError(f"Object {name} is not in the store")
+        digest = tree_digest(vlnv, files)
+        path = os.path.join(directory, digest + '.json')
+        if not os.path.exists(path):
+            os.makedirs(directory, exist_ok=True)
+            write_atomic(path, json.dumps({'vlnv': list(vlnv),
+                                           'files': files}))
+            # Also filed by digest alone, for get()
+            os.makedirs(self._digests, exist_ok=True)
+            try:
+                os.link(path, os.path.join(self._digests, digest + '.json'))
+            except FileExistsError:
+                pass
+        return StoredCore(vlnv, digest, tuple(map(tuple, files)))
+
+    def add(self, path):
+        """Store the core whose core file is `path`, with every file in its
+        directory. Returns its StoredCore."""
+        core = load_core(path)
+        check_vlnv(core.vlnv)
+        directory = os.path.dirname(os.path.abspath(path))
+        with span('store.add', core=core.vlnv.name) as fields:
+            files = {name: self._add_file(full)
+                     for (name, full) in _core_files(directory)}
+            fields['files'] = len(files)
+            return self.add_manifest(core.vlnv, files)
+
+    def _load(self, path):
+        with open(path) as f:
+            data = json.load(f)
+        files = tuple(map(tuple, data['files']))
+        for (name, obj) in files:
+            _check_file(name, obj)
+        return StoredCore(check_vlnv(data['vlnv']),
+                          os.path.splitext(os.path.basename(path))[0], files)
+
+    def get(self, digest):
+        """The stored core with manifest digest `digest`, or None."""
+        try:
+            return self._load(os.path.join(self._digests, digest + '.json'))
+        except FileNotFoundError:
+            return None
+
+    def cores(self):
+        """Every stored core; the latest stored first for each VLNV."""
+        try:
+            entries = sorted(os.scandir(self._cores), key=lambda x: x.name)
+        except FileNotFoundError:
+            return []
+        cores = []
+        for entry in entries:
+            manifests = sorted(os.scandir(entry.path),
+                               key=lambda x: -x.stat().st_mtime_ns)
+            for manifest in manifests:
+                if not manifest.name.endswith('.json'):
+                    continue
+                try:
+                    cores.append(self._load(manifest.path))
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    logger.warning(f"Skipping bad manifest "
+                                   f"'{manifest.path}': {e}")
+        return cores
+
+    def find(self, dependency):
+        """The highest stored version of the core `dependency` (a
+        fondue.resolver.Dependency) allows, or None."""
+        best = select(dependency,
+                      ((core.vlnv, core) for core in self.cores()))
+        return best and best[1]
+
+    def checkout(self, stored, directory):
+        """Materialize the StoredCore `stored` into `directory`, which must
+        not exist or be empty. Returns a Counter of how files were made."""
+        if os.path.isdir(directory) and os.listdir(directory):
+            raise FileExistsError(errno.EEXIST, "Directory exists and is "
+                                  "not empty", directory)
+        counts = collections.Counter()
+        with span('store.checkout', core=stored.vlnv.name) as fields:
+            for (name, obj) in stored.files:
+                dest = os.path.join(directory, *name.split('/'))
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                counts[_link(self.object_path(obj), dest)] += 1
+            fields.update(counts)
+        return counts
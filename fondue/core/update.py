@@ -0,0 +1,265 @@
+import os
+import logging
+import difflib
+import functools
+import collections
+import concurrent.futures
+
+import click
+
+from fondue.cache import write_atomic
+from fondue.core import init
+from fondue.project.build import project_cores
+from fondue.templates import (list_templates, list_tools, snapshot_dir,
+                              templates_digest)
+from fondue.timing import span
+
+logger = logging.getLogger(__name__)
+
+# Below this many cores, updating them is quicker than starting processes
+_MIN_PARALLEL_UPDATE = 16
+
+_CONFLICT = ('<<<<<<< current\n', '=======\n', '>>>>>>> template\n')
+
+# written, removed and conflicts are file names relative to the core
+# directory; error is set if the core could not be updated at all
+CoreUpdate = collections.namedtuple(
+    'CoreUpdate', 'directory written removed conflicts error',
+    defaults=((), (), (), None))
+
+
+def _hunks(base, other, side):
+    matcher = difflib.SequenceMatcher(None, base, other, autojunk=False)
+    return [(i1, i2, other[j1:j2], side)
+            for (tag, i1, i2, j1, j2) in matcher.get_opcodes()
+            if tag != 'equal']
+
+
+def _apply(base, start, end, hunks):
+    lines = []
+    position = start
+    for (hunk_start, hunk_end, new, _) in hunks:
+        lines += base[position:hunk_start] + new
+        position = hunk_end
+    return lines + base[position:end]
+
+
+def _terminated(lines):
+    if lines and not lines[-1].endswith('\n'):
+        return lines[:-1] + [lines[-1] + '\n']
+    return lines
+
+
+def merge(base, current, new):
+    """Three-way merge of the texts `current` and `new`, which were both
+    `base` once. Returns (text, whether there were conflicts).
+
+    Changes on either side are kept. Where both sides changed the same
+    lines differently, both versions are kept between conflict markers.
+    """
+    base = base.splitlines(keepends=True)
+    hunks = sorted(_hunks(base, current.splitlines(keepends=True), 0) +
+                   _hunks(base, new.splitlines(keepends=True), 1),
+                   key=lambda x: x[:2])
+    lines = []
+    conflicts = False
+    position = 0
+    i = 0
+    while i < len(hunks):
+        # Hunks which overlap or touch form one region
+        (start, end) = hunks[i][:2]
+        j = i + 1
+        while j < len(hunks) and hunks[j][0] <= end:
+            end = max(end, hunks[j][1])
+            j += 1
+        sides = [[x for x in hunks[i:j] if x[3] == side] for side in (0, 1)]
+        (ours, theirs) = (_apply(base, start, end, x) for x in sides)
+        lines += base[position:start]
+        if not sides[1] or ours == theirs:
+            lines += ours
+        elif not sides[0]:
+            lines += theirs
+        else:
+            conflicts = True
+            lines += ([_CONFLICT[0]] + _terminated(ours) + [_CONFLICT[1]] +
+                      _terminated(theirs) + [_CONFLICT[2]])
+        position = end
+        i = j
+    return (''.join(lines + base[position:]), conflicts)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def _templates(template, sim_tool, root=None):
+    # Each worker gathers every distinct template set at most once.
+    return init._gather_templates({'template': template, 'sim_tool': sim_tool},
+                                  root)
+
+
+def _generated(args, digest):
+    """What the templates with `digest` generated for `args`, or None if
+    they are no longer available."""
+    try:
+        root = snapshot_dir(digest)
+    except (ValueError, OSError):
+        return None
+    if not os.path.isdir(root):
+        return None
+    return init._render(_templates(args['template'], args['sim_tool'], root),
+                        args)
+
+
+def update_core(directory, dry_run=False):
+    """Re-render the core in `directory` from the current templates.
+
+    Each generated file is merged three ways: the changes made to it since
+    it was generated are kept, and the changes to its template are applied.
+    Only files whose contents change are written. Files the templates no
+    longer generate are removed unless they were edited. Returns a
+    CoreUpdate.
+
+    What the core was generated as is rendered again from a snapshot of
+    its templates. Without one, every file which differs from the new
+    templates is a conflict.
+    """
+    (args, digest) = init.read_record(directory)
+    if digest == templates_digest():
+        return CoreUpdate(directory)
+    if args['template'] and args['template'] not in list_templates(
+            'core_init'):
+        raise ValueError(f"Unknown template '{args['template']}'")
+    if args['sim_tool'] and args['sim_tool'] not in list_tools('core_init'):
+        raise ValueError(f"Unknown sim tool '{args['sim_tool']}'")
+    new = init._render(_templates(args['template'], args['sim_tool']), args)
+    old = _generated(args, digest)
+    if old is None:
+        logger.warning(f"The templates '{directory}' was generated from "
+                       "are not available: files which differ from the "
+                       "current templates are conflicts")
+        old = {}
+
+    written = []
+    conflicts = []
+    for (name, text) in sorted(new.items()):
+        path = os.path.join(directory, name)
+        base = old.get(name)
+        current = _read(path)
+        if text == base or text == current:
+            continue
+        if current is None:
+            if base is not None:
+                # Removed since it was generated
+                continue
+        else:
+            (text, conflict) = merge(base or '', current, text)
+            if conflict:
+                conflicts.append(name)
+            if text == current:
+                continue
+        written.append(name)
+        if not dry_run:
+            write_atomic(path, text)
+
+    removed = [name for (name, text) in sorted(old.items())
+               if name not in new and
+               _read(os.path.join(directory, name)) == text]
+    if not dry_run:
+        for name in removed:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+        init.write_record(directory, args)
+    return CoreUpdate(directory, tuple(written), tuple(removed),
+                      tuple(conflicts))
+
+
+def _update(directory, dry_run):
+    try:
+        return update_core(directory, dry_run)
+    except Exception as e:
+        return CoreUpdate(directory, error=str(e))
+
+
+def update_cores(directories, jobs=None, dry_run=False):
+    """Update the cores in `directories`, `jobs` at a time (default: one
+    per CPU). Returns a CoreUpdate for each directory, in the same order."""
+    directories = list(directories)
+    with span('core.update', cores=len(directories)):
+        if jobs == 1 or len(directories) < _MIN_PARALLEL_UPDATE:
+            return [_update(x, dry_run) for x in directories]
+        workers = jobs or os.cpu_count() or 1
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            return list(executor.map(
+                _update, directories, [dry_run] * len(directories),
+                chunksize=max(1, len(directories) // (workers * 4))))
+
+
+def core_directories(root):
+    """The directories below `root` (included) holding a core created by
+    'fondue core init'."""
+    directories = []
+    for path in project_cores(root):
+        directory = os.path.dirname(path)
+        if os.path.exists(os.path.join(directory, init.RECORD_DIR,
+                                       init.RECORD_NAME)):
+            if directory not in directories:
+                directories.append(directory)
+    return directories
+
+
+@click.command('update',
+               options_metavar="[<options>]",
+               short_help='Re-renders cores from their templates.')
+@click.argument("roots", metavar="[<directory>...]", nargs=-1,
+                type=click.Path(exists=True, file_okay=False))
+@click.option("--dry-run", "-n", is_flag=True, default=False,
+              help="Only report the files which would change")
+@click.option("-j", "--jobs", type=click.IntRange(min=1), metavar="<n>",
+              help="Update cores in this many processes "
+              "(default: one per CPU)")
+def cmd(roots, dry_run, jobs):
+    """ Updates the cores created by 'fondue core init' below each
+        <directory> (default: the current one) to the current templates.
+
+        Every core is rendered again with the arguments it was created
+        with, and each file is merged with what was generated last time:
+        edits to the generated files are kept and template changes are
+        applied. Where both changed the same lines, both versions are
+        written between conflict markers. Only files whose contents
+        change are written.
+    """
+    directories = [x for root in roots or ['.']
+                   for x in core_directories(root)]
+    if not directories:
+        raise click.UsageError("No cores created by 'fondue core init' "
+                               "were found")
+    results = update_cores(directories, jobs, dry_run)
+    verb = 'Would update' if dry_run else 'Updated'
+    for result in results:
+        if result.error:
+            click.echo(f"{result.directory}: {result.error}")
+            continue
+        for name in result.written:
+            conflict = ' (conflict)' if name in result.conflicts else ''
+            click.echo(f"{verb} {os.path.join(result.directory, name)}"
+                       f"{conflict}")
+        for name in result.removed:
+            click.echo(f"{'Would remove' if dry_run else 'Removed'} "
+                       f"{os.path.join(result.directory, name)}")
+
+    changed = sum(bool(x.written or x.removed) for x in results)
+    click.echo(f"{verb} {changed} of {len(results)} cores")
+    failed = [x for x in results if x.error]
+    conflicts = sum(len(x.conflicts) for x in results)
+    if failed or conflicts:
+        raise click.ClickException(
+            f"{len(failed)} cores could not be updated, {conflicts} files "
+            "have conflicts")
@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+import errno
+import atexit
+import signal
+import socket
+import logging
+import threading
+
+import click
+
+from fondue import __version__, timing
+from fondue.client import (PROTOCOL, check_directory, peer_uid,
+                           receive_message, send_message, socket_path)
+
+logger = logging.getLogger(__name__)
+
+
+def warm():
+    """Import every command and compile every template, so that forked
+    requests start with all of it in memory."""
+    from fondue.main import main
+    from fondue.core.loader import default_cache
+    from fondue.templates import TemplateRepo, template_index
+
+    groups = [main]
+    while groups:
+        group = groups.pop()
+        for name in group.list_commands(None):
+            try:
+                command = group.get_command(None, name)
+            except Exception as e:
+                logger.warning(f"Cannot load command '{name}': {e}")
+                continue
+            if isinstance(command, click.MultiCommand):
+                groups.append(command)
+
+    for (prefix, tools) in template_index().items():
+        repo = TemplateRepo(prefix)
+        for tool in tools:
+            repo.get_templates(tool)
+
+    default_cache()
+
+
+class Daemon():
+    """Runs fondue commands for fondue.client.
+
+    Every request is run in a child forked from the warm daemon, with the
+    client's working directory, environment, stdin, stdout and stderr, so
+    requests cannot affect each other or the daemon.
+    """
+
+    def __init__(self, path, idle_timeout=None):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self._sock = None
+        self._children = set()
+        self._stopping = False
+
+    def _bind(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        # Clients send their environment and terminal to whoever listens
+        # here: nobody else may be able to replace the socket.
+        problem = check_directory(directory)
+        if problem:
+            raise click.ClickException(problem)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        with probe:
+            try:
+                probe.connect(self.path)
+            except OSError:
+                pass
+            else:
+                raise click.ClickException(
+                    f"A fondue daemon is already listening on '{self.path}'")
+        if os.path.exists(self.path):
+            os.remove(self.path)  # left over from a daemon which died
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            self._sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        self._sock.listen(16)
+        self._sock.settimeout(1.0)
+
+    def serve(self):
+        self._bind()
+        logger.info(f"fondue daemon {__version__} listening on '{self.path}'")
+        last_active = time.monotonic()
+        try:
+            while not self._stopping:
+                self._reap()
+                if self._children:
+                    last_active = time.monotonic()
+                elif (self.idle_timeout and
+                      time.monotonic() - last_active > self.idle_timeout):
+                    logger.info("Stopping after being idle")
+                    break
+                try:
+                    (conn, _) = self._sock.accept()
+                except socket.timeout:
+                    continue
+                last_active = time.monotonic()
+                with conn:
+                    conn.settimeout(None)
+                    self._handle(conn)
+        finally:
+            self._sock.close()
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+    def _reap(self):
+        while self._children:
+            try:
+                (pid, _) = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                return
+            if not pid:
+                return
+            self._children.discard(pid)
+
+    def _handle(self, conn):
+        if peer_uid(conn) not in (None, os.getuid()):
+            logger.warning("Ignoring a request from another user")
+            return
+        try:
+            (request, fds) = receive_message(conn, maxfds=3)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Bad request: {e}")
+            return
+        try:
+            if request is None:
+                return
+            if request.get('op') == 'stop':
+                self._stopping = True
+                send_message(conn, {'stopping': True})
+                return
+            if (request.get('protocol') != PROTOCOL or
+                    request.get('version') != __version__ or len(fds) != 3):
+                # The client runs the command itself
+                send_message(conn, {'accepted': False})
+                return
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                self._sock.close()
+                _run_request(conn, request, fds)
+            self._children.add(pid)
+        except OSError as e:
+            logger.debug(f"Cannot handle a request: {e}")
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+
+def _run_request(conn, request, fds):
+    """Run a request in a forked child. Never returns."""
+    status = 1
+    try:
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        for (fd, target) in zip(fds, (0, 1, 2)):
+            os.dup2(fd, target)
+        sys.stdin = open(0, 'r', closefd=False)
+        sys.stdout = open(1, 'w', buffering=1 if os.isatty(1) else -1,
+                          closefd=False)
+        sys.stderr = open(2, 'w', buffering=1, closefd=False,
+                          errors='backslashreplace')
+        os.chdir(request['cwd'])
+        os.umask(request['umask'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        sys.argv = [request['prog']] + request['argv']
+        # The daemon's invocation is not this one
+        timing.new_invocation()
+        send_message(conn, {'accepted': True})
+        threading.Thread(target=_watch_client, args=(conn,),
+                         daemon=True).start()
+
+        from fondue.main import main
+        try:
+            main(args=request['argv'], prog_name=request['prog'])
+            status = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                status = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+        # What the interpreter would do on exit: flush logs, save caches
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # The client hangs up as soon as it has the status
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        send_message(conn, {'status': status})
+    except KeyboardInterrupt:
+        pass
+    except BaseException as e:
+        if not (isinstance(e, OSError) and e.errno == errno.EPIPE):
+            logger.exception("Request failed")
+    finally:
+        os._exit(status)
+
+
+def _watch_client(conn):
+    # The client sends nothing more; the connection closing means it was
+    # interrupted, so interrupt the command too.
+    try:
+        data = conn.recv(1)
+    except OSError:
+        data = b''
+    if not data:
+        os.kill(os.getpid(), signal.SIGINT)
+
+
+def stop(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    with sock:
+        try:
+            sock.connect(path)
+            send_message(sock, {'op': 'stop'})
+            (reply, _) = receive_message(sock)
+        except OSError:
+            return False
+    return bool(reply and reply.get('stopping'))
+
+
+@click.command('daemon',
+               options_metavar="[<options>]",
+               short_help='Runs a server which keeps fondue warm.')
+@click.option("--socket", "path", metavar="<path>",
+              help="Socket to listen on (default: $FONDUE_DAEMON_SOCKET, "
+              "or fondue-<uid>/daemon.sock in $XDG_RUNTIME_DIR or /tmp)")
+@click.option("--idle-timeout", type=float, metavar="<seconds>",
+              help="Exit after this long without requests")
+@click.option("--stop", "stop_", is_flag=True, default=False,
+              help="Stop the running daemon")
+def cmd(path, idle_timeout, stop_):
+    """ Runs fondue commands for other fondue invocations.
+
+        While the daemon runs, 'fondue' hands its command line to it
+        instead of starting from scratch: commands, templates and core
+        metadata are already loaded, and each command runs in a fresh
+        process forked from the daemon. Without a daemon, or if its
+        version differs, commands run as usual. Set FONDUE_NO_DAEMON to
+        bypass a running daemon.
+
+        The socket's directory must belong to you and have mode 0700, and
+        only your own processes are served.
+
+        Restart the daemon after adding templates.
+    """
+    path = path or socket_path()
+    if stop_:
+        if not stop(path):
+            raise click.ClickException(f"No fondue daemon on '{path}'")
+        return
+    warm()
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+    try:
+        Daemon(path, idle_timeout).serve()
+    except KeyboardInterrupt:
+        pass
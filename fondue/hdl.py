@@ -0,0 +1,130 @@
+"""Find the modules HDL source files declare and instantiate.
+
+This is not a parser: a single regular expression skips comments and
+strings and picks out declarations and instantiations, which is right for
+ordinary code and fast enough to scan whole IP libraries. Files are read
+through mmap, so they are never copied into memory.
+"""
+import os
+import sys
+import mmap
+import hashlib
+import collections
+import re
+
+SourceInfo = collections.namedtuple('SourceInfo',
+                                    'digest declares instantiates')
+
+VERILOG = 'verilog'
+VHDL = 'vhdl'
+
+LANGUAGES = {
+    '.v': VERILOG,
+    '.vh': VERILOG,
+    '.sv': VERILOG,
+    '.svh': VERILOG,
+    '.vhd': VHDL,
+    '.vhdl': VHDL,
+}
+
+# Words which can start a statement looking like "<type> <name> (" or
+# "<type> #(" without being a module instantiation.
+_VERILOG_KEYWORDS = frozenset(b'''
+    always always_comb always_ff always_latch and assert assign assume
+    automatic begin bit buf bufif0 bufif1 byte case casex casez class cmos
+    const constraint cover default defparam disable do else end endcase
+    endclass endfunction endgenerate endinterface endmodule endpackage
+    endprogram endtask enum event export extern final for force forever
+    fork function generate genvar if iff import initial inout input int
+    integer interface join join_any join_none local localparam logic
+    longint macromodule modport module nand negedge nmos nor not notif0
+    notif1 or output package parameter pmos posedge primitive program
+    property pulldown pullup rcmos real realtime ref reg release repeat
+    return rnmos rpmos rtran rtranif0 rtranif1 sequence shortint
+    shortreal signed specify static string struct supply0 supply1 task
+    time tran tranif0 tranif1 tri tri0 tri1 triand trior trireg typedef
+    union unique unique0 unsigned var virtual void wait wand while wire
+    wor xnor xor
+'''.split())
+
+# The identifiers end where %(type)s and %(name)s are. They must not be
+# backtracked into, which is slow: possessive quantifiers (Python 3.11) stop
+# that, and before them a lookahead for the character which has to follow.
+_VERILOG_PATTERN = rb'''
+    # Only start matching where one of the alternatives can
+    (?=[/"A-Za-z_])
+  (?://[^\n]*
+  | /\*.*?\*/
+  | "(?:\\.|[^"\\\n])*"
+  | \b(?:module|macromodule|interface|program)\s+
+    (?:(?:static|automatic)\s+)?(?P<declares>[A-Za-z_][\w$]*)
+  | (?<![\w$.`'])(?P<type>[A-Za-z_][\w$]*%(type)s)\s*
+    (?:\#|(?<=\s)(?P<name>[A-Za-z_][\w$]*%(name)s)\s*
+     (?:\[[^\]]*\]\s*)?\())
+'''
+
+
+def _verilog_regex(possessive=sys.version_info >= (3, 11)):
+    if possessive:
+        ends = {b'type': b'+', b'name': b'+'}
+    else:
+        ends = {b'type': rb'(?=[\s\#])', b'name': rb'(?=[\s\[(])'}
+    return re.compile(_VERILOG_PATTERN % ends, re.DOTALL | re.VERBOSE)
+
+
+_VERILOG = _verilog_regex()
+
+_VHDL = re.compile(rb'''
+    --[^\n]*
+  | "[^"\n]*"
+  | \bentity\s+(?P<declares>[a-z_]\w*)\s+is\b
+  | :\s*entity\s+(?:\w+\.)*(?P<entity>[a-z_]\w*)
+  | \w+\s*:\s*(?:component\s+)?(?P<component>[a-z_]\w*)\s+
+    (?:generic|port)\s+map\b
+''', re.DOTALL | re.VERBOSE | re.IGNORECASE)
+
+
+def language(path):
+    """The HDL `path` is written in, or None."""
+    return LANGUAGES.get(os.path.splitext(path)[1].lower())
+
+
+def scan_source(data, lang=VERILOG):
+    """The (declared, instantiated) module names in the source `data`.
+
+    `data` is bytes, or anything else which supports the buffer protocol.
+    VHDL names are returned in lower case.
+    """
+    declares = set()
+    instantiates = set()
+    if lang == VHDL:
+        for match in _VHDL.finditer(data):
+            (declared, entity, component) = match.group(
+                'declares', 'entity', 'component')
+            if declared:
+                declares.add(declared.lower())
+            elif entity or component:
+                instantiates.add((entity or component).lower())
+    else:
+        for match in _VERILOG.finditer(data):
+            (declared, kind, name) = match.group('declares', 'type', 'name')
+            if declared:
+                declares.add(declared)
+            elif kind and kind not in _VERILOG_KEYWORDS and \
+                    name not in _VERILOG_KEYWORDS:
+                instantiates.add(kind)
+    return ({x.decode('utf-8', 'replace') for x in declares},
+            {x.decode('utf-8', 'replace') for x in instantiates})
+
+
+def scan_file(path, lang=None):
+    """Hash and scan the source file at `path`. Returns a SourceInfo."""
+    lang = lang or language(path)
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return SourceInfo(hashlib.sha256().hexdigest(), (), ())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            digest = hashlib.sha256(data).hexdigest()
+            (declares, instantiates) = scan_source(data, lang)
+    return SourceInfo(digest, tuple(sorted(declares)),
+                      tuple(sorted(instantiates)))
@@ -1,4 +1,9 @@
+import os
+import json
+import queue
+import atexit
 import logging
+import logging.handlers
 
 logger = logging.getLogger(__name__)
 
@@ -19,56 +24,161 @@ COLOR_MAP = {
     'DEBUG': WHITE,
 }
 
+# Records from fondue.timing carry a `timing` dict of fields
+TIMING_LOGGER = 'fondue.timing'
+
 
 class ColoredFormatter(logging.Formatter):
 
     def __init__(self, msg, monochrome):
         super(ColoredFormatter, self).__init__(msg)
         self.monochrome = monochrome
+        self._colors = {} if monochrome else {
+            levelname: COLOR_SEQ % (30 + color)
+            for (levelname, color) in COLOR_MAP.items()
+        }
 
     def format(self, record):
         uncolored = super(ColoredFormatter, self).format(record)
-        levelname = record.levelname
-        if not self.monochrome and (levelname in COLOR_MAP):
-            color_seq = COLOR_SEQ % (30 + COLOR_MAP[levelname])
-            formatted = color_seq + uncolored + RESET_SEQ
-        else:
-            formatted = uncolored
-        return formatted
+        color_seq = self._colors.get(record.levelname)
+        if color_seq is None:
+            return uncolored
+        return color_seq + uncolored + RESET_SEQ
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats timing records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {'time': round(record.created, 6), 'pid': record.process}
+        entry.update(record.timing)
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+
+    def prepare(self, record):
+        # The stock QueueHandler formats every record here and the real
+        # handlers format it again; only merge the arguments into the
+        # message, and leave the formatting to the listener thread.
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _is_timing(record):
+    return hasattr(record, 'timing')
+
+
+_listener = None
+# The handlers which do the actual writing, and those attached to loggers
+_handlers = []
+_attached = []
+# Whether stop_logging is registered to run at exit
+_registered = False
 
+# Which packages do we want to log from.
+_PACKAGES = ('__main__', 'fondue',)
 
-def setup_logging(level, monchrome=False):
+
+def _attach(handlers):
+    global _attached
+    for package in _PACKAGES:
+        package_logger = logging.getLogger(package)
+        for handler in _attached:
+            package_logger.removeHandler(handler)
+        for handler in handlers:
+            package_logger.addHandler(handler)
+    _attached = list(handlers)
+
+
+def stop_logging():
+    """Flush and detach the handlers installed by setup_logging."""
+    global _listener, _handlers
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+    _attach([])
+    for handler in _handlers:
+        handler.close()
+    _handlers = []
+
+
+def _after_fork_in_child():
+    # The listener thread does not survive a fork, so forked workers log
+    # straight to the handlers instead.
+    global _listener
+    if _listener is None:
+        return
+    _listener = None
+    _attach(_handlers)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def setup_logging(level, monchrome=False, log_file=None, timing_file=None):
     '''
     Utility function for setting up logging.
+
+    Loggers only put records on a queue; a listener thread formats and
+    writes them, so logging never waits on the terminal or the disk. With
+    `log_file`, everything down to debug messages is also written there.
+    With `timing_file`, the phase durations recorded through fondue.timing
+    are appended to it as JSON lines.
     '''
-    # Logging to file
-    logging.basicConfig(filename='fusesoc.log',
-                        filemode='w', level=logging.DEBUG)
+    global _listener, _handlers, _registered
+    stop_logging()
+
+    handlers = []
     # Pretty color terminal logging
     ch = logging.StreamHandler()
-    ch.setLevel(logging.DEBUG)
-    formatter = ColoredFormatter(
-        "%(levelname)s: %(message)s", monochrome=monchrome)
-    ch.setFormatter(formatter)
-    # Which packages do we want to log from.
-    packages = ('__main__', 'fondue',)
-    for package in packages:
-        logger = logging.getLogger(package)
-        logger.addHandler(ch)
-        logger.setLevel(level)
-    # Warning only packages
-    warning_only_packages = []
-    for package in warning_only_packages:
-        logger = logging.getLogger(package)
-        logger.addHandler(ch)
-        logger.setLevel(logging.WARNING)
+    ch.setLevel(level)
+    ch.setFormatter(ColoredFormatter(
+        "%(levelname)s: %(message)s", monochrome=monchrome))
+    ch.addFilter(lambda record: not _is_timing(record))
+    handlers.append(ch)
+    if log_file:
+        fh = logging.FileHandler(log_file, mode='w')
+        fh.setLevel(logging.DEBUG)
+        fh.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        handlers.append(fh)
+    if timing_file:
+        th = logging.FileHandler(timing_file, mode='a')
+        th.setFormatter(JsonFormatter())
+        th.addFilter(_is_timing)
+        handlers.append(th)
+
+    handler = _QueueHandler(queue.SimpleQueue())
+    _handlers = handlers
+    _listener = logging.handlers.QueueListener(
+        handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    if not _registered:
+        atexit.register(stop_logging)
+        _registered = True
+
+    _attach([handler])
+    for package in _PACKAGES:
+        logging.getLogger(package).setLevel(
+            logging.DEBUG if log_file else level)
+    logging.getLogger(TIMING_LOGGER).setLevel(
+        logging.DEBUG if timing_file else logging.NOTSET)
     logger.debug(f'Setup logging at level {level}.')
 
 
-def init_logging(verbose, monochrome):
+def init_logging(verbose, monochrome, log_file=None, timing_file=None):
     level = logging.DEBUG if verbose else logging.INFO
 
-    setup_logging(level=level, monchrome=monochrome)
+    setup_logging(level=level, monchrome=monochrome, log_file=log_file,
+                  timing_file=timing_file)
 
     if verbose:
         logger.debug("Verbose output")
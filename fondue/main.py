@@ -2,62 +2,167 @@
 import click
 import importlib
 import os
-import yaml
+import time
 
 from fondue import __version__
+from fondue import timing
 from fondue.logging import init_logging
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Top-level commands, as name -> (target, short help). Targets are only
+# imported when the command is actually invoked, so keep this in sync with the
+# packages under fondue/ (tests/test_main.py checks that it is).
+commands = {
+    'core': ('fondue.core:group', 'Work with core files.'),
+    'daemon': ('fondue.daemon:cmd', 'Runs a server which keeps fondue warm.'),
+    'project': ('fondue.project:group', 'Work with project files.'),
+    'registry': ('fondue.registry:group', 'Share cores through a registry.'),
+    'watch': ('fondue.watch:cmd',
+              'Keeps the core index and file lists up to date.'),
+}
+
+
+def _load(target):
+    module_name, _, attr = target.partition(':')
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _entry_points(group):
+    from importlib.metadata import entry_points
+
+    eps = entry_points()
+    if hasattr(eps, 'select'):
+        eps = eps.select(group=group)
+    else:
+        eps = eps.get(group, [])
+    return {ep.name: ep for ep in eps}
+
+
+def discover_commands(package):
+    """Find the commands of `package` by importing everything in it.
+
+    Subpackages provide a `group`, modules provide a `cmd`. This is what the
+    command manifests are checked against; it is far too slow to do on every
+    invocation.
+    """
+    module_dir = os.path.dirname(importlib.import_module(package).__file__)
+    exclude_subdirs = ['static']
+    exclude_files = []
+    cmds = {}
+    for entry in os.scandir(module_dir):
+        if entry.name.startswith('_') or entry.name.startswith('.'):
+            continue
+        if entry.is_dir():
+            if entry.name in exclude_subdirs:
+                continue
+            target = f'{package}.{entry.name}:group'
+        elif entry.name.endswith('.py') and entry.name not in exclude_files:
+            target = f'{package}.{entry.name[:-3]}:cmd'
+        else:
+            continue
+        try:
+            cmd = _load(target)
+        except ImportError:
+            pass
+        except AttributeError:
+            pass
+        else:
+            cmds[cmd.name or entry.name] = cmd
+    return cmds
+
 
 class ComplexCLI(click.MultiCommand):
-    def __init__(self, filename, module, *args, **kwargs):
-        self._module_dir = os.path.dirname(filename)
-        self._module_name = module
+    """A command group whose subcommands are imported on first use.
+
+    `commands` is a manifest mapping command names to (target, short help)
+    pairs, where target is a 'module:attribute' path. Plugins can add further
+    commands through the `entry_points` group.
+    """
+
+    def __init__(self, commands, entry_points=None, *args, **kwargs):
+        self._manifest = commands
+        self._entry_point_group = entry_points
+        self._plugins = None
         self._cmds = {}
         super().__init__(*args, **kwargs)
 
-        exclude_subdirs = ['static']
-        exclude_files = []
-        for root, dirs, files in os.walk(self._module_dir):
-            root = os.path.relpath(root, self._module_dir)
-            dirs = [x for x in dirs if
-                    not x.startswith('_') and
-                    not x.startswith('.') and
-                    x not in exclude_subdirs]
-            files = [x for x in files if
-                     not x.startswith('_') and
-                     not x.startswith('.') and
-                     x not in exclude_files]
-            for d in dirs:
-                name = os.path.basename(d)
-                try:
-                    mod = importlib.import_module('fondue.'+name)
-                    self._cmds[name] = mod.group
-                except ImportError:
-                    pass
-                except AttributeError:
-                    pass
-            for f in files:
-                name = f[:-3]
-                try:
-                    mod = importlib.import_module('.'+name, self._module_name)
-                    self._cmds[name] = mod.cmd
-                except ImportError:
-                    pass
-                except AttributeError:
-                    pass
+    def _get_plugins(self):
+        if self._plugins is None:
+            if self._entry_point_group:
+                self._plugins = _entry_points(self._entry_point_group)
+            else:
+                self._plugins = {}
+        return self._plugins
 
     def list_commands(self, ctx):
-        return self._cmds.keys()
+        names = set(self._manifest)
+        names.update(self._get_plugins())
+        return sorted(names)
 
     def get_command(self, ctx, name):
+        if name not in self._cmds:
+            if name in self._manifest:
+                with timing.span('import', command=name):
+                    cmd = _load(self._manifest[name][0])
+            elif name in self._get_plugins():
+                with timing.span('import', command=name):
+                    cmd = self._get_plugins()[name].load()
+            else:
+                return None
+            self._cmds[name] = cmd
         return self._cmds[name]
 
+    def format_commands(self, ctx, formatter):
+        rows = []
+        for name in self.list_commands(ctx):
+            if name in self._manifest and name not in self._cmds:
+                rows.append((name, self._manifest[name][1]))
+                continue
+            cmd = self.get_command(ctx, name)
+            if cmd is None or cmd.hidden:
+                continue
+            rows.append((name, cmd))
+
+        if rows:
+            limit = formatter.width - 6 - max(len(row[0]) for row in rows)
+            rows = [
+                (name, help if isinstance(help, str)
+                 else help.get_short_help_str(limit))
+                for (name, help) in rows
+            ]
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
+
+
+def _profile(ctx, param, value):
+    # Eager, so that importing the subcommand is profiled too
+    if not value:
+        return
+    timing.start_profile()
+    ctx.call_on_close(lambda: click.echo(
+        timing.format_profile_summary(timing.profile_summary()), err=True))
+
 
-@click.command(cls=ComplexCLI, filename=__file__, module=__name__)
+def _profile_stats(ctx, param, path):
+    if not path:
+        return
+    import cProfile
+    profiler = cProfile.Profile()
+
+    def dump():
+        profiler.disable()
+        profiler.dump_stats(path)
+        logger.info(f"Wrote profile statistics to '{path}'")
+
+    ctx.call_on_close(dump)
+    profiler.enable()
+
+
+@click.command(cls=ComplexCLI, commands=commands,
+               entry_points='fondue.commands')
 @click.option("--verbose", "-v",
               default=False, help='More verbose logging',
               is_flag=True)
@@ -65,10 +170,30 @@ class ComplexCLI(click.MultiCommand):
               default=False,
               help="Don't use color for messages",
               is_flag=True)
+@click.option("--log-file", metavar="<path>", type=click.Path(dir_okay=False),
+              help="Also write a debug log of this run to <path>")
+@click.option("--timing-log", metavar="<path>", envvar='FONDUE_TIMING_LOG',
+              type=click.Path(dir_okay=False),
+              help="Append the duration of each phase of this run to <path> "
+              "as JSON lines ($FONDUE_TIMING_LOG)")
+@click.option("--profile", is_flag=True, default=False, is_eager=True,
+              expose_value=False, callback=_profile,
+              help="Print how long each phase of this run took")
+@click.option("--profile-stats", metavar="<path>", is_eager=True,
+              expose_value=False, callback=_profile_stats,
+              type=click.Path(dir_okay=False),
+              help="Profile this run with cProfile and write the statistics "
+              "to <path> (see the pstats module)")
 @click.pass_context
-def main(ctx, verbose, monochrome):
+def main(ctx, verbose, monochrome, log_file, timing_log):
+
+    init_logging(verbose, monochrome, log_file=log_file,
+                 timing_file=timing_log)
 
-    init_logging(verbose, monochrome)
+    start = time.perf_counter()
+    ctx.call_on_close(lambda: timing.record(
+        'command', time.perf_counter() - start,
+        command=timing.command_line()))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,18 @@
+"""The permissions new files get. This module is imported by the console
+entry point, so it only imports the standard library."""
+import os
+
+
+def current_umask():
+    """The process umask, read without changing it (which would race with
+    other threads creating files)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
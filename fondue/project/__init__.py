@@ -6,4 +6,14 @@ from fondue.main import ComplexCLI
 
 logger = logging.getLogger(__name__)
 
-group = ComplexCLI(__file__, __name__, short_help="Work with project files.")
+commands = {
+    'add': ('fondue.project.add:cmd',
+            'Adds a core to a project from the core store.'),
+    'build': ('fondue.project.build:cmd', 'Builds every core in a project.'),
+    'filelist': ('fondue.project.filelist:cmd',
+                 'Writes file lists for every core in a project.'),
+    'init': ('fondue.project.init:cmd', 'Initializes a project'),
+}
+
+group = ComplexCLI(commands, 'fondue.project.commands',
+                   short_help="Work with project files.")
@@ -0,0 +1,76 @@
+import os
+import logging
+
+import click
+
+from fondue.core.loader import CoreFormatError, format_vlnv
+from fondue.core.store import CoreStore, check_vlnv
+from fondue.resolver import parse_dependency
+
+logger = logging.getLogger(__name__)
+
+
+def core_file(path):
+    if os.path.isdir(path):
+        paths = [x for x in os.listdir(path) if x.endswith('.ffc')]
+        if len(paths) != 1:
+            raise click.UsageError(
+                f"Expected exactly one .ffc file in '{path}'")
+        path = os.path.join(path, paths[0])
+    return path
+
+
+@click.command('add',
+               options_metavar="[<options>]",
+               short_help='Adds a core to a project from the core store.')
+@click.argument("core", metavar="<core>")
+@click.option("--directory", metavar="<directory>", default='.',
+              type=click.Path(file_okay=False),
+              help="The project directory (default: the current directory)")
+@click.option("--to", "destination", metavar="<directory>",
+              help="Where to put the core (default: "
+              "<directory>/cores/<name>)")
+def cmd(core, directory, destination):
+    """ Adds a core to a project, through the shared core store.
+
+        <core> is a core file or directory, which is stored first, or a
+        core in the store such as 'acme:io:uart' or 'uart >=1.2' (the
+        highest matching version is used).
+
+        The store keeps one read-only copy of every file, shared by every
+        project, and project files are hard links to it where the
+        filesystem allows (otherwise reflinks, or copies), so adding a
+        stored core copies no data.
+    """
+    store = CoreStore()
+    if os.path.exists(core):
+        try:
+            stored = store.add(core_file(core))
+        except (CoreFormatError, ValueError) as e:
+            raise click.ClickException(str(e))
+    else:
+        try:
+            dependency = parse_dependency(core)
+        except ValueError as e:
+            raise click.UsageError(str(e))
+        stored = store.find(dependency)
+        if stored is None:
+            raise click.ClickException(f"No stored core matches '{core}'")
+
+    if not destination:
+        # The name comes from manifest data: never let it leave cores/
+        try:
+            name = check_vlnv(stored.vlnv).name
+        except ValueError as e:
+            raise click.ClickException(str(e))
+        destination = os.path.join(directory, 'cores', name)
+    try:
+        counts = store.checkout(stored, destination)
+    except FileExistsError:
+        raise click.ClickException(
+            f"Cannot add {format_vlnv(stored.vlnv)}: '{destination}' "
+            "exists and is not empty")
+    how = ', '.join(f"{count} {name}" for (name, count) in
+                    sorted(counts.items()))
+    click.echo(f"Added {format_vlnv(stored.vlnv)} to '{destination}' "
+               f"({sum(counts.values())} files: {how or 'none'})")
@@ -0,0 +1,102 @@
+import os
+import logging
+import functools
+
+import click
+
+from fondue.core.build import build, resolved_cores
+from fondue.core.loader import CoreFormatError
+from fondue.resolver import ResolutionError
+from fondue.scheduler import Job, JobServer, Scheduler
+
+logger = logging.getLogger(__name__)
+
+# Directories which never contain project cores
+_SKIP = {'obj_dir'}
+
+
+def project_cores(directory):
+    """Every .ffc core file below `directory`, in a stable order."""
+    paths = []
+    for (root, dirs, files) in os.walk(directory):
+        dirs[:] = sorted(x for x in dirs
+                         if not x.startswith('.') and x not in _SKIP)
+        paths.extend(os.path.join(root, x) for x in sorted(files)
+                     if x.endswith('.ffc'))
+    return paths
+
+
+def _build(path, kwargs, output):
+    return build(path, output=output, **kwargs).status
+
+
+def build_jobs(paths, base, **kwargs):
+    """One build Job per core file in `paths`.
+
+    A core's job requires the jobs of the other cores in `paths` which it
+    depends on, directly or through other cores. Dependencies are resolved
+    here, so the jobs themselves only read the lockfiles.
+    """
+    paths = [os.path.abspath(x) for x in paths]
+    names = {path: os.path.relpath(path, base) for path in paths}
+    jobs = []
+    for path in paths:
+        requires = [names[x] for x in
+                    (os.path.abspath(core.path)
+                     for core in resolved_cores(path)[:-1])
+                    if x in names]
+        jobs.append(Job(names[path],
+                        functools.partial(_build, path, kwargs), requires))
+    return jobs
+
+
+def _report(result, done, total):
+    status = result.status
+    if result.error is not None:
+        status += f': {result.error}'
+    click.echo(f"[{done}/{total}] {result.name}: {status} "
+               f"({result.elapsed:.1f} s)")
+    if result.output:
+        click.echo(result.output, nl=not result.output.endswith('\n'))
+
+
+@click.command('build',
+               options_metavar="[<options>]",
+               short_help='Builds every core in a project.')
+@click.argument("directory", metavar="[<directory>]", required=False,
+                default='.', type=click.Path(exists=True, file_okay=False))
+@click.option("--jobs", "-j", type=click.IntRange(min=1),
+              help="Number of builds to run at once (default: one per CPU)")
+@click.option("--keep-going", "-k", is_flag=True, default=False,
+              help="Keep building what does not depend on a failed build")
+@click.option("--sim", is_flag=True, default=False,
+              help="Build simulations instead of plain models")
+@click.option("--option", "-O", "options", multiple=True, metavar="<flag>",
+              help="Extra Verilator flag (may be repeated)")
+@click.option("--verilator", envvar='VERILATOR', default='verilator',
+              show_default=True, metavar="<path>",
+              help="Verilator executable ($VERILATOR)")
+def cmd(directory, jobs, keep_going, sim, options, verilator):
+    """ Builds every core file below <directory> with Verilator.
+
+        <directory> defaults to the current directory. Cores are built in
+        parallel, each after the project cores it depends on, and builds
+        are cached like those of 'fondue core build'. When run from a make
+        recipe, the make jobserver limits the number of builds too.
+    """
+    paths = project_cores(directory)
+    if not paths:
+        raise click.ClickException(f"No core files in '{directory}'")
+    try:
+        targets = build_jobs(paths, directory, sim=sim, options=options,
+                             verilator=verilator)
+    except (CoreFormatError, ResolutionError) as e:
+        raise click.ClickException(str(e))
+
+    scheduler = Scheduler(jobs=jobs, jobserver=JobServer.from_environment(),
+                          keep_going=keep_going, report=_report)
+    results = scheduler.run(targets)
+    failed = [x.name for x in results if x.status == 'failed']
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(results)} "
+                                   "builds failed")
@@ -0,0 +1,44 @@
+import os
+import logging
+
+import click
+
+from fondue.core.filelist import FORMATS, filelist_options, write_filelists
+from fondue.core.loader import CoreFormatError
+from fondue.project.build import project_cores
+from fondue.resolver import ResolutionError
+
+logger = logging.getLogger(__name__)
+
+
+@click.command('filelist',
+               options_metavar="[<options>]",
+               short_help='Writes file lists for every core in a project.')
+@click.argument("directory", metavar="[<directory>]", required=False,
+                default='.', type=click.Path(exists=True, file_okay=False))
+@filelist_options
+def cmd(directory, formats, output_dir, sim):
+    """ Writes file lists and tool scripts for every core file below
+        <directory>, like 'fondue core filelist'.
+
+        <directory> defaults to the current directory. The lists of
+        <directory>/a/uart.ffc are written to <output-dir>/a/uart.<format>.
+        Only lists whose contents change are written.
+    """
+    paths = project_cores(directory)
+    if not paths:
+        raise click.ClickException(f"No core files in '{directory}'")
+    written = []
+    for path in paths:
+        output = os.path.join(output_dir, os.path.splitext(
+            os.path.relpath(path, directory))[0])
+        try:
+            written += write_filelists(path, output,
+                                       formats or sorted(FORMATS), sim=sim)
+        except (CoreFormatError, ResolutionError) as e:
+            raise click.ClickException(str(e))
+    for filelist in written:
+        if filelist.changed:
+            click.echo(f"{filelist.path}: written")
+    click.echo(f"{sum(x.changed for x in written)} of {len(written)} "
+               "file lists written")
@@ -5,13 +5,12 @@ import shutil
 import collections
 import distutils.dir_util
 import copy
-import pkg_resources
 from os import listdir
 from os.path import exists, isdir
 from distutils.errors import DistutilsFileError
 from tempfile import TemporaryDirectory
 
-from fondue.templates import TemplateRepo
+from fondue.templates import TemplateRepo, list_templates, list_tools
 import click
 
 logger = logging.getLogger(__name__)
@@ -97,20 +96,16 @@ def _gather_templates(args):
     return templates
 
 
-templates = pkg_resources.resource_listdir('fondue',
-                                           'static/templates/project_init')
-
-
 @click.command('init', short_help='Initializes a project')
 @click.argument('name', metavar='<name>')
 @click.option("--template", help="The top-level template to use")
 @click.option("--sim-tool", help="The sim tool template to use")
 @click.option("--template",
               help="The top-level template to use",
-              type=click.Choice(templates))
+              type=click.Choice(list_templates('project_init')))
 @click.option("--sim-tool",
               help="The sim tool template to use",
-              type=click.Choice(['verilator']))
+              type=click.Choice(list_tools('project_init')))
 @click.option("--directory",
               help="The directory in which to create the project "
               "(defaults to the current directory)",
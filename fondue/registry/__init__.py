@@ -0,0 +1,19 @@
+import logging
+import click
+import os
+
+from fondue.main import ComplexCLI
+
+logger = logging.getLogger(__name__)
+
+commands = {
+    'publish': ('fondue.registry.publish:cmd',
+                'Publishes cores to a registry.'),
+    'pull': ('fondue.registry.pull:cmd',
+             'Pulls cores from a registry into the core store.'),
+    'serve': ('fondue.registry.serve:cmd',
+              'Serves a core store as a registry.'),
+}
+
+group = ComplexCLI(commands, 'fondue.registry.commands',
+                   short_help="Share cores through a registry.")
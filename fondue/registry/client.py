@@ -0,0 +1,214 @@
+import os
+import re
+import json
+import queue
+import tarfile
+import logging
+import contextlib
+import http.client
+import urllib.parse
+import concurrent.futures
+
+from fondue.core.loader import format_vlnv
+from fondue.core.store import (OBJECT_NAME, CoreStore, check_vlnv, select,
+                               tree_digest)
+from fondue.timing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOBS = 8
+
+_DIGEST = re.compile(r'[0-9a-f]{64}$')
+
+
+class RegistryError(Exception):
+    pass
+
+
+def registry_url():
+    """The registry to use: $FONDUE_REGISTRY, or a local 'registry serve'."""
+    return os.environ.get('FONDUE_REGISTRY') or 'http://127.0.0.1:8008'
+
+
+class RegistryClient():
+    """Pulls cores from, and publishes cores to, a fondue registry.
+
+    Requests go over a pool of up to `jobs` persistent HTTP connections,
+    and pull_many() and publish() run `jobs` transfers at a time. Pulled
+    archives are unpacked straight into the core store as they arrive,
+    checking every object against its sha256.
+    """
+
+    def __init__(self, url=None, store=None, jobs=DEFAULT_JOBS, timeout=60):
+        url = urllib.parse.urlsplit(url or registry_url())
+        if url.scheme not in ('http', 'https'):
+            raise RegistryError(f"Unsupported registry URL '{url.geturl()}'")
+        self._connection_class = (http.client.HTTPSConnection
+                                  if url.scheme == 'https' else
+                                  http.client.HTTPConnection)
+        self._netloc = url.netloc
+        self._base = url.path.rstrip('/')
+        self._timeout = timeout
+        self._pool = queue.LifoQueue()
+        self.jobs = jobs
+        self.store = store or CoreStore()
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @contextlib.contextmanager
+    def _request(self, method, path, body=None, headers={}):
+        """Send a request over a pooled connection and yield the response.
+
+        The connection goes back to the pool if the response was read to
+        the end.
+        """
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection = self._connection_class(self._netloc,
+                                                timeout=self._timeout)
+        try:
+            try:
+                connection.request(method, self._base + path, body=body,
+                                   headers=headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError,
+                    ConnectionResetError):
+                # The server closed an idle connection; retry on a new one
+                connection.close()
+                if hasattr(body, 'seek'):
+                    body.seek(0)
+                connection.request(method, self._base + path, body=body,
+                                   headers=headers)
+                response = connection.getresponse()
+            yield response
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise RegistryError(f"Registry request {method} {path} "
+                                f"failed: {e}")
+        except BaseException:
+            connection.close()
+            raise
+        if response.isclosed() and not response.will_close:
+            self._pool.put(connection)
+        else:
+            connection.close()
+
+    def _json(self, path):
+        with self._request('GET', path) as response:
+            data = response.read()
+            if response.status != 200:
+                raise RegistryError(f"Registry request GET {path} failed: "
+                                    f"{response.status} {response.reason}")
+        return json.loads(data)
+
+    def index(self):
+        """(Vlnv, digest) for every core in the registry."""
+        try:
+            return [(check_vlnv(entry['vlnv']), entry['digest'])
+                    for entry in self._json('/v1/index')]
+        except (ValueError, KeyError, TypeError) as e:
+            raise RegistryError(f"Invalid registry index: {e}")
+
+    def find(self, dependency, index=None):
+        """The (Vlnv, digest) of the highest version in the registry (or in
+        the result of index()) which `dependency` allows, or None."""
+        return select(dependency, self.index() if index is None else index)
+
+    def pull(self, digest):
+        """Fetch the core with manifest `digest` into the store, unless it
+        is already there. Returns its StoredCore."""
+        if not _DIGEST.match(digest):
+            raise RegistryError(f"Invalid core digest '{digest}'")
+        stored = self.store.get(digest)
+        if stored is not None:
+            return stored
+
+        manifest = self._json(f'/v1/manifests/{digest}')
+        try:
+            vlnv = check_vlnv(manifest['vlnv'])
+            files = {path: obj for (path, obj) in manifest['files']}
+        except (ValueError, KeyError, TypeError) as e:
+            raise RegistryError(f"Core {digest} has an invalid manifest: {e}")
+        if not all(isinstance(path, str) and isinstance(obj, str) and
+                   OBJECT_NAME.match(obj) for (path, obj) in files.items()):
+            raise RegistryError(f"Core {digest} has invalid object names")
+        if tree_digest(vlnv, sorted(files.items())) != digest:
+            raise RegistryError(f"Core {digest} does not match its digest")
+        with span('registry.pull', core=vlnv.name) as fields:
+            missing = {obj for obj in files.values()
+                       if not os.path.exists(self.store.object_path(obj))}
+            fields['objects'] = len(missing)
+            if missing:
+                self._fetch_archive(digest, missing)
+            try:
+                return self.store.add_manifest(vlnv, files)
+            except ValueError as e:
+                raise RegistryError(f"Cannot store {format_vlnv(vlnv)}: {e}")
+
+    def _fetch_archive(self, digest, wanted):
+        path = f'/v1/archives/{digest}'
+        with self._request('GET', path) as response:
+            if response.status != 200:
+                response.read()
+                raise RegistryError(f"Registry request GET {path} failed: "
+                                    f"{response.status} {response.reason}")
+            try:
+                with tarfile.open(fileobj=response, mode='r|') as tar:
+                    for member in tar:
+                        if member.name not in wanted or not member.isfile():
+                            continue
+                        self.store.add_object(
+                            tar.extractfile(member),
+                            executable=member.name.endswith('.x'),
+                            digest=member.name[:64])
+                    # Read up to the end, so the connection can be reused
+                    while response.read(64 * 1024):
+                        pass
+            except (tarfile.TarError, ValueError) as e:
+                raise RegistryError(f"Bad archive for core {digest}: {e}")
+
+    def pull_many(self, digests):
+        """Pull several cores, `jobs` at a time. Returns their StoredCores
+        in the same order."""
+        with concurrent.futures.ThreadPoolExecutor(self.jobs) as executor:
+            return list(executor.map(self.pull, digests))
+
+    def publish(self, stored):
+        """Upload the StoredCore `stored` from the store to the registry."""
+        def upload(obj):
+            path = f'/v1/objects/{obj}'
+            with self._request('HEAD', path) as response:
+                response.read()
+                if response.status == 200:
+                    return
+            with open(self.store.object_path(obj), 'rb') as f:
+                headers = {'Content-Length': str(os.fstat(f.fileno()).st_size)}
+                with self._request('PUT', path, f, headers) as response:
+                    body = response.read()
+            if response.status != 201:
+                raise RegistryError(f"Cannot upload object {obj}: "
+                                    f"{response.status} {body.decode()}")
+
+        objects = sorted({obj for (_, obj) in stored.files})
+        with concurrent.futures.ThreadPoolExecutor(self.jobs) as executor:
+            list(executor.map(upload, objects))
+        path = f'/v1/manifests/{stored.digest}'
+        body = json.dumps({'vlnv': list(stored.vlnv),
+                           'files': stored.files}).encode()
+        with self._request('PUT', path, body) as response:
+            reply = response.read()
+        if response.status != 201:
+            raise RegistryError(f"Cannot publish {format_vlnv(stored.vlnv)}: "
+                                f"{response.status} {reply.decode()}")
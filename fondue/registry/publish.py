@@ -0,0 +1,38 @@
+import logging
+
+import click
+
+from fondue.core.loader import CoreFormatError, format_vlnv
+from fondue.core.store import CoreStore
+from fondue.project.add import core_file
+from fondue.registry.client import RegistryClient, RegistryError
+from fondue.registry.pull import registry_options
+
+logger = logging.getLogger(__name__)
+
+
+@click.command('publish',
+               options_metavar="[<options>]",
+               short_help='Publishes cores to a registry.')
+@click.argument("cores", metavar="<core>...", nargs=-1, required=True,
+                type=click.Path(exists=True))
+@registry_options
+def cmd(cores, url, jobs):
+    """ Stores cores and uploads them to a registry.
+
+        Each <core> is a core file, or a directory with one core file;
+        every file in its directory is published. Files the registry
+        already has are not uploaded again.
+    """
+    store = CoreStore()
+    try:
+        stored = [store.add(core_file(x)) for x in cores]
+    except (CoreFormatError, ValueError) as e:
+        raise click.ClickException(str(e))
+    try:
+        with RegistryClient(url, store=store, jobs=jobs) as client:
+            for core in stored:
+                client.publish(core)
+                click.echo(f"Published {format_vlnv(core.vlnv)}")
+    except RegistryError as e:
+        raise click.ClickException(str(e))
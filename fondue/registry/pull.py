@@ -0,0 +1,56 @@
+import logging
+
+import click
+
+from fondue.core.loader import format_vlnv
+from fondue.registry.client import DEFAULT_JOBS, RegistryClient, RegistryError
+from fondue.resolver import parse_dependency
+
+logger = logging.getLogger(__name__)
+
+
+def registry_options(f):
+    for option in reversed([
+        click.option("--url", envvar='FONDUE_REGISTRY', metavar="<url>",
+                     help="The registry ($FONDUE_REGISTRY, default: "
+                     "http://127.0.0.1:8008)"),
+        click.option("-j", "--jobs", type=click.IntRange(min=1),
+                     default=DEFAULT_JOBS, show_default=True,
+                     help="Number of transfers to run at once"),
+    ]):
+        f = option(f)
+    return f
+
+
+@click.command('pull',
+               options_metavar="[<options>]",
+               short_help='Pulls cores from a registry into the core store.')
+@click.argument("cores", metavar="<core>...", nargs=-1, required=True)
+@registry_options
+def cmd(cores, url, jobs):
+    """ Fetches cores from a registry into the local core store.
+
+        Each <core> is a dependency such as 'acme:io:uart' or 'uart >=1.2';
+        the highest matching version in the registry is pulled. Files
+        already in the store are not downloaded again. Use 'fondue project
+        add' to add pulled cores to a project.
+    """
+    try:
+        dependencies = [parse_dependency(x) for x in cores]
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    try:
+        with RegistryClient(url, jobs=jobs) as client:
+            index = client.index()
+            found = []
+            for (text, dependency) in zip(cores, dependencies):
+                entry = client.find(dependency, index)
+                if entry is None:
+                    raise click.ClickException(
+                        f"No core in the registry matches '{text}'")
+                found.append(entry)
+            client.pull_many([digest for (_, digest) in found])
+    except RegistryError as e:
+        raise click.ClickException(str(e))
+    for (vlnv, _) in found:
+        click.echo(f"Pulled {format_vlnv(vlnv)}")
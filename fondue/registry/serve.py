@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import tarfile
+import logging
+import http.server
+
+import click
+
+from fondue.core.loader import format_vlnv
+from fondue.core.store import (OBJECT_NAME, CoreStore, check_vlnv,
+                               tree_digest)
+
+logger = logging.getLogger(__name__)
+
+_DIGEST = re.compile(r'[0-9a-f]{64}$')
+
+
+class _ChunkedWriter():
+    """A file object writing HTTP/1.1 chunked transfer encoding."""
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def write(self, data):
+        if data:
+            self._wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        return len(data)
+
+    def close(self):
+        self._wfile.write(b'0\r\n\r\n')
+
+
+class _BoundedReader():
+    """Reads a request body of known length, and no further."""
+
+    def __init__(self, rfile, length):
+        self._rfile = rfile
+        self._left = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self._left:
+            size = self._left
+        data = self._rfile.read(size) if size else b''
+        self._left -= len(data)
+        return data
+
+    def drain(self):
+        while self.read(1024 * 1024):
+            pass
+
+
+class RegistryHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the cores in `server.store`.
+
+    GET  /v1/index               every core: [{"vlnv": [...], "digest": d}]
+    GET  /v1/manifests/<digest>  the files of a core, as the store has them
+    GET  /v1/archives/<digest>   a tar stream of the core's objects
+    HEAD /v1/objects/<name>      whether an object is stored
+    PUT  /v1/objects/<name>      store an object (checked against its name)
+    PUT  /v1/manifests/<digest>  store a core whose objects are all stored
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # Responses are small and connections are kept alive: send each one
+    # in as few packets as possible, and right away.
+    disable_nagle_algorithm = True
+    wbufsize = 64 * 1024
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, message):
+        self._send_json({'error': message}, status)
+
+    def _route(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) == 2 and parts == ['v1', 'index']:
+            return ('index', None)
+        if len(parts) == 3 and parts[0] == 'v1':
+            pattern = OBJECT_NAME if parts[1] == 'objects' else _DIGEST
+            if pattern.match(parts[2]):
+                return (parts[1], parts[2])
+        return (None, None)
+
+    def do_GET(self):
+        store = self.server.store
+        (kind, name) = self._route()
+        if kind == 'index':
+            self._send_json([{'vlnv': list(core.vlnv), 'digest': core.digest}
+                             for core in store.cores()])
+        elif kind in ('manifests', 'archives'):
+            core = store.get(name)
+            if core is None:
+                return self._error(404, f"No core {name}")
+            if kind == 'manifests':
+                self._send_json({'vlnv': list(core.vlnv),
+                                 'files': core.files})
+            else:
+                self._send_archive(core)
+        else:
+            self._error(404, f"No such resource '{self.path}'")
+
+    def do_HEAD(self):
+        (kind, name) = self._route()
+        if kind != 'objects':
+            return self._error(404, f"No such resource '{self.path}'")
+        exists = os.path.exists(self.server.store.object_path(name))
+        self.send_response(200 if exists else 404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def _send_archive(self, core):
+        store = self.server.store
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-tar')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        out = _ChunkedWriter(self.wfile)
+        with tarfile.open(fileobj=out, mode='w|',
+                          format=tarfile.PAX_FORMAT) as tar:
+            for obj in sorted({obj for (_, obj) in core.files}):
+                with open(store.object_path(obj), 'rb') as f:
+                    # Only the name and the size matter to clients
+                    info = tarfile.TarInfo(obj)
+                    info.size = os.fstat(f.fileno()).st_size
+                    info.mode = 0o444
+                    tar.addfile(info, f)
+        out.close()
+
+    def do_PUT(self):
+        store = self.server.store
+        (kind, name) = self._route()
+        length = self.headers.get('Content-Length', '')
+        if (kind not in ('objects', 'manifests') or not length.isdigit() or
+                not length.isascii()):
+            # Where the body ends is unknown, so nothing can follow it
+            self.close_connection = True
+            return self._error(400, "Expected an object or a manifest, "
+                               "with a Content-Length")
+        body = _BoundedReader(self.rfile, int(length))
+        try:
+            if kind == 'objects':
+                store.add_object(body, executable=name.endswith('.x'),
+                                 digest=name[:64])
+            else:
+                data = json.loads(body.read())
+                vlnv = check_vlnv(data['vlnv'])
+                files = {path: obj for (path, obj) in data['files']}
+                if tree_digest(vlnv, sorted(files.items())) != name:
+                    raise ValueError("The manifest does not match its digest")
+                core = store.add_manifest(vlnv, files)
+                logger.info(f"Published {format_vlnv(core.vlnv)}")
+        except (ValueError, KeyError, TypeError) as e:
+            body.drain()
+            return self._error(400, str(e))
+        self._send_json({'stored': name}, 201)
+
+
+class RegistryServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store):
+        super().__init__(address, RegistryHandler)
+        self.store = store
+
+    @property
+    def url(self):
+        (host, port) = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+@click.command('serve',
+               options_metavar="[<options>]",
+               short_help='Serves a core store as a registry.')
+@click.option("--store", "path", metavar="<directory>",
+              type=click.Path(file_okay=False),
+              help="The core store to serve (default: the local store)")
+@click.option("--host", default='127.0.0.1', show_default=True,
+              help="Address to listen on")
+@click.option("--port", default=8008, show_default=True, type=int,
+              help="Port to listen on (0 picks a free one)")
+def cmd(path, host, port):
+    """ Serves the cores in a core store over HTTP.
+
+        Other fondue installations can then 'fondue registry pull' cores
+        from it and 'fondue registry publish' cores to it. This is a
+        reference server for local use: there is no authentication.
+    """
+    server = RegistryServer((host, port), CoreStore(path))
+    logger.info(f"Serving '{server.store.path}' on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,412 @@
+import re
+import heapq
+import itertools
+import logging
+import operator
+import functools
+import collections
+
+logger = logging.getLogger(__name__)
+
+# A dependency on the core `name` (from any vendor/library if those are
+# None) with a version constraint such as '>=1.2,<2' ('' allows anything).
+Dependency = collections.namedtuple('Dependency',
+                                    'vendor library name constraint')
+
+_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+}
+
+_CLAUSE = re.compile(
+    r'\s*(==|!=|>=|<=|>|<)?\s*([0-9A-Za-z][0-9A-Za-z.+-]*)\s*$')
+
+
+class ResolutionError(Exception):
+    pass
+
+
+@functools.lru_cache(maxsize=None)
+def version_key(version):
+    """A sort key for version strings: '1.10' > '1.9', '1.0' == '1.0.0'."""
+    parts = [(1, int(x)) if x.isdigit() else (0, x)
+             for x in re.findall(r'\d+|[A-Za-z]+', version)]
+    while parts and parts[-1] == (1, 0):
+        parts.pop()
+    return tuple(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def parse_constraint(constraint):
+    """Parse '>=1.2,<2' into a tuple of (operator, version key) clauses."""
+    clauses = []
+    for clause in constraint.split(','):
+        if not clause.strip() or clause.strip() == '*':
+            continue
+        match = _CLAUSE.match(clause)
+        if not match:
+            raise ValueError(f"Invalid version constraint '{constraint}'")
+        op = _OPERATORS[match.group(1) or '==']
+        clauses.append((op, version_key(match.group(2))))
+    return tuple(clauses)
+
+
+def satisfies(version, constraint):
+    clauses = parse_constraint(constraint)
+    if not clauses:
+        return True
+    if version is None:
+        return False
+    key = version_key(version)
+    return all(op(key, bound) for (op, bound) in clauses)
+
+
+def parse_dependency(text):
+    """Parse a dependency like 'acme:io:uart >=1.2,<2'.
+
+    The core is given as 'name', 'library:name' or 'vendor:library:name'
+    (empty fields match anything); 'vendor:library:name:version' pins an
+    exact version.
+    """
+    text = str(text).strip()
+    core, _, constraint = text.partition(' ')
+    fields = core.split(':')
+    if len(fields) > 4 or not fields[-1 if len(fields) < 4 else 2]:
+        raise ValueError(f"Invalid dependency '{text}'")
+    if len(fields) == 4:
+        if constraint.strip():
+            raise ValueError(f"Invalid dependency '{text}': "
+                             "both a version and a constraint")
+        constraint = '==' + fields.pop()
+    fields = [None] * (3 - len(fields)) + [x or None for x in fields]
+    constraint = constraint.strip()
+    parse_constraint(constraint)
+    return Dependency(fields[0], fields[1], fields[2], constraint)
+
+
+def format_dependency(dependency):
+    core = ':'.join(x or '' for x in dependency[:3])
+    return f'{core} {dependency.constraint}'.strip()
+
+
+def _package(vlnv):
+    return (vlnv.vendor, vlnv.library, vlnv.name)
+
+
+class _Frame():
+    __slots__ = ('package', 'candidates', 'mark', 'conflicts')
+
+    def __init__(self, package, candidates, mark, conflicts):
+        self.package = package
+        self.candidates = candidates
+        self.mark = mark
+        self.conflicts = conflicts
+
+
+class Resolver():
+    """Picks one version of every core needed by some root cores.
+
+    This is a backtracking search over packages (cores with the same
+    vendor, library and name), trying the newest allowed version first:
+
+    - every new constraint immediately narrows the remaining candidates of
+      the package it applies to, and the candidates allowed by each
+      constraint are memoized, since the same ranges come up on every
+      backtrack;
+    - the next package decided is the one with the fewest candidates left;
+    - dead ends jump straight back to the latest decision which caused them
+      instead of retrying every decision in between, and the combination
+      of choices which caused them is memoized so it is never tried again.
+    """
+
+    def __init__(self, cores):
+        self._candidates = collections.defaultdict(list)
+        self._by_name = collections.defaultdict(set)
+        for core in cores:
+            package = _package(core.vlnv)
+            self._candidates[package].append(core)
+            self._by_name[core.vlnv.name].add(package)
+        for candidates in self._candidates.values():
+            candidates.sort(key=lambda x: version_key(x.vlnv.version or ''),
+                            reverse=True)
+        self._packages = {}
+        self._allowed = {}
+
+    def _package_for(self, dependency):
+        key = dependency[:3]
+        if key not in self._packages:
+            packages = [
+                package for package in self._by_name.get(dependency.name, ())
+                if dependency.vendor in (None, package[0]) and
+                dependency.library in (None, package[1])
+            ]
+            if not packages:
+                raise ResolutionError(
+                    f"No core matches '{format_dependency(dependency)}'")
+            if len(packages) > 1:
+                names = ', '.join(sorted(':'.join(x or '' for x in package)
+                                         for package in packages))
+                raise ResolutionError(
+                    f"Dependency '{format_dependency(dependency)}' is "
+                    f"ambiguous, it matches {names}")
+            self._packages[key] = packages[0]
+        return self._packages[key]
+
+    def _allowed_by(self, package, constraint):
+        key = (package, constraint)
+        allowed = self._allowed.get(key)
+        if allowed is None:
+            allowed = self._allowed[key] = frozenset(
+                i for (i, core) in enumerate(self._candidates[package])
+                if satisfies(core.vlnv.version, constraint)
+            )
+        return allowed
+
+    def _narrow(self, package, domain, constraint):
+        """Drop the candidates (indices) in `domain` outside `constraint`."""
+        allowed = self._allowed_by(package, constraint)
+        return tuple(i for i in domain if i in allowed)
+
+    def resolve(self, roots):
+        """Resolve the dependencies of `roots`.
+
+        Returns a dict mapping (vendor, library, name) to the chosen core,
+        including the roots. Raises ResolutionError if there is no
+        consistent choice.
+        """
+        self._selected = {}
+        self._levels = {}
+        # Remaining candidates of the packages which still need deciding
+        self._open = {}
+        # (candidates left, sequence, package) for every change to _open;
+        # stale entries are skipped when popped
+        self._queue = []
+        self._sequence = itertools.count()
+        self._constraints = collections.defaultdict(list)
+        self._requirers = collections.defaultdict(list)
+        self._trail = []
+        self._conflict = None
+        self._watches = collections.defaultdict(list)
+
+        for root in roots:
+            if self._select(root, -1) is not None:
+                raise ResolutionError(self._conflict)
+
+        # One frame per decision level
+        frames = []
+        while self._open:
+            package = self._next_package()
+            frames.append(_Frame(
+                package,
+                map(self._candidates[package].__getitem__,
+                    self._open[package]),
+                len(self._trail),
+                set()
+            ))
+
+            while True:
+                level = len(frames) - 1
+                frame = frames[level]
+                self._undo(frame.mark)
+                for core in frame.candidates:
+                    culprits = self._select(core, level)
+                    if culprits is None:
+                        break
+                    frame.conflicts.update(culprits)
+                    self._undo(frame.mark)
+                else:
+                    # Every candidate failed. Jump straight back to the
+                    # latest decision involved in any of the failures (or
+                    # in ruling out the other candidates); the decisions
+                    # in between cannot fix them.
+                    frame.conflicts.update(self._culprits(
+                        frame.package, self._open[frame.package]))
+                    frame.conflicts.discard(level)
+                    if not frame.conflicts:
+                        raise ResolutionError(self._conflict)
+                    levels = list(frame.conflicts)
+                    self._learn(levels, [frames[x].package for x in levels])
+                    target = max(frame.conflicts)
+                    frame.conflicts.discard(target)
+                    frames[target].conflicts.update(frame.conflicts)
+                    del frames[target + 1:]
+                    continue
+                break
+
+        return dict(self._selected)
+
+    def order(self, selected):
+        """Order the cores of a resolution so dependencies come first.
+
+        Returns a list of (core, required cores) pairs.
+        """
+        ordered = []
+        visited = set()
+        for root in selected:
+            stack = [(root, False)]
+            while stack:
+                package, done = stack.pop()
+                if done:
+                    ordered.append(package)
+                    continue
+                if package in visited:
+                    continue
+                visited.add(package)
+                stack.append((package, True))
+                for dependency in reversed(selected[package].depends):
+                    stack.append((self._package_for(dependency), False))
+        return [
+            (selected[package],
+             tuple(selected[self._package_for(dependency)]
+                   for dependency in selected[package].depends))
+            for package in ordered
+        ]
+
+    def _set_open(self, package, domain):
+        self._open[package] = domain
+        heapq.heappush(self._queue,
+                       (len(domain), next(self._sequence), package))
+
+    def _next_package(self):
+        """The open package with the fewest candidates left."""
+        while True:
+            (size, sequence, package) = self._queue[0]
+            domain = self._open.get(package)
+            if domain is not None and len(domain) == size:
+                return package
+            heapq.heappop(self._queue)
+
+    def _undo(self, mark):
+        while len(self._trail) > mark:
+            (package, previous) = self._trail.pop()
+            if package in self._selected and previous is not False:
+                del self._selected[package]
+                if previous is not None:
+                    self._set_open(package, previous)
+            else:
+                self._constraints[package].pop()
+                self._requirers[package].pop()
+                if previous is False:
+                    continue
+                if previous is None:
+                    del self._open[package]
+                else:
+                    self._set_open(package, previous)
+
+    def _learn(self, levels, packages):
+        """Remember that the current choices for `packages` (decided at
+        `levels`) cannot work together, so the search never retries them.
+        """
+        nogood = tuple((package, self._selected[package])
+                       for package in packages)
+        # Each nogood is watched by one choice which is not currently made;
+        # we are about to undo the latest one.
+        latest = nogood[levels.index(max(levels))][1]
+        self._watches[id(latest)].append(nogood)
+
+    def _check_nogoods(self, core):
+        """Check whether choosing `core` completes a learned nogood."""
+        watching = self._watches.get(id(core))
+        if not watching:
+            return None
+        culprits = None
+        keep = []
+        for (i, nogood) in enumerate(watching):
+            for (package, other) in nogood:
+                if (other is not core and
+                        self._selected.get(package) is not other):
+                    self._watches[id(other)].append(nogood)
+                    break
+            else:
+                culprits = {self._levels[package] for (package, other)
+                            in nogood if other is not core}
+                keep.append(nogood)
+                keep.extend(watching[i + 1:])
+                break
+        self._watches[id(core)] = keep
+        return culprits
+
+    def _culprits(self, package, domain=()):
+        """The decision levels which made `package` need deciding with
+        only `domain` left as candidates.
+
+        That is the earliest level which requires the package, plus, for
+        each candidate not in `domain`, the earliest level with a
+        constraint ruling it out. Keeping explanations small makes
+        backjumps go further back.
+        """
+        requirements = sorted(
+            (self._levels[_package(requirer.vlnv)], constraint)
+            for (constraint, requirer) in zip(self._constraints[package],
+                                              self._requirers[package])
+        )
+        culprits = {requirements[0][0]}
+        domain = set(domain)
+        for i in range(len(self._candidates[package])):
+            if i in domain:
+                continue
+            for (level, constraint) in requirements:
+                if i not in self._allowed_by(package, constraint):
+                    culprits.add(level)
+                    break
+        culprits.discard(-1)
+        return culprits
+
+    def _select(self, core, level):
+        """Select `core` at decision `level`.
+
+        Returns None on success, otherwise the set of earlier decision
+        levels which took part in the conflict.
+        """
+        culprits = self._check_nogoods(core)
+        if culprits is not None:
+            return culprits
+        package = _package(core.vlnv)
+        self._trail.append((package, self._open.pop(package, None)))
+        self._selected[package] = core
+        self._levels[package] = level
+        for dependency in core.depends:
+            try:
+                required = self._package_for(dependency)
+            except ResolutionError as e:
+                self._conflict = str(e)
+                return set()
+            self._constraints[required].append(dependency.constraint)
+            self._requirers[required].append(core)
+
+            if required in self._selected:
+                self._trail.append((required, False))
+                chosen = self._selected[required]
+                if satisfies(chosen.vlnv.version, dependency.constraint):
+                    continue
+                culprits = {self._levels[required]} - {-1}
+            else:
+                previous = self._open.get(required)
+                if previous is None:
+                    domain = range(len(self._candidates[required]))
+                else:
+                    domain = previous
+                self._trail.append((required, previous))
+                domain = self._narrow(required, domain,
+                                      dependency.constraint)
+                self._set_open(required, domain)
+                if domain:
+                    continue
+                culprits = self._culprits(required)
+            self._conflict = self._describe_conflict(required)
+            culprits.discard(level)
+            return culprits
+        return None
+
+    def _describe_conflict(self, package):
+        name = ':'.join(x or '' for x in package)
+        wanted = ', '.join(
+            f"'{constraint or '*'}' (from {requirer.vlnv.name})"
+            for (constraint, requirer) in zip(self._constraints[package],
+                                              self._requirers[package])
+        )
+        return f"No version of {name} satisfies {wanted}"
@@ -0,0 +1,221 @@
+import os
+import re
+import time
+import queue
+import select
+import logging
+import tempfile
+import threading
+import collections
+
+logger = logging.getLogger(__name__)
+
+# `run(output)` is called on a worker thread with a binary file to write
+# the job's output to. It returns a short status such as 'built', or raises
+# to fail the job.
+Job = collections.namedtuple('Job', 'name run requires')
+
+# status is 'failed' or 'skipped' (because a required job failed), or the
+# status returned by the job
+JobResult = collections.namedtuple('JobResult',
+                                   'name status output elapsed error')
+
+
+def _nonblocking_reader(fd):
+    """A non-blocking descriptor reading from the pipe `fd`.
+
+    make and its other clients share the open file description of `fd`, so
+    its flags must not change: this opens the pipe again instead. Where
+    that is not possible, `fd` itself is returned, and reads can block.
+    """
+    try:
+        return os.open(f'/proc/self/fd/{fd}', os.O_RDONLY | os.O_NONBLOCK)
+    except OSError as e:
+        logger.debug(f"Cannot reopen jobserver descriptor {fd}: {e}")
+        return fd
+
+
+class JobServer():
+    """A client of the GNU make jobserver of a parent make.
+
+    Every process under make owns one implicit job slot, and must take a
+    token from the jobserver for each job it runs beside that one.
+    """
+
+    def __init__(self, read_fd, write_fd):
+        self._read = read_fd
+        self._write = write_fd
+
+    @classmethod
+    def from_environment(cls, environ=None):
+        """The jobserver in $MAKEFLAGS, or None if there is none.
+
+        make only shares its jobserver with recipes it knows to be
+        recursive ('+' or $(MAKE)); elsewhere the descriptors are closed.
+        """
+        flags = (os.environ if environ is None else environ).get('MAKEFLAGS')
+        auths = re.findall(r'--jobserver-(?:auth|fds)=(\S+)', flags or '')
+        if not auths:
+            return None
+        auth = auths[-1]
+        try:
+            if auth.startswith('fifo:'):
+                fd = os.open(auth[len('fifo:'):], os.O_RDWR | os.O_NONBLOCK)
+                return cls(fd, fd)
+            (read_fd, write_fd) = (int(x) for x in auth.split(','))
+            os.fstat(read_fd)
+            os.fstat(write_fd)
+            return cls(_nonblocking_reader(read_fd), write_fd)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring the make jobserver '{auth}': {e}")
+            return None
+
+    def acquire(self, timeout=0):
+        """Take a token, or return None if none came within `timeout`."""
+        (readable, _, _) = select.select([self._read], [], [], timeout)
+        if not readable:
+            return None
+        # Another client may have taken the token first. The read never
+        # blocks, or tokens our finished jobs hold could not go back to make
+        # meanwhile.
+        try:
+            return os.read(self._read, 1) or None
+        except (BlockingIOError, InterruptedError):
+            return None
+
+    def release(self, token):
+        os.write(self._write, token)
+
+
+class Scheduler():
+    """Runs a DAG of jobs on up to `jobs` worker threads.
+
+    Jobs are expected to spend their time in subprocesses, so threads are
+    enough to keep every core busy. A job starts once all the jobs it
+    requires have succeeded. Under a make jobserver, every job but one also
+    holds a jobserver token while it runs.
+
+    Each job writes to its own temporary file, and `report` is called with
+    its JobResult as it finishes, so the output of concurrent jobs never
+    interleaves.
+    """
+
+    def __init__(self, jobs=None, jobserver=None, keep_going=False,
+                 report=None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.jobserver = jobserver
+        self.keep_going = keep_going
+        self.report = report
+
+    def run(self, jobs):
+        """Run `jobs` (a list of Job). Returns their JobResults in order."""
+        by_name = collections.OrderedDict((job.name, job) for job in jobs)
+        waiting = {}
+        dependents = collections.defaultdict(list)
+        for job in jobs:
+            unknown = [x for x in job.requires if x not in by_name]
+            if unknown:
+                raise ValueError(f"Job '{job.name}' requires unknown jobs "
+                                 f"{', '.join(unknown)}")
+            waiting[job.name] = set(job.requires)
+            for name in job.requires:
+                dependents[name].append(job.name)
+        _check_acyclic(waiting, dependents)
+
+        ready = collections.deque(
+            name for (name, requires) in waiting.items() if not requires)
+        results = {}
+        events = queue.Queue()
+        # job name -> jobserver token, or None for the implicit slot
+        running = {}
+        implicit_free = True
+        failed = False
+
+        def finish(result):
+            results[result.name] = result
+            if self.report:
+                self.report(result, len(results), len(by_name))
+
+        def skip(name):
+            for dependent in dependents[name]:
+                if dependent not in results:
+                    finish(JobResult(dependent, 'skipped', '', 0.0, None))
+                    skip(dependent)
+
+        while ready or running:
+            while (ready and len(running) < self.jobs and
+                   (self.keep_going or not failed)):
+                if implicit_free or self.jobserver is None:
+                    token = None
+                    implicit_free = False
+                else:
+                    token = self.jobserver.acquire()
+                    if token is None:
+                        break
+                name = ready.popleft()
+                running[name] = token
+                threading.Thread(target=_work,
+                                 args=(by_name[name], events),
+                                 name=f'job {name}', daemon=True).start()
+
+            if not running:
+                break
+            # Poll for jobserver tokens while jobs are ready to start
+            starved = (ready and len(running) < self.jobs and
+                       self.jobserver is not None)
+            try:
+                result = events.get(timeout=0.05 if starved else None)
+            except queue.Empty:
+                continue
+
+            token = running.pop(result.name)
+            if token is None:
+                implicit_free = True
+            else:
+                self.jobserver.release(token)
+            finish(result)
+            if result.status == 'failed':
+                failed = True
+                skip(result.name)
+                continue
+            for dependent in dependents[result.name]:
+                waiting[dependent].discard(result.name)
+                if not waiting[dependent] and dependent not in results:
+                    ready.append(dependent)
+
+        for name in by_name:
+            if name not in results:
+                finish(JobResult(name, 'skipped', '', 0.0, None))
+        return [results[name] for name in by_name]
+
+
+def _work(job, events):
+    start = time.perf_counter()
+    error = None
+    with tempfile.TemporaryFile() as output:
+        try:
+            status = job.run(output)
+        except Exception as e:
+            logger.debug(f"Job '{job.name}' failed", exc_info=True)
+            (status, error) = ('failed', e)
+        output.flush()
+        output.seek(0)
+        text = output.read().decode(errors='replace')
+    events.put(JobResult(job.name, status, text,
+                         time.perf_counter() - start, error))
+
+
+def _check_acyclic(waiting, dependents):
+    counts = {name: len(requires) for (name, requires) in waiting.items()}
+    stack = [name for (name, count) in counts.items() if not count]
+    seen = 0
+    while stack:
+        name = stack.pop()
+        seen += 1
+        for dependent in dependents[name]:
+            counts[dependent] -= 1
+            if not counts[dependent]:
+                stack.append(dependent)
+    if seen != len(counts):
+        cycle = sorted(name for (name, count) in counts.items() if count)
+        raise ValueError(f"Jobs {', '.join(cycle)} depend on each other")
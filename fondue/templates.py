@@ -1,8 +1,236 @@
 import os.path
-import distutils.dir_util
+import logging
+import re
+import json
+import shutil
+import hashlib
+import pathlib
+import tempfile
+import functools
+import importlib.resources
 
 import jinja2
 
+from fondue import __version__
+from fondue.cache import cache_dir, write_atomic
+
+logger = logging.getLogger(__name__)
+
+
+def _template_root():
+    return importlib.resources.files('fondue') / 'static' / 'templates'
+
+
+def _walk_templates(directory, prefix='', record=None):
+    if record:
+        record(directory)
+    for entry in sorted(directory.iterdir(), key=lambda x: x.name):
+        if entry.is_dir():
+            yield from _walk_templates(entry, prefix + entry.name + '/',
+                                       record)
+        elif entry.name.endswith('j2'):
+            yield prefix + entry.name
+
+
+def _build_index(root):
+    """Map 'kind/template' -> tool -> template files, plus directory mtimes.
+
+    Directory mtimes are recorded for every directory walked, down to the
+    nested ones below the tools, but only for real directories (not for
+    templates inside a zipped package). They change whenever a template is
+    added, removed or renamed, which is all the index depends on.
+    """
+    index = {}
+    mtimes = {}
+
+    def record(directory):
+        if isinstance(directory, os.PathLike):
+            mtimes[os.fspath(directory)] = os.stat(directory).st_mtime_ns
+
+    if not root.is_dir():
+        return index, mtimes
+    record(root)
+    for kind in root.iterdir():
+        if not kind.is_dir():
+            continue
+        record(kind)
+        for template in kind.iterdir():
+            if not template.is_dir():
+                continue
+            record(template)
+            tools = index[kind.name + '/' + template.name] = {}
+            for tool in template.iterdir():
+                if tool.is_dir():
+                    tools[tool.name] = list(_walk_templates(tool,
+                                                            record=record))
+    return index, mtimes
+
+
+def _index_is_current(cached):
+    if cached.get('version') != __version__ or not cached.get('mtimes'):
+        return False
+    try:
+        return all(os.stat(path).st_mtime_ns == mtime
+                   for (path, mtime) in cached['mtimes'].items())
+    except OSError:
+        return False
+
+
+def load_index(root, cache_path):
+    """Load the template index for `root`, rebuilding it if it is stale."""
+    try:
+        with open(cache_path) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+    if (cached.get('root') == os.fspath(root) and
+            _index_is_current(cached)):
+        return cached['index']
+
+    index, mtimes = _build_index(root)
+    if mtimes:
+        cached = {
+            'version': __version__,
+            'root': os.fspath(root),
+            'mtimes': mtimes,
+            'index': index,
+        }
+        try:
+            write_atomic(cache_path, json.dumps(cached))
+        except OSError:
+            pass  # the cache is only an optimization
+    return index
+
+
+@functools.lru_cache(maxsize=None)
+def template_index():
+    try:
+        cache = cache_dir()
+    except OSError as e:
+        logger.debug(f"Not caching the template index: {e}")
+        return _build_index(_template_root())[0]
+    return load_index(_template_root(),
+                      os.path.join(cache, 'template-index.json'))
+
+
+def _template_files():
+    """(path relative to the template root, Traversable) for every
+    template, in a stable order."""
+    root = _template_root()
+    for (prefix, tools) in sorted(template_index().items()):
+        for (tool, names) in sorted(tools.items()):
+            for name in names:
+                path = f'{prefix}/{tool}/{name}'
+                yield (path, root.joinpath(*path.split('/')))
+
+
+@functools.lru_cache(maxsize=None)
+def templates_digest():
+    """A digest of the name and contents of every template."""
+    h = hashlib.sha256()
+    for (path, template) in _template_files():
+        data = template.read_bytes()
+        h.update(b'%s\0%d\0' % (path.encode(), len(data)) + data)
+    return h.hexdigest()
+
+
+_DIGEST = re.compile(r'[0-9a-f]{64}$')
+
+
+def snapshot_dir(digest):
+    """Where the templates with digest `digest` are kept by
+    snapshot_templates()."""
+    if not _DIGEST.match(digest or ''):
+        raise ValueError(f"Invalid templates digest {digest!r}")
+    return os.path.join(cache_dir('templates'), digest)
+
+
+def snapshot_templates():
+    """Keep a copy of the current templates in fondue's cache, so that what
+    they generate can still be rendered once they change. Every version
+    of the templates is copied once. Returns their digest."""
+    digest = templates_digest()
+    path = snapshot_dir(digest)
+    if os.path.isdir(path):
+        return digest
+    staging = tempfile.mkdtemp(prefix='.', dir=os.path.dirname(path))
+    try:
+        for (name, template) in _template_files():
+            target = os.path.join(staging, *name.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(template.read_bytes())
+        # Another process may have made the same snapshot meanwhile
+        os.rename(staging, path)
+    except OSError as e:
+        if not os.path.isdir(path):
+            raise
+        logger.debug(f"Not replacing the template snapshot '{path}': {e}")
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return digest
+
+
+@functools.lru_cache(maxsize=None)
+def _snapshot_index(root):
+    return _build_index(pathlib.Path(root))[0]
+
+
+def list_templates(kind):
+    """List the top-level templates available for `kind` (e.g. 'core_init')."""
+    return sorted(prefix.partition('/')[2] for prefix in template_index()
+                  if prefix.startswith(kind + '/'))
+
+
+def list_tools(kind):
+    """List the tool templates (e.g. sim tools) available for `kind`."""
+    tools = template_index().get(kind + '/default', {})
+    return sorted(tool for tool in tools if tool != 'default')
+
+
+_WRITE_BUFFER_SIZE = 64 * 1024
+
+# Environments are shared by every TemplateRepo for the same prefix, so each
+# template is loaded and compiled at most once per process.
+_environments = {}
+
+
+class _BytecodeCache(jinja2.FileSystemBytecodeCache):
+    # Buckets are checksummed against the template source, so edited
+    # templates are recompiled automatically.
+
+    def dump_bytecode(self, bucket):
+        try:
+            super().dump_bytecode(bucket)
+        except OSError:
+            pass  # the cache is only an optimization
+
+
+@functools.lru_cache(maxsize=None)
+def _bytecode_cache():
+    try:
+        return _BytecodeCache(cache_dir('jinja'))
+    except OSError as e:
+        logger.debug(f"Not caching compiled templates: {e}")
+        return None
+
+
+def get_environment(prefix, root=None):
+    env = _environments.get((root, prefix))
+    if env is None:
+        if root is None:
+            loader = jinja2.PackageLoader('fondue',
+                                          'static/templates/' + prefix)
+        else:
+            loader = jinja2.FileSystemLoader(os.path.join(root, prefix))
+        env = _environments[(root, prefix)] = jinja2.Environment(
+            loader=loader,
+            bytecode_cache=_bytecode_cache(),
+            lstrip_blocks=True,
+            trim_blocks=True
+        )
+    return env
+
 
 class Template():
     def __init__(self, repo, jinja_template):
@@ -16,30 +244,39 @@ class Template():
     def render(self, **kwargs):
         return self._template.render(kwargs)
 
+    def generate(self, **kwargs):
+        """Render piece by piece, without building the whole output."""
+        return self._template.generate(kwargs)
+
 
 class TemplateRepo():
-    def __init__(self, prefix):
-        self._env = jinja2.Environment(
-            loader=jinja2.PackageLoader('fondue', 'static/templates/'+prefix),
-            lstrip_blocks=True,
-            trim_blocks=True
-        )
+    """The templates below `prefix`, from fondue's own templates or from
+    the directory `root`, such as a snapshot_dir()."""
+
+    def __init__(self, prefix, root=None):
+        self._env = get_environment(prefix, root)
         self._prefix = prefix
+        self._root = root
 
     def get_templates(self, key):
-        def filterfunc(x):
-            return x.startswith(os.path.normpath(key)+'/') and x.endswith('j2')
-
-        template_names = self._env.list_templates(filter_func=filterfunc)
+        key = os.path.normpath(key)
+        index = (template_index() if self._root is None else
+                 _snapshot_index(self._root))
+        template_names = index.get(self._prefix, {}).get(key, [])
         templates = {}
-        for name in template_names:
-            base_name = name.partition('/')[2]  # remove prefix
+        for base_name in template_names:
+            name = key + '/' + base_name
             templates[base_name] = Template(self, self._env.get_template(name))
         return templates
 
-    def render_template(self, template, file_path, arguments, base=None):
+    def render_template(self, template, file_path, arguments, base=None,
+                        stream=True):
         if base:
             arguments['base'] = base._template
-        distutils.dir_util.mkpath(os.path.dirname(file_path))
-        with open(file_path, 'w') as outfile:
-            outfile.write(template.render(**arguments))
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w', buffering=_WRITE_BUFFER_SIZE) as outfile:
+            if stream:
+                # Memory use stays flat however large the output gets
+                outfile.writelines(template.generate(**arguments))
+            else:
+                outfile.write(template.render(**arguments))
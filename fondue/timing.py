@@ -0,0 +1,131 @@
+import os
+import sys
+import time
+import logging
+import collections
+
+from fondue.logging import TIMING_LOGGER
+
+logger = logging.getLogger(TIMING_LOGGER)
+
+# Groups the phases of one invocation in the timing log
+INVOCATION = os.urandom(6).hex()
+
+# (phase, duration) of every span while --profile is on, otherwise None
+_profile = None
+
+
+def enabled():
+    """Whether timings go anywhere: a timing log, a debug log or --profile."""
+    return _profile is not None or logger.isEnabledFor(logging.DEBUG)
+
+
+def record(phase, duration, **fields):
+    """Record that `phase` took `duration` seconds.
+
+    Records only go anywhere when timings are enabled (see enabled()), so
+    this is cheap to call otherwise.
+    """
+    if _profile is not None:
+        _profile.append((phase, duration))
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    timing = {'invocation': INVOCATION, 'phase': phase,
+              'duration': round(duration, 6)}
+    timing.update(fields)
+    logger.debug(f"{phase}: {duration * 1000:.1f} ms",
+                 extra={'timing': timing})
+
+
+class _Span():
+    __slots__ = ('phase', 'fields', 'start')
+
+    def __init__(self, phase, fields):
+        self.phase = phase
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self.fields
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is not None:
+            self.fields['error'] = exc_type.__name__
+        record(self.phase, time.perf_counter() - self.start, **self.fields)
+        return False
+
+
+class _Discard(dict):
+
+    def __setitem__(self, key, value):
+        pass
+
+    def update(self, *args, **kwargs):
+        pass
+
+
+class _NullSpan():
+    __slots__ = ()
+    _fields = _Discard()
+
+    def __enter__(self):
+        return self._fields
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(phase, **fields):
+    """Time the body of a with statement as `phase`.
+
+    The fields returned can be updated to record results along with the
+    duration. A phase which raises is recorded with an 'error' field.
+    When timings are not enabled this returns a shared do-nothing span,
+    so spans can stay in hot paths.
+    """
+    if _profile is None and not logger.isEnabledFor(logging.DEBUG):
+        return _NULL_SPAN
+    return _Span(phase, fields)
+
+
+def new_invocation():
+    """Start timing another invocation, in a process forked to run one."""
+    global INVOCATION, _profile
+    INVOCATION = os.urandom(6).hex()
+    _profile = None
+
+
+def start_profile():
+    """Keep every span in memory for profile_summary()."""
+    global _profile
+    _profile = []
+
+
+def profile_summary():
+    """(phase, calls, total, mean, max) for every phase timed since
+    start_profile(), slowest first.
+    """
+    phases = collections.OrderedDict()
+    for (phase, duration) in _profile or ():
+        phases.setdefault(phase, []).append(duration)
+    rows = [(phase, len(durations), sum(durations),
+             sum(durations) / len(durations), max(durations))
+            for (phase, durations) in phases.items()]
+    return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def format_profile_summary(rows):
+    width = max([len('phase')] + [len(row[0]) for row in rows])
+    lines = [f"{'phase':<{width}}  {'calls':>6}  {'total ms':>10}  "
+             f"{'mean ms':>10}  {'max ms':>10}"]
+    for (phase, calls, total, mean, longest) in rows:
+        lines.append(f"{phase:<{width}}  {calls:>6}  {total * 1000:>10.1f}  "
+                     f"{mean * 1000:>10.1f}  {longest * 1000:>10.1f}")
+    return '\n'.join(lines)
+
+
+def command_line():
+    return ' '.join([os.path.basename(sys.argv[0])] + sys.argv[1:])
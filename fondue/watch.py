@@ -0,0 +1,421 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import logging
+
+import click
+
+from fondue.core.build import resolved_cores
+from fondue.core.filelist import FORMATS, filelist_options, write_filelists
+from fondue.core.index import CoreIndex, library_roots
+from fondue.core.loader import CoreFormatError, default_cache
+from fondue.core.resolve import is_lock
+from fondue.project.build import _SKIP, project_cores
+from fondue.resolver import ResolutionError
+from fondue.timing import span
+
+logger = logging.getLogger(__name__)
+
+# Wait this long after a change for more changes, but no longer than
+# _MAX_DELAY in all, so a burst of changes is handled in one update
+DEFAULT_DEBOUNCE = 0.025
+_MAX_DELAY = 0.5
+
+# Save the parsed core cache after being idle this long
+_IDLE = 1.0
+
+# From <sys/inotify.h>
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_MASK = (_IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO |
+         _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF | _IN_ONLYDIR)
+
+# struct inotify_event, without the name which follows it
+_EVENT = struct.Struct('iIII')
+
+
+def _skip_dir(name):
+    return name.startswith('.') or name in _SKIP
+
+
+def _walk(top):
+    """(directory, file names) for `top` and every directory below it
+    which fondue looks at."""
+    for (root, dirs, files) in os.walk(top):
+        dirs[:] = [x for x in dirs if not _skip_dir(x)]
+        yield (root, files)
+
+
+class InotifyWatcher():
+    """Watches directory trees through Linux's inotify.
+
+    Every directory is watched, and directories which appear later are
+    watched as soon as they are seen.
+    """
+
+    def __init__(self, paths):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p,
+                                    ctypes.c_uint32)
+        self._rm_watch = libc.inotify_rm_watch
+        self._rm_watch.argtypes = (ctypes.c_int, ctypes.c_int)
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self._dirs = {}
+        try:
+            for path in paths:
+                self._watch_tree(os.path.abspath(path))
+        except OSError:
+            self.close()
+            raise
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _watch_tree(self, top):
+        """Watch `top` and the directories below it. Returns the paths of
+        the files found in them."""
+        found = []
+        for (root, files) in _walk(top):
+            wd = self._add_watch(self._fd, os.fsencode(root), _MASK)
+            if wd < 0:
+                e = ctypes.get_errno()
+                if e in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    continue  # gone already, or not ours to watch
+                raise OSError(e, os.strerror(e), root)
+            self._dirs[wd] = root
+            found.extend(os.path.join(root, x) for x in files)
+        return found
+
+    def _unwatch_tree(self, top):
+        for (wd, path) in list(self._dirs.items()):
+            if path == top or path.startswith(top + os.sep):
+                self._rm_watch(self._fd, wd)
+                del self._dirs[wd]
+
+    def read(self, timeout=None):
+        """The paths which changed since the last call, waiting up to
+        `timeout` seconds (default: forever) for a first change.
+
+        Returns None when changes were lost, so everything must be looked
+        at again.
+        """
+        (ready, _, _) = select.select([self._fd], [], [], timeout)
+        changed = set()
+        lost = False
+        while ready:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                (wd, mask, cookie, length) = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    lost = True
+                    continue
+                if mask & _IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                    continue
+                directory = self._dirs.get(wd)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, name) if name else directory
+                changed.add(path)
+                if not mask & _IN_ISDIR or _skip_dir(name):
+                    continue
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # Files may have appeared before the watch did
+                    changed.update(self._watch_tree(path))
+                elif mask & _IN_MOVED_FROM:
+                    self._unwatch_tree(path)
+        return None if lost else changed
+
+
+class PollingWatcher():
+    """Watches directory trees by looking at them every `interval` seconds,
+    where inotify is not available."""
+
+    def __init__(self, paths, interval=0.5):
+        self._paths = [os.path.abspath(path) for path in paths]
+        self._interval = interval
+        self._stamps = self._stat()
+        self._next = time.monotonic() + interval
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _stat(self):
+        stamps = {}
+        for top in self._paths:
+            for (root, files) in _walk(top):
+                for path in [root] + [os.path.join(root, x) for x in files]:
+                    try:
+                        st = os.stat(path, follow_symlinks=False)
+                    except OSError:
+                        continue
+                    stamps[path] = (st.st_mtime_ns, st.st_size, st.st_ino)
+        return stamps
+
+    def read(self, timeout=None):
+        """Like InotifyWatcher.read()."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            if deadline is not None and deadline < self._next:
+                time.sleep(max(0, deadline - now))
+                return set()
+            time.sleep(max(0, self._next - now))
+            self._next = time.monotonic() + self._interval
+            stamps = self._stat()
+            changed = {path for (path, stamp) in stamps.items()
+                       if self._stamps.get(path) != stamp}
+            changed.update(path for path in self._stamps
+                           if path not in stamps)
+            self._stamps = stamps
+            if changed:
+                return changed
+
+
+def watcher(paths, poll=False):
+    """An InotifyWatcher for `paths`, or a PollingWatcher where inotify
+    cannot be used or `poll` is set."""
+    if not poll:
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError) as e:
+            logger.warning(f"Cannot use inotify ({e}); polling instead")
+    return PollingWatcher(paths)
+
+
+class Watch():
+    """Keeps what fondue derives from core libraries and projects up to
+    date as they change.
+
+    That is the core index with the modules of the cores' HDL files, the
+    cache of parsed core files, and the file lists of the cores in the
+    `projects` directories (see 'fondue project filelist'). Each update
+    only looks at what changed: the directories in the index around the
+    changed paths, and the file lists of the project cores which use a
+    changed core file, or whose dependencies a library core which appeared
+    or changed its VLNV might satisfy.
+    """
+
+    def __init__(self, index, roots, projects=(), output_dir='.',
+                 formats=None, sim=False, jobs=None):
+        self.index = index
+        self.roots = [os.path.abspath(root) for root in roots]
+        self.projects = [os.path.abspath(path) for path in projects]
+        self.output_dir = os.path.abspath(output_dir)
+        self.formats = formats or sorted(FORMATS)
+        self.sim = sim
+        self.jobs = jobs
+        self.cache = default_cache()
+        # project core -> paths of the cores it resolves to
+        self._closures = {}
+        # project core -> names of the cores its dependencies could match,
+        # or None if it did not resolve (any core could be the missing one)
+        self._depends = {}
+        self._outputs = set()
+
+    def _project(self, path):
+        for project in self.projects:
+            if path.startswith(project + os.sep):
+                return project
+        return None
+
+    def _ignored(self, path):
+        name = os.path.basename(path)
+        return (name.startswith('.') or name.endswith('.tmp') or
+                path in self._outputs or is_lock(path))
+
+    def _write_filelists(self, path):
+        project = self._project(path)
+        output = os.path.join(self.output_dir, os.path.splitext(
+            os.path.relpath(path, project))[0])
+        self._outputs.update(f'{output}.{fmt}' for fmt in self.formats)
+        try:
+            cores = resolved_cores(path)
+            written = write_filelists(path, output, self.formats,
+                                      sim=self.sim, cores=cores)
+        except (OSError, CoreFormatError, ResolutionError) as e:
+            logger.warning(f"Cannot write the file lists of '{path}': {e}")
+            # Try again when the core file or the library changes
+            self._closures[path] = {path}
+            self._depends[path] = None
+            return []
+        self._closures[path] = {core.path for core in cores}
+        self._depends[path] = {dependency.name for core in cores
+                               for dependency in core.depends}
+        return written
+
+    def update(self, changed=None):
+        """Bring everything up to date with changes to the paths in
+        `changed`, or with any change if it is None.
+
+        Returns the FileLists of the project cores which were looked at.
+        """
+        written = []
+        with span('watch.update') as fields:
+            if changed is None:
+                self.index.scan(self.roots)
+                self.index.scan_sources(self.jobs)
+                self._closures.clear()
+                self._depends.clear()
+                stale = [path for project in self.projects
+                         for path in project_cores(project)]
+            else:
+                changed = {os.path.abspath(path) for path in changed}
+                changed = {path for path in changed
+                           if not self._ignored(path)}
+                fields['changes'] = len(changed)
+                library = [path for path in changed
+                           if any(path.startswith(root + os.sep)
+                                  for root in self.roots)]
+                library_cores = [path for path in library
+                                 if path.endswith('.ffc')]
+                before = self.index.vlnvs(library_cores)
+                if library:
+                    self.index.update(library)
+                    self.index.update_sources(library, self.jobs)
+                after = self.index.vlnvs(library_cores)
+                # The names of the library cores which appeared, went or
+                # changed their VLNV
+                names = {vlnv.name for path in library_cores
+                         if before.get(path) != after.get(path)
+                         for vlnv in (before.get(path), after.get(path))
+                         if vlnv is not None}
+                cores = {path for path in changed if path.endswith('.ffc')}
+                for path in cores:
+                    try:
+                        self.cache.load(path)
+                    except (OSError, CoreFormatError):
+                        self.cache.discard(path)
+                stale = {path for (path, closure) in self._closures.items()
+                         if closure & cores}
+                stale.update(path for (path, depends) in self._depends.items()
+                             if names and (depends is None or
+                                           depends & names))
+                stale.update(path for path in cores if self._project(path))
+                for path in list(stale):
+                    if not os.path.exists(path):
+                        self._closures.pop(path, None)
+                        self._depends.pop(path, None)
+                        stale.discard(path)
+                stale = sorted(stale)
+            for path in stale:
+                written += self._write_filelists(path)
+            fields['filelists'] = sum(x.changed for x in written)
+        return written
+
+    def run(self, watcher, debounce=DEFAULT_DEBOUNCE):
+        """Update from the changes `watcher` reports, until interrupted."""
+        while True:
+            changed = watcher.read(_IDLE)
+            if changed is not None and not changed:
+                self.cache.save()
+                continue
+            deadline = time.monotonic() + _MAX_DELAY
+            while changed is not None and time.monotonic() < deadline:
+                more = watcher.read(debounce)
+                if more is None:
+                    changed = None
+                elif not more:
+                    break
+                else:
+                    changed |= more
+            if changed is not None:
+                changed = {path for path in changed if not self._ignored(path)}
+                if not changed:
+                    continue
+            start = time.perf_counter()
+            written = self.update(changed)
+            elapsed = time.perf_counter() - start
+            for filelist in written:
+                if filelist.changed:
+                    logger.info(f"{filelist.path}: written")
+            logger.info(f"Updated in {elapsed * 1000:.1f} ms ("
+                        + ("every path" if changed is None else
+                           f"{len(changed)} changed paths") + ")")
+
+
+@click.command('watch',
+               options_metavar="[<options>]",
+               short_help='Keeps the core index and file lists up to date.')
+@click.argument("projects", metavar="[<directory>...]", nargs=-1,
+                type=click.Path(exists=True, file_okay=False))
+@filelist_options
+@click.option("--poll", is_flag=True, default=False,
+              help="Look for changes every half second instead of using "
+              "inotify")
+@click.option("--debounce", metavar="<ms>", default=DEFAULT_DEBOUNCE * 1000,
+              show_default=True, type=click.FloatRange(min=0),
+              help="Wait this long after a change for further changes")
+@click.option("-j", "--jobs", type=click.IntRange(min=1), metavar="<n>",
+              help="Scan HDL files in this many processes "
+              "(default: one per CPU)")
+def cmd(projects, formats, output_dir, sim, poll, debounce, jobs):
+    """ Watches core libraries and projects, and updates what fondue
+        derives from them as soon as they change.
+
+        The core libraries are the indexed ones and those in
+        $FONDUE_LIBRARY_PATH (see 'fondue core index'); their index and
+        HDL modules are kept up to date. The file lists of the cores in
+        each project <directory> are written like 'fondue project
+        filelist' does, and written again whenever the core files they
+        come from change.
+
+        Bursts of changes are handled together. Each update only looks at
+        the directories and cores which changed.
+    """
+    with CoreIndex() as index:
+        roots = sorted(set(index.roots()) |
+                       {os.path.abspath(x) for x in library_roots()})
+        if not roots and not projects:
+            raise click.UsageError("Nothing to watch: give a project "
+                                   "<directory>, or index a core library")
+        watch = Watch(index, roots, projects, output_dir, formats, sim, jobs)
+        # Watch first, so nothing which changes during the update is missed
+        with watcher(roots + watch.projects, poll) as changes:
+            watch.update()
+            logger.info(f"Watching {len(roots)} core libraries and "
+                        f"{len(projects)} projects")
+            try:
+                watch.run(changes, debounce / 1000)
+            except KeyboardInterrupt:
+                pass
+            finally:
+                watch.cache.save()
@@ -42,7 +42,7 @@ setup(
     ],
     entry_points={
         'console_scripts': [
-            'fondue = fondue.main:main'
+            'fondue = fondue.client:main'
         ]
     },
     setup_requires=[
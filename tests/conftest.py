@@ -0,0 +1,43 @@
+import pytest
+
+import fondue.core.build
+
+import sys
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep every test's on-disk caches out of the user's cache directory."""
+    path = tmp_path / 'cache'
+    monkeypatch.setenv('FONDUE_CACHE_DIR', str(path))
+    return path
+
+
+# Stands in for Verilator: records each build and writes an object directory
+FAKE_VERILATOR = '''\
+import os
+import sys
+
+args = sys.argv[1:]
+if args == ['--version']:
+    print('Verilator 0.0 (fake)')
+    sys.exit(0)
+with open(os.environ['FAKE_VERILATOR_LOG'], 'a') as f:
+    f.write(' '.join(args) + '\\n')
+obj_dir = args[args.index('--Mdir') + 1]
+os.makedirs(obj_dir, exist_ok=True)
+with open(os.path.join(obj_dir, 'V' + args[args.index('--top-module') + 1]),
+          'w') as f:
+    f.write('model')
+'''
+
+
+@pytest.fixture
+def verilator(tmp_path, monkeypatch):
+    script = tmp_path / 'verilator'
+    script.write_text(f'#!{sys.executable}\n' + FAKE_VERILATOR)
+    script.chmod(0o755)
+    log = tmp_path / 'verilator.log'
+    monkeypatch.setenv('FAKE_VERILATOR_LOG', str(log))
+    fondue.core.build.tool_version.cache_clear()
+    return str(script), log
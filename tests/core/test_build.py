@@ -0,0 +1,127 @@
+import pytest
+
+import fondue.core.build
+import fondue.core.init
+import fondue.core.sim
+
+import os
+import shutil
+import subprocess
+
+
+def _builds(log):
+    return log.read_text().splitlines() if log.exists() else []
+
+
+@pytest.fixture
+def core(tmp_path):
+    directory = tmp_path / 'uart'
+    fondue.core.init.run({
+        'name': 'uart', 'vendor': None, 'library': None, 'version': None,
+        'template': None, 'sim_tool': 'verilator', 'directory': str(directory)
+    })
+    return directory / 'uart.ffc'
+
+
+def test_build_cache(core, verilator):
+    (tool, log) = verilator
+    obj_dir = core.parent / 'obj_dir' / 'uart'
+
+    result = fondue.core.build.build(core, verilator=tool)
+    assert result.status == 'built'
+    assert result.obj_dir == str(obj_dir)
+    (command,) = _builds(log)
+    assert command.endswith(str(core.parent / 'uart.v'))
+    assert '--exe' not in command
+
+    assert fondue.core.build.build(core, verilator=tool).status == 'up to date'
+
+    # A fresh build directory restores the cached object directory
+    shutil.rmtree(obj_dir)
+    result = fondue.core.build.build(core, verilator=tool)
+    assert result.status == 'restored'
+    assert (obj_dir / 'Vuart').read_text() == 'model'
+    assert len(_builds(log)) == 1
+
+    # So does going back to an earlier version
+    source = (core.parent / 'uart.v').read_text()
+    (core.parent / 'uart.v').write_text(source + '// changed\n')
+    assert fondue.core.build.build(core, verilator=tool).status == 'built'
+    (core.parent / 'uart.v').write_text(source)
+    assert fondue.core.build.build(core, verilator=tool).status == 'restored'
+    assert len(_builds(log)) == 2
+
+    # Flags and simulation sources are part of the key
+    result = fondue.core.build.build(core, verilator=tool, options=['-Wall'])
+    assert result.status == 'built'
+    result = fondue.core.build.build(core, verilator=tool, sim=True)
+    assert result.status == 'built'
+    command = _builds(log)[-1].split()
+    assert '--exe' in command
+    assert str(core.parent / 'verilator-main.cpp') in command
+    assert ['-CFLAGS', '-I' + str(core.parent)] == \
+        command[command.index('-CFLAGS'):command.index('-CFLAGS') + 2]
+
+
+def test_build_cache_safety(core, verilator, tmp_path):
+    (tool, log) = verilator
+    fondue.core.build.build(core, verilator=tool)
+
+    # A cache hit never deletes a directory fondue did not build
+    mine = tmp_path / 'mine'
+    mine.mkdir()
+    (mine / 'notes.txt').write_text('precious')
+    with pytest.raises(fondue.core.build.BuildError, match='Refusing'):
+        fondue.core.build.build(core, verilator=tool, obj_dir=str(mine))
+    assert (mine / 'notes.txt').read_text() == 'precious'
+
+    # Another checkout builds for itself: Verilator's Makefiles hold
+    # absolute paths
+    other = tmp_path / 'other'
+    shutil.copytree(core.parent, other,
+                    ignore=shutil.ignore_patterns('obj_dir'))
+    result = fondue.core.build.build(other / 'uart.ffc', verilator=tool)
+    assert result.status == 'built'
+
+
+def test_build_core_options(core, verilator):
+    (tool, log) = verilator
+    text = core.read_text()
+    core.write_text(text + 'options:\n    common: -Wno-fatal\n'
+                    '    sim: --threads 2\n')
+
+    fondue.core.build.build(core, verilator=tool, options=['-Wall'])
+    command = _builds(log)[-1].split()
+    assert command.index('-Wno-fatal') < command.index('-Wall')
+    assert '--threads' not in command
+    fondue.core.build.build(core, verilator=tool, sim=True)
+    assert '--threads' in _builds(log)[-1].split()
+
+
+def test_build_missing_file(core, verilator):
+    (tool, log) = verilator
+    os.remove(core.parent / 'uart.v')
+    with pytest.raises(fondue.core.build.BuildError):
+        fondue.core.build.build(core, verilator=tool)
+    assert _builds(log) == []
+
+
+def test_sim_arguments(core, verilator, monkeypatch):
+    (tool, log) = verilator
+    runs = []
+    run = subprocess.run
+
+    def run_simulation(argv, **kwargs):
+        if not argv[0].endswith('Vuart'):
+            return run(argv, **kwargs)
+        runs.append(argv)
+        return subprocess.CompletedProcess(argv, 0)
+
+    monkeypatch.setattr(subprocess, 'run', run_simulation)
+    monkeypatch.chdir(core.parent)
+    # The core defaults to the only core file: everything after -- is the
+    # simulation's
+    fondue.core.sim.cmd.main(['--verilator', tool, '--', '--cycles', '10'],
+                             standalone_mode=False)
+    assert runs == [[str(core.parent / 'obj_dir' / 'uart' / 'Vuart'),
+                     '--cycles', '10']]
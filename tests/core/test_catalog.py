@@ -0,0 +1,43 @@
+import fondue.core.catalog
+from fondue.core.loader import Core, Vlnv
+from fondue.resolver import parse_dependency
+
+
+def _cores():
+    return [
+        Core(Vlnv('acme', 'io', 'uart', '1.0'),
+             {'common': ('uart.v',), 'sim': ('verilator-main.cpp', 'uart.h')},
+             '/lib/uart/uart.ffc', (parse_dependency('fifo >=1.0'),)),
+        Core(Vlnv('acme', 'io', 'uart', '2.0'), {'common': ('uart.v',)},
+             '/lib/uart2/uart.ffc', (),
+             {'sim': ('--threads', '2', '-DUART_SIM')}),
+        Core(Vlnv(None, None, 'fifo', '1.0'), {}, '/lib/fifo/fifo.ffc'),
+    ]
+
+
+def test_catalog():
+    cores = _cores()
+    catalog = fondue.core.catalog.Catalog(cores)
+    assert len(catalog) == 3
+    assert [core.as_core() for core in catalog] == cores
+    (uart, uart2, fifo) = catalog
+    assert uart.files == cores[0].files
+    assert uart.path == '/lib/uart/uart.ffc'
+    assert uart2.options == {'sim': ('--threads', '2', '-DUART_SIM')}
+
+    assert catalog.get(('acme', 'io', 'uart', '2.0')) is uart2
+    assert catalog.get(Vlnv('acme', 'io', 'uart', '3.0')) is None
+    assert catalog.named('uart') == [uart, uart2]
+    assert catalog.named('fifo') == [fifo]
+    assert catalog.named('spi') == []
+
+
+def test_catalog_sharing():
+    catalog = fondue.core.catalog.Catalog(_cores())
+    (uart, uart2, fifo) = catalog
+    # Paths and files named after their core are stored once for all
+    assert uart._path == fifo._path
+    assert sorted(catalog._names) == sorted([
+        '/lib/\0/\0.ffc', '/lib/\0' '2/\0.ffc', 'common', 'sim', '\0.v',
+        'verilator-main.cpp', '\0.h', '--threads', '2', '-DUART_SIM'])
+    assert uart.vlnv.vendor is uart2.vlnv.vendor
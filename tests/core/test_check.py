@@ -0,0 +1,100 @@
+import pytest
+
+import fondue.core.build
+import fondue.core.check
+import fondue.core.init
+
+import os
+import sys
+
+# Stands in for 'verilator --lint-only': complains about files saying BAD
+FAKE_LINTER = '''\
+import os
+import sys
+
+args = sys.argv[1:]
+if args == ['--version']:
+    print('Verilator 0.0 (fake)')
+    sys.exit(0)
+with open(os.environ['FAKE_LINTER_LOG'], 'a') as f:
+    f.write(' '.join(args) + '\\n')
+status = 0
+for path in args:
+    if path.endswith('.v') and 'BAD' in open(path).read():
+        print(f'%Warning-BAD: {path}:1:1: bad')
+        status = 1
+sys.exit(status)
+'''
+
+
+def _create_core(directory, name, **kwargs):
+    args = {'name': name, 'vendor': None, 'library': None, 'version': None,
+            'template': None, 'sim_tool': None, 'directory': str(directory)}
+    args.update(kwargs)
+    fondue.core.init.run(args)
+    return str(directory / f'{name}.ffc')
+
+
+@pytest.fixture
+def cores(tmp_path):
+    return [
+        _create_core(tmp_path / 'uart', 'uart', sim_tool='verilator'),
+        _create_core(tmp_path / 'wb', 'wb', template='wb4-slave'),
+    ]
+
+
+@pytest.fixture
+def linter(tmp_path, monkeypatch):
+    script = tmp_path / 'verilator'
+    script.write_text(f'#!{sys.executable}\n' + FAKE_LINTER)
+    script.chmod(0o755)
+    log = tmp_path / 'lint.log'
+    log.write_text('')
+    monkeypatch.setenv('FAKE_LINTER_LOG', str(log))
+    fondue.core.build.tool_version.cache_clear()
+    return str(script), log
+
+
+def test_check(tmp_path, cores):
+    bad = tmp_path / 'bad'
+    bad.mkdir()
+    (bad / 'broken.ffc').write_text('vlnv: [')
+    (bad / 'odd.ffc').write_text('vlnv:\n  name: odd core\n'
+                                 'files:\n  common: odd.v\nextra: 1\n')
+    paths = cores + [str(bad / 'broken.ffc'), str(bad / 'odd.ffc')]
+
+    results = fondue.core.check.check_cores(paths)
+    assert [x.checked for x in results] == [True] * 4
+    problems = {os.path.basename(x.path): x.problems for x in results}
+    assert problems['uart.ffc'] == problems['wb.ffc'] == []
+    assert len(problems['broken.ffc']) == 1
+    assert [x.split(': ', 1)[1] for x in problems['odd.ffc']] == [
+        "unknown section 'extra'",
+        "VLNV field 'name' must not contain ':' or spaces",
+        "common file 'odd.v' does not exist"]
+
+    # Only what changed is checked again
+    (bad / 'odd.v').write_text('')
+    results = fondue.core.check.check_cores(paths)
+    assert [x.checked for x in results] == [False, False, False, True]
+    assert len(results[3].problems) == 2
+
+
+def test_lint(tmp_path, cores, linter):
+    (verilator, log) = linter
+    results = fondue.core.check.check_cores(cores, verilator)
+    assert [x.problems for x in results] == [[], []]
+    assert len(log.read_text().splitlines()) == 2
+
+    source = tmp_path / 'wb' / 'wb.v'
+    source.write_text(source.read_text() + '// BAD\n')
+    results = fondue.core.check.check_cores(cores, verilator)
+    assert [x.checked for x in results] == [False, True]
+    assert results[1].problems == [f'%Warning-BAD: {source}:1:1: bad']
+
+    # Touched files with the same contents are not linted again
+    os.utime(source, ns=(0, 0))
+    results = fondue.core.check.check_cores(cores, verilator)
+    assert [x.checked for x in results] == [False, True]
+    assert len(results[1].problems) == 1
+    assert len(log.read_text().splitlines()) == 3
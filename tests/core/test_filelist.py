@@ -0,0 +1,70 @@
+import pytest
+
+import fondue.core.filelist
+
+import os
+
+
+def _write_core(directory, name, files, depends=()):
+    directory.mkdir(parents=True, exist_ok=True)
+    lines = ['vlnv:', f'  name: {name}', '  version: "1.0"', 'files:']
+    lines.extend(f'  {section}: {names}' for (section, names) in files.items())
+    if depends:
+        lines.append('depends:')
+        lines.extend(f'  - "{x}"' for x in depends)
+    (directory / f'{name}.ffc').write_text('\n'.join(lines) + '\n')
+    for names in files.values():
+        for file_name in names.split():
+            (directory / file_name).write_text('')
+    return directory / f'{name}.ffc'
+
+
+@pytest.fixture
+def core(tmp_path, monkeypatch):
+    library = tmp_path / 'library'
+    _write_core(library / 'fifo', 'fifo', {'common': 'fifo.vhd'})
+    monkeypatch.setenv('FONDUE_LIBRARY_PATH', str(library))
+    return _write_core(tmp_path / 'uart', 'uart', {
+        'common': 'defs.vh uart.sv',
+        'sim': 'main.cpp uart.h',
+    }, ['fifo'])
+
+
+def test_formats(tmp_path, core):
+    fifo = str(tmp_path / 'library' / 'fifo' / 'fifo.vhd')
+    uart = str(tmp_path / 'uart')
+    output = str(tmp_path / 'out' / 'uart')
+    written = fondue.core.filelist.write_filelists(
+        str(core), output, ['f', 'vc', 'tcl'], sim=True)
+    assert written == [(output + '.f', True), (output + '.vc', True),
+                       (output + '.tcl', True)]
+
+    def lines(fmt):
+        with open(f'{output}.{fmt}') as f:
+            return f.read().splitlines()[1:]
+
+    assert lines('f') == [f'+incdir+{uart}', f'{uart}/uart.sv']
+    assert lines('vc') == [f'-I{uart}', f'-CFLAGS -I{uart}',
+                           f'{uart}/uart.sv', f'{uart}/main.cpp']
+    assert lines('tcl') == [
+        f'set_property include_dirs [list {{{uart}}}] [current_fileset]',
+        f'read_vhdl {{{fifo}}}', f'read_verilog -sv {{{uart}/uart.sv}}']
+
+
+def test_unchanged(tmp_path, core):
+    output = str(tmp_path / 'uart')
+    fondue.core.filelist.write_filelists(str(core), output, ['f', 'vc'])
+    os.utime(output + '.f', ns=(0, 0))
+
+    written = fondue.core.filelist.write_filelists(str(core), output,
+                                                   ['f', 'vc'])
+    assert [x.changed for x in written] == [False, False]
+    assert os.stat(output + '.f').st_mtime_ns == 0
+
+    _write_core(tmp_path / 'uart', 'uart', {
+        'common': 'defs.vh uart.sv extra.v',
+        'sim': 'main.cpp uart.h',
+    }, ['fifo'])
+    written = fondue.core.filelist.write_filelists(str(core), output,
+                                                   ['f', 'vc'])
+    assert [x.changed for x in written] == [True, True]
@@ -0,0 +1,111 @@
+import pytest
+
+import fondue.core.index
+import fondue.core.init
+
+import os
+import shutil
+
+
+def _create_core(directory, name, **kwargs):
+    args = {'name': name, 'vendor': None, 'library': None, 'version': None,
+            'template': None, 'sim_tool': None, 'directory': str(directory)}
+    args.update(kwargs)
+    fondue.core.init.run(args)
+
+
+@pytest.fixture
+def library(tmp_path):
+    root = tmp_path / 'library'
+    _create_core(root / 'a' / 'uart', 'uart', vendor='acme', version='1.0')
+    _create_core(root / 'a' / 'spi', 'spi', vendor='acme', library='io',
+                 sim_tool='verilator')
+    _create_core(root / 'b' / 'deep' / 'er' / 'gpio', 'gpio')
+    return root
+
+
+@pytest.fixture
+def index(tmp_path):
+    with fondue.core.index.CoreIndex(str(tmp_path / 'index.sqlite')) as index:
+        yield index
+
+
+def test_scan(library, index):
+    stats = index.scan([str(library)])
+    assert stats.cores == 3
+    assert stats.parsed == 3
+
+    assert [core.vlnv.name for core in index.cores()] == ['gpio', 'spi',
+                                                          'uart']
+    (spi,) = index.cores(vendor='acme', library='io')
+    assert spi.vlnv == ('acme', 'io', 'spi', None)
+    assert spi.path == str(library / 'a' / 'spi' / 'spi.ffc')
+    assert spi.files == {'common': ('spi.v',),
+                         'sim': ('verilator-main.cpp', 'spi.h')}
+    assert index.roots() == [str(library)]
+
+
+def test_find(library, index):
+    index.scan([str(library)])
+    assert [core.vlnv.name for core in index.find('uart')] == ['uart']
+    assert [core.vlnv.name for core in index.find('acme:*')] == ['spi',
+                                                                'uart']
+    assert [core.vlnv.name for core in index.find('*:1.0')] == ['uart']
+    assert index.find('nope') == []
+
+
+def test_incremental_scan(library, index):
+    index.scan([str(library)])
+
+    stats = index.scan()
+    assert (stats.cores, stats.listed, stats.parsed) == (3, 0, 0)
+
+    # Edit a core in place: its directory does not change
+    core = library / 'a' / 'uart' / 'uart.ffc'
+    core.write_text(core.read_text().replace('1.0', '2.0'))
+    os.utime(core, ns=(0, 0))
+    stats = index.scan()
+    assert (stats.listed, stats.parsed) == (0, 1)
+    assert index.find('uart')[0].vlnv.version == '2.0'
+
+    # Add and remove cores
+    _create_core(library / 'b' / 'deep' / 'i2c', 'i2c')
+    shutil.rmtree(library / 'a' / 'spi')
+    stats = index.scan()
+    assert stats.parsed == 1
+    assert stats.removed == 1
+    assert [core.vlnv.name for core in index.cores()] == ['gpio', 'i2c',
+                                                          'uart']
+
+
+def test_bad_core(library, index):
+    (library / 'b' / 'broken.ffc').write_text('vlnv: [')
+    stats = index.scan([str(library)])
+    assert stats.cores == 3
+    assert [path for (path, error) in index.errors()] == [
+        str(library / 'b' / 'broken.ffc')]
+
+
+def test_remove_root(library, index):
+    index.scan([str(library)])
+    index.remove_root(str(library))
+    assert index.roots() == []
+    assert index.cores() == []
+
+
+def test_update(library, index):
+    index.scan([str(library)])
+    core = library / 'a' / 'uart' / 'uart.ffc'
+    core.write_text(core.read_text().replace('1.0', '2.0'))
+    _create_core(library / 'b' / 'deep' / 'i2c', 'i2c')
+    shutil.rmtree(library / 'a' / 'spi')
+
+    stats = index.update([str(core), str(library / 'b' / 'deep' / 'i2c'),
+                          str(library / 'a' / 'spi' / 'spi.ffc'),
+                          '/elsewhere/x.ffc'])
+    assert (stats.parsed, stats.removed) == (2, 1)
+    assert [(core.vlnv.name, core.vlnv.version) for core in index.cores()] \
+        == [('gpio', None), ('i2c', None), ('uart', '2.0')]
+    # Nothing is left for a full scan to find
+    stats = index.scan()
+    assert (stats.parsed, stats.removed) == (0, 0)
@@ -1,6 +1,8 @@
 import pytest
 
+import fondue.core.build
 import fondue.core.init
+import fondue.core.loader
 
 import tempfile
 import errno
@@ -131,6 +133,20 @@ def test_sim_tool():
         assert os.path.exists(header_path) and not os.path.isdir(header_path)
 
 
+def test_sim_tool_fast(tmp_path):
+    directory = tmp_path / 'test_core'
+    fondue.core.init.run({'directory': str(directory), 'name': 'test_core',
+                          'sim_tool': 'verilator-fast', 'template': None})
+
+    core = fondue.core.loader.parse_core(str(directory / 'test_core.ffc'))
+    assert core.files['sim'] == ('verilator-main.cpp', 'test_core.h')
+    flags = fondue.core.build.core_options(core, sim=True)
+    assert flags[flags.index('--threads') + 1] == '2'
+    assert '--trace' in flags
+    assert fondue.core.build.core_options(core) == []
+    assert 'eval' in (directory / 'test_core.h').read_text()
+
+
 def test_template():
     with tempfile.TemporaryDirectory() as target_dir:
         args = {}
@@ -149,3 +165,121 @@ def test_template():
 
         with open(verilog_path) as fgen:
             assert 'wb_cyc_i' in fgen.read()
+
+
+def test_commit_race(monkeypatch):
+    with tempfile.TemporaryDirectory() as parent:
+        target_dir = os.path.join(parent, 'test_core')
+        args = {}
+        args['directory'] = target_dir
+        args['name'] = 'test_core'
+        args['sim_tool'] = None
+        args['template'] = None
+
+        render = fondue.core.init._render_templates
+
+        def racing_render(templates, arguments, directory):
+            render(templates, arguments, directory)
+            os.mkdir(target_dir)
+            with open(os.path.join(target_dir, 'intruder'), 'w') as f:
+                f.write('nope')
+
+        monkeypatch.setattr(fondue.core.init, '_render_templates',
+                            racing_render)
+
+        try:
+            fondue.core.init.run(args)
+        except FileExistsError as e:
+            assert e.errno == errno.EEXIST
+            assert os.listdir(target_dir) == ['intruder']
+            assert os.listdir(parent) == ['test_core']
+        else:
+            assert False
+
+
+@pytest.mark.parametrize('race', [False, True])
+def test_commit_across_filesystems(monkeypatch, tmp_path, race):
+    target_dir = tmp_path / 'parent' / 'test_core'
+    rename = os.rename
+    calls = []
+
+    def cross_device_rename(source, dest):
+        if dest != str(target_dir):
+            return rename(source, dest)
+        calls.append(source)
+        if len(calls) > 1:
+            return rename(source, dest)
+        if race:
+            os.mkdir(target_dir)
+            (target_dir / 'intruder').write_text('nope')
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(os, 'rename', cross_device_rename)
+    args = {'directory': str(target_dir), 'name': 'test_core',
+            'sim_tool': None, 'template': None}
+    if race:
+        with pytest.raises(FileExistsError):
+            fondue.core.init.run(args)
+        assert os.listdir(target_dir) == ['intruder']
+    else:
+        fondue.core.init.run(args)
+        assert sorted(os.listdir(target_dir)) == [
+            '.fondue', 'test_core.ffc', 'test_core.v']
+        umask = os.umask(0)
+        os.umask(umask)
+        assert os.stat(target_dir).st_mode & 0o777 == 0o777 & ~umask
+    assert len(calls) == 2
+    assert os.listdir(target_dir.parent) == ['test_core']
+
+
+def test_commit_permissions():
+    with tempfile.TemporaryDirectory() as parent:
+        target_dir = os.path.join(parent, 'test_core')
+        args = {}
+        args['directory'] = target_dir
+        args['name'] = 'test_core'
+        args['sim_tool'] = None
+        args['template'] = None
+
+        fondue.core.init.run(args)
+
+        umask = os.umask(0)
+        os.umask(umask)
+        assert os.stat(target_dir).st_mode & 0o777 == 0o777 & ~umask
+        assert os.listdir(parent) == ['test_core']
+
+
+def test_session_render(capsys):
+    session = fondue.core.init.CoreSession()
+    files = session.render('test_core')
+    assert sorted(files) == ['test_core.ffc', 'test_core.v']
+
+    cwd = os.path.dirname(__file__)
+    with open(os.path.join(cwd, 'golden.ffc')) as f:
+        assert files['test_core.ffc'] == f.read()
+    with open(os.path.join(cwd, 'golden.v')) as f:
+        assert files['test_core.v'] == f.read()
+    assert capsys.readouterr().out == ''
+
+    files = fondue.core.init.CoreSession('wb4-slave', 'verilator').render(
+        'uart', vendor='acme')
+    assert 'verilator-main.cpp' in files
+    assert 'wb_cyc_i' in files['uart.v']
+    assert 'acme' in files['uart.ffc']
+
+    with pytest.raises(ValueError):
+        fondue.core.init.CoreSession(sim_tool='nonexistent')
+
+
+def test_session_write(tmp_path):
+    session = fondue.core.init.CoreSession(sim_tool='verilator')
+    directory = tmp_path / 'uart'
+    written = session.write('uart', str(directory), vendor='acme')
+    rendered = session.render('uart', vendor='acme')
+    assert sorted(os.path.relpath(x, directory) for x in written) == \
+        sorted(rendered)
+    for (name, content) in rendered.items():
+        assert (directory / name).read_text() == content
+
+    with pytest.raises(FileExistsError):
+        session.write('uart', str(directory))
@@ -0,0 +1,72 @@
+import pytest
+
+import fondue.core.init_batch
+
+import click
+
+import os.path
+
+
+def _manifest(tmp_path):
+    return [
+        {'name': 'plain', 'directory': str(tmp_path / 'plain')},
+        {'name': 'sim', 'sim-tool': 'verilator', 'vendor': 'fondue',
+         'directory': str(tmp_path / 'sim')},
+        {'name': 'wb', 'template': 'wb4-slave',
+         'directory': str(tmp_path / 'wb')},
+    ]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_batch(tmp_path, jobs):
+    failures = fondue.core.init_batch.run(_manifest(tmp_path), jobs=jobs)
+    assert failures == []
+    assert os.path.exists(tmp_path / 'plain' / 'plain.v')
+    assert os.path.exists(tmp_path / 'sim' / 'verilator-main.cpp')
+    with open(tmp_path / 'wb' / 'wb.v') as f:
+        assert 'wb_cyc_i' in f.read()
+
+
+def test_batch_failures(tmp_path):
+    (tmp_path / 'plain').mkdir()
+    (tmp_path / 'plain' / 'taken').write_text('nope')
+    entries = _manifest(tmp_path) + [
+        {'name': 'bad', 'template': 'nonexistent',
+         'directory': str(tmp_path / 'bad')},
+        {'name': 'again', 'directory': str(tmp_path / 'wb')},
+        {'vendor': 'nameless'},
+        {'name': 'listed', 'directory': [str(tmp_path / 'listed')]},
+        {'name': 'flag', 'vendor': True, 'directory': str(tmp_path / 'flag')},
+        {'name': ['x']},
+    ]
+
+    failures = fondue.core.init_batch.run(entries, jobs=2)
+    assert sorted(name or '' for (name, error) in failures) == [
+        '', '', 'again', 'bad', 'flag', 'listed', 'plain']
+    assert os.path.exists(tmp_path / 'sim' / 'sim.v')
+    assert os.path.exists(tmp_path / 'wb' / 'wb.v')
+    assert not os.path.exists(tmp_path / 'bad')
+    assert not os.path.exists(tmp_path / 'flag')
+
+
+def test_load_manifest(tmp_path):
+    path = tmp_path / 'cores.yaml'
+    path.write_text('cores:\n  - name: a\n  - name: b\n')
+    assert fondue.core.init_batch.load_manifest(path) == [
+        {'name': 'a'}, {'name': 'b'}]
+
+    path.write_text('- name: a\n  version: 1.10\n')
+    assert fondue.core.init_batch.load_manifest(path) == [
+        {'name': 'a', 'version': '1.10'}]
+
+    path.write_text('name: a\n')
+    with pytest.raises(ValueError):
+        fondue.core.init_batch.load_manifest(path)
+
+
+def test_jobs(tmp_path):
+    path = tmp_path / 'cores.yaml'
+    path.write_text('- name: a\n')
+    with pytest.raises(click.BadParameter):
+        fondue.core.init_batch.cmd.main(['-j', '0', str(path)],
+                                        standalone_mode=False)
@@ -0,0 +1,93 @@
+import pytest
+
+import fondue.core.loader
+
+import os
+import pickle
+
+CORE = '''\
+vlnv:
+    vendor: acme
+    name: uart
+    version: 1.10
+files:
+    common:
+        uart.v
+        uart_tx.v
+    sim:
+        - tb.cpp
+'''
+
+
+def test_load(tmp_path):
+    path = tmp_path / 'uart.ffc'
+    path.write_text(CORE)
+    core = fondue.core.loader.parse_core(path)
+    assert core.vlnv == ('acme', None, 'uart', '1.10')
+    assert core.files == {'common': ('uart.v', 'uart_tx.v'),
+                          'sim': ('tb.cpp',)}
+    assert core.path == str(path)
+    assert fondue.core.loader.format_vlnv(core.vlnv) == 'acme::uart:1.10'
+
+
+def test_golden():
+    path = os.path.join(os.path.dirname(__file__), 'golden.ffc')
+    core = fondue.core.loader.parse_core(path)
+    assert core.vlnv.name == 'test_core'
+    assert core.files == {'common': ('test_core.v',)}
+
+
+@pytest.mark.parametrize('text', [
+    'vlnv: [',
+    '- a list',
+    'files: {}',
+    'vlnv:\n    vendor: acme',
+    'vlnv:\n    name: a\n    colour: red',
+    'vlnv:\n    name: [a]',
+    'vlnv:\n    name: a\nfiles:\n    common:\n        x: y',
+])
+def test_invalid(tmp_path, text):
+    path = tmp_path / 'bad.ffc'
+    path.write_text(text)
+    with pytest.raises(fondue.core.loader.CoreFormatError):
+        fondue.core.loader.parse_core(path)
+
+
+def test_cache(tmp_path):
+    path = tmp_path / 'uart.ffc'
+    path.write_text(CORE)
+    cache_path = str(tmp_path / 'cores.pickle')
+
+    cache = fondue.core.loader.CoreCache(cache_path)
+    (core,) = fondue.core.loader.load_cores([path], cache=cache)
+    assert os.path.exists(cache_path)
+
+    # A fresh cache answers from disk without parsing
+    cache = fondue.core.loader.CoreCache(cache_path)
+    cache._entries[str(path)] = (cache._entries[str(path)][0], 'cached')
+    assert cache.load(path) == 'cached'
+
+    # Changing the file invalidates its entry
+    path.write_text(CORE.replace('uart', 'spi'))
+    assert cache.load(path).vlnv.name == 'spi'
+
+
+def test_default_cache(tmp_path, cache_dir, monkeypatch):
+    monkeypatch.setattr(fondue.core.loader, '_default_cache', None)
+    path = tmp_path / 'uart.ffc'
+    path.write_text(CORE)
+    assert fondue.core.loader.load_core(path).vlnv.name == 'uart'
+    fondue.core.loader.default_cache().save()
+    with open(cache_dir / 'cores.pickle', 'rb') as f:
+        version, entries = pickle.load(f)
+    assert str(path) in entries
+
+
+def test_cache_unusable(tmp_path, monkeypatch):
+    (tmp_path / 'file').write_text('')
+    monkeypatch.setenv('FONDUE_CACHE_DIR', str(tmp_path / 'file' / 'cache'))
+    path = tmp_path / 'uart.ffc'
+    path.write_text(CORE)
+    cache = fondue.core.loader.CoreCache()
+    assert cache.load(path).vlnv.name == 'uart'
+    cache.save()
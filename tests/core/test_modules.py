@@ -0,0 +1,82 @@
+import pytest
+
+import fondue.core.index
+import fondue.core.modules
+
+import os
+
+
+def _write_core(directory, name, source, depends=()):
+    directory.mkdir(parents=True, exist_ok=True)
+    lines = ['vlnv:', f'  name: {name}', '  version: "1.0"',
+             'files:', f'  common: {name}.v']
+    if depends:
+        lines.append('depends:')
+        lines.extend(f'  - "{x}"' for x in depends)
+    (directory / f'{name}.ffc').write_text('\n'.join(lines) + '\n')
+    (directory / f'{name}.v').write_text(source)
+    return directory / f'{name}.ffc'
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    root = tmp_path / 'library'
+    _write_core(root / 'fifo', 'fifo', 'module fifo; endmodule\n')
+    _write_core(root / 'uart', 'uart',
+                'module uart; fifo u_fifo (); endmodule\n', ['fifo'])
+    monkeypatch.setenv('FONDUE_LIBRARY_PATH', str(root))
+    return root
+
+
+@pytest.fixture
+def index(tmp_path):
+    with fondue.core.index.CoreIndex(str(tmp_path / 'index.sqlite')) as index:
+        yield index
+
+
+def test_providers(library, index):
+    index.scan([str(library)])
+    stats = index.scan_sources(jobs=1)
+    assert (stats.sources, stats.hashed, stats.scanned) == (2, 2, 2)
+    ((core, path),) = index.providers('fifo')
+    assert core.vlnv.name == 'fifo'
+    assert path == str(library / 'fifo' / 'fifo.v')
+    assert index.providers('uart_rx') == []
+
+    # Nothing changed
+    stats = index.scan_sources(jobs=1)
+    assert (stats.hashed, stats.scanned) == (0, 0)
+
+    # Touched, and copied under another name: hashed but not scanned again
+    source = library / 'fifo' / 'fifo.v'
+    os.utime(source, ns=(0, 0))
+    _write_core(library / 'fifo2', 'fifo2', source.read_text())
+    index.scan()
+    stats = index.scan_sources(jobs=1)
+    assert (stats.hashed, stats.scanned) == (2, 0)
+    assert sorted(core.vlnv.name for (core, _) in
+                  index.providers('fifo')) == ['fifo', 'fifo2']
+
+    # Edited
+    source.write_text('module fifo_v2; endmodule\n')
+    stats = index.scan_sources(jobs=1)
+    assert stats.scanned == 1
+    assert [core.vlnv.name for (core, _) in
+            index.providers('fifo_v2')] == ['fifo']
+
+
+def test_missing_modules(tmp_path, library, index):
+    top = _write_core(tmp_path / 'top', 'top',
+                      'module top; uart u (); spi s (); endmodule\n',
+                      ['uart'])
+    index.scan([str(library)])
+    index.scan_sources(jobs=1)
+    assert fondue.core.modules.missing_modules(index, str(top)) == {
+        'spi': []}
+
+    _write_core(library / 'spi', 'spi', 'module spi; endmodule\n')
+    index.scan()
+    index.scan_sources(jobs=1)
+    ((core, path),) = fondue.core.modules.missing_modules(
+        index, str(top))['spi']
+    assert core.vlnv.name == 'spi'
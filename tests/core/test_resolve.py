@@ -0,0 +1,74 @@
+import pytest
+
+import fondue.core.resolve
+
+
+def _write_core(path, name, version, depends=()):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ['vlnv:', f'  name: {name}', f'  version: "{version}"']
+    if depends:
+        lines.append('depends:')
+        lines.extend(f'  - "{x}"' for x in depends)
+    path.write_text('\n'.join(lines) + '\n')
+    return path
+
+
+@pytest.fixture
+def library(tmp_path, monkeypatch):
+    root = tmp_path / 'library'
+    _write_core(root / 'uart-1.0' / 'uart.ffc', 'uart', '1.0', ['fifo'])
+    _write_core(root / 'uart-2.0' / 'uart.ffc', 'uart', '2.0', ['fifo >=2'])
+    _write_core(root / 'fifo-1.0' / 'fifo.ffc', 'fifo', '1.0')
+    monkeypatch.setenv('FONDUE_LIBRARY_PATH', str(root))
+    return root
+
+
+def _names(ordered):
+    return [(core.vlnv.name, core.vlnv.version,
+             [x.vlnv.name for x in requires]) for (core, requires) in ordered]
+
+
+def test_resolve_lock(tmp_path, library):
+    top = _write_core(tmp_path / 'top' / 'top.ffc', 'top', '1.0',
+                      ['uart <3'])
+    ordered = fondue.core.resolve.resolve_core(top)
+    assert _names(ordered) == [('fifo', '1.0', []),
+                               ('uart', '1.0', ['fifo']),
+                               ('top', '1.0', ['uart'])]
+    lock = tmp_path / 'top' / 'top.lock'
+    assert lock.exists()
+
+    # The lockfile is used as long as the dependencies of top are unchanged
+    _write_core(library / 'fifo-2.0' / 'fifo.ffc', 'fifo', '2.0')
+    assert _names(fondue.core.resolve.resolve_core(top)) == _names(ordered)
+    updated = fondue.core.resolve.resolve_core(top, update=True)
+    assert [core.vlnv.version for (core, _) in updated] == ['2.0', '2.0',
+                                                             '1.0']
+
+    # Changing them resolves again
+    _write_core(top, 'top', '1.0', ['uart <2'])
+    assert [core.vlnv.version for (core, _) in
+            fondue.core.resolve.resolve_core(top)] == ['2.0', '1.0', '1.0']
+
+
+def test_locks_per_core(tmp_path, library):
+    rx = _write_core(tmp_path / 'rx.ffc', 'rx', '1.0', ['uart'])
+    tx = _write_core(tmp_path / 'tx.ffc', 'tx', '1.0', ['fifo'])
+    fondue.core.resolve.resolve_core(rx)
+    fondue.core.resolve.resolve_core(tx)
+    # Each core in the directory keeps its own lockfile
+    for core in (rx, tx):
+        lock = fondue.core.resolve.lock_path(core)
+        assert lock == str(core.with_suffix('.lock'))
+        assert fondue.core.resolve.is_lock(lock)
+        assert fondue.core.resolve.read_lock(
+            lock, fondue.core.resolve.load_core(core)) is not None
+
+
+def test_stale_lock(tmp_path, library):
+    top = _write_core(tmp_path / 'top.ffc', 'top', '1.0', ['uart'])
+    fondue.core.resolve.resolve_core(top)
+    (library / 'fifo-1.0' / 'fifo.ffc').unlink()
+    assert fondue.core.resolve.read_lock(tmp_path / 'top.lock',
+                                         fondue.core.resolve.load_core(top)) \
+        is None
@@ -0,0 +1,97 @@
+import pytest
+
+import fondue.core.store
+import fondue.main
+import fondue.resolver
+
+import os
+
+
+def _write_core(directory, name, version, text='module x; endmodule\n'):
+    directory.mkdir(parents=True)
+    (directory / f'{name}.ffc').write_text(
+        f'vlnv:\n  vendor: acme\n  name: {name}\n  version: "{version}"\n'
+        f'files:\n  common: rtl/{name}.v\n')
+    (directory / 'rtl').mkdir()
+    (directory / 'rtl' / f'{name}.v').write_text(text)
+    (directory / 'run.sh').write_text('#!/bin/sh\n')
+    (directory / 'run.sh').chmod(0o755)
+    (directory / 'obj_dir').mkdir()
+    (directory / 'obj_dir' / 'junk').write_text('junk')
+    (directory / f'{name}.lock').write_text('cores: []\n')
+    return directory / f'{name}.ffc'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return fondue.core.store.CoreStore(str(tmp_path / 'store'))
+
+
+def test_add_and_checkout(tmp_path, store):
+    stored = store.add(_write_core(tmp_path / 'uart', 'uart', '1.0'))
+    assert stored.vlnv == ('acme', None, 'uart', '1.0')
+    assert [name for (name, _) in stored.files] == ['rtl/uart.v', 'run.sh',
+                                                    'uart.ffc']
+    # Adding it again, or a copy of it, stores nothing new
+    assert store.add(tmp_path / 'uart' / 'uart.ffc') == stored
+
+    checkout = tmp_path / 'project' / 'uart'
+    counts = store.checkout(stored, str(checkout))
+    assert counts == {'linked': 3}
+    source = checkout / 'rtl' / 'uart.v'
+    assert source.read_text() == 'module x; endmodule\n'
+    assert os.stat(source).st_nlink == 2
+    assert not os.access(source, os.W_OK) or os.geteuid() == 0
+    assert os.access(checkout / 'run.sh', os.X_OK)
+    assert not (checkout / 'obj_dir').exists()
+
+    with pytest.raises(FileExistsError):
+        store.checkout(stored, str(checkout))
+
+
+def test_find(tmp_path, store):
+    for version in ('1.0', '1.2', '2.0'):
+        store.add(_write_core(tmp_path / version, 'uart', version,
+                              text=f'// {version}\n'))
+    assert len(store.cores()) == 3
+
+    def find(text):
+        stored = store.find(fondue.resolver.parse_dependency(text))
+        return stored and stored.vlnv.version
+
+    assert find('uart') == '2.0'
+    assert find('acme::uart <2') == '1.2'
+    assert find('uart >3') is None
+    assert find('other:lib:uart') is None
+
+
+def test_bad_manifest(store):
+    with pytest.raises(ValueError):
+        store.add_manifest(('acme', None, 'uart', '1.0'), {'../x': 'ab'})
+
+
+def test_bad_vlnv(tmp_path, store):
+    for vlnv in (('acme', None, '../../x', '1.0'), ('a', 'b', 'c'),
+                 ('acme', None, None, '1.0'), ('a', 'b:c', 'd', '1')):
+        with pytest.raises(ValueError):
+            store.add_manifest(vlnv, {})
+    assert not os.path.exists(os.path.join(store.path, 'cores'))
+
+    # Stray manifests are skipped rather than breaking every listing
+    bad = os.path.join(store.path, 'cores', 'x', 'bad.json')
+    os.makedirs(os.path.dirname(bad))
+    with open(bad, 'w') as f:
+        f.write('{"vlnv": ["a", "b", "c", "d", "e"], "files": []}')
+    assert store.cores() == []
+
+
+def test_project_add_bad_name(tmp_path, monkeypatch):
+    monkeypatch.setenv('FONDUE_STORE_DIR', str(tmp_path / 'store'))
+    core = tmp_path / 'evil' / 'evil.ffc'
+    core.parent.mkdir()
+    core.write_text('vlnv:\n  name: ../../escaped\n')
+    project = tmp_path / 'project'
+    with pytest.raises(Exception, match='Invalid VLNV'):
+        fondue.main.main(['project', 'add', str(core), '--directory',
+                          str(project)], standalone_mode=False)
+    assert sorted(os.listdir(tmp_path)) == ['evil']
@@ -0,0 +1,151 @@
+import pytest
+
+import fondue.core.init
+import fondue.core.update
+import fondue.templates
+
+import os
+import json
+import shutil
+
+
+def test_merge():
+    merge = fondue.core.update.merge
+    base = 'a\nb\nc\nd\ne\n'
+    assert merge(base, 'A\nb\nc\nd\ne\n', 'a\nb\nc\nd\nE\n') == (
+        'A\nb\nc\nd\nE\n', False)
+    assert merge(base, base, 'a\nb\nx\nd\ne\n') == ('a\nb\nx\nd\ne\n', False)
+    assert merge(base, 'a\nx\n', 'a\nx\n') == ('a\nx\n', False)
+    assert merge(base, 'a\nb\nX\nd\ne\n', 'a\nb\nY\nd\ne\n') == (
+        'a\nb\n<<<<<<< current\nX\n=======\nY\n>>>>>>> template\nd\ne\n',
+        True)
+    assert merge('', 'mine', 'theirs') == (
+        '<<<<<<< current\nmine\n=======\ntheirs\n>>>>>>> template\n', True)
+
+
+@pytest.fixture
+def core(tmp_path):
+    directory = tmp_path / 'uart'
+    fondue.core.init.run({'name': 'uart', 'vendor': 'acme', 'library': None,
+                          'version': '1.0', 'template': None,
+                          'sim_tool': 'verilator',
+                          'directory': str(directory)})
+    return directory
+
+
+def _old_templates(core, edits, digest='0' * 64):
+    """Pretend `core` was generated by older templates: the current ones
+    with `edits` (template path -> text) applied."""
+    (args, current) = fondue.core.init.read_record(str(core))
+    old = fondue.templates.snapshot_dir(digest)
+    if not os.path.exists(old):
+        shutil.copytree(fondue.templates.snapshot_dir(current), old)
+    for (path, text) in edits.items():
+        path = os.path.join(old, 'core_init', path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+    fondue.core.init.write_record(str(core), args, digest)
+    return old
+
+
+def test_record(core):
+    (args, digest) = fondue.core.init.read_record(str(core))
+    assert args == {
+        'name': 'uart', 'vendor': 'acme', 'library': None, 'version': '1.0',
+        'template': None, 'sim_tool': 'verilator'}
+    assert digest == fondue.templates.templates_digest()
+    assert os.listdir(core / '.fondue') == ['init.json']
+    snapshot = fondue.templates.snapshot_dir(digest)
+    assert os.path.exists(os.path.join(
+        snapshot, 'core_init', 'default', 'default', 'name.ffc.j2'))
+
+
+def test_update_unchanged(core):
+    mtime = os.stat(core / 'uart.v').st_mtime_ns
+    result = fondue.core.update.update_core(str(core))
+    assert result == (str(core), (), (), (), None)
+    assert os.stat(core / 'uart.v').st_mtime_ns == mtime
+
+
+def test_update(core):
+    ffc = core / 'uart.ffc'
+    generated = ffc.read_text()
+    old_ffc = generated.replace('files:', 'files :')
+    (_, digest) = fondue.core.init.read_record(str(core))
+    with open(os.path.join(fondue.templates.snapshot_dir(digest), 'core_init',
+                           'default', 'default', 'name.ffc.j2')) as f:
+        template = f.read()
+    _old_templates(core, {
+        'default/default/name.ffc.j2': template.replace('files:', 'files :'),
+        'default/verilator/name.h.j2': 'old\n',
+        'default/default/old.txt.j2': 'gone\n',
+        'default/default/kept.txt.j2': 'kept\n',
+    })
+    ffc.write_text(old_ffc + 'depends:\n    - fifo\n')
+    header = core / 'uart.h'
+    header.write_text('mine\n')
+    (core / 'old.txt').write_text('gone')
+    (core / 'kept.txt').write_text('edited\n')
+    (core / 'verilator-main.cpp').unlink()
+    mtime = os.stat(core / 'uart.v').st_mtime_ns
+
+    result = fondue.core.update.update_core(str(core), dry_run=True)
+    assert result.written == ('uart.ffc', 'uart.h')
+    assert ffc.read_text().startswith(old_ffc)
+
+    result = fondue.core.update.update_core(str(core))
+    assert result.written == ('uart.ffc', 'uart.h')
+    assert result.removed == ('old.txt',)
+    assert result.conflicts == ('uart.h',)
+    assert ffc.read_text() == generated + 'depends:\n    - fifo\n'
+    assert header.read_text().startswith('<<<<<<< current\nmine\n')
+    assert not (core / 'old.txt').exists()
+    assert (core / 'kept.txt').read_text() == 'edited\n'
+    assert not (core / 'verilator-main.cpp').exists()
+    assert os.stat(core / 'uart.v').st_mtime_ns == mtime
+    assert fondue.core.init.read_record(str(core))[1] == \
+        fondue.templates.templates_digest()
+
+    # Once merged, nothing changes until the templates do
+    result = fondue.core.update.update_core(str(core))
+    assert (result.written, result.removed) == ((), ())
+
+
+def test_update_without_snapshot(core):
+    (args, _) = fondue.core.init.read_record(str(core))
+    fondue.core.init.write_record(str(core), args, '1' * 64)
+    (core / 'uart.v').write_text('edited\n')
+    result = fondue.core.update.update_core(str(core))
+    assert (result.written, result.conflicts) == (('uart.v',), ('uart.v',))
+    assert (core / 'uart.v').read_text().startswith(
+        '<<<<<<< current\nedited\n')
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_update_cores(tmp_path, jobs):
+    session = fondue.core.init.CoreSession()
+    for i in range(fondue.core.update._MIN_PARALLEL_UPDATE):
+        session.write(f'core{i}', str(tmp_path / 'lib' / f'core{i}'))
+    (tmp_path / 'lib' / 'core3' / 'core3.v').write_text('edited\n')
+    (tmp_path / 'lib' / 'core5' / '.fondue' / 'init.json').write_text('{}')
+    _old_templates(tmp_path / 'lib' / 'core7',
+                   {'default/default/name.v.j2': 'old\n'})
+    (tmp_path / 'lib' / 'core7' / 'core7.v').write_text('old')
+
+    directories = fondue.core.update.core_directories(str(tmp_path))
+    assert len(directories) == fondue.core.update._MIN_PARALLEL_UPDATE
+    results = fondue.core.update.update_cores(directories, jobs=jobs)
+    assert [x.directory for x in results] == directories
+    changed = {os.path.basename(x.directory): x for x in results
+               if x.written or x.error}
+    assert sorted(changed) == ['core5', 'core7']
+    assert 'Invalid core record' in changed['core5'].error
+    assert changed['core7'].written == ('core7.v',)
+    assert json.loads((tmp_path / 'lib' / 'core7' / '.fondue' /
+                       'init.json').read_text())['name'] == 'core7'
+
+
+def test_update_not_initialized(tmp_path):
+    with pytest.raises(ValueError, match='not created by'):
+        fondue.core.update.update_core(str(tmp_path))
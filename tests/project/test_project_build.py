@@ -0,0 +1,53 @@
+import pytest
+
+import fondue.project.build
+
+
+def _write_core(path, name, depends=()):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ['vlnv:', f'  name: {name}', 'files:', f'  common: {name}.v']
+    if depends:
+        lines.append('depends:')
+        lines.extend(f'  - {x}' for x in depends)
+    path.write_text('\n'.join(lines) + '\n')
+    (path.parent / f'{name}.v').write_text(f'module {name}; endmodule\n')
+
+
+def test_project_jobs(tmp_path, monkeypatch, verilator):
+    (tool, log) = verilator
+    project = tmp_path / 'project'
+    _write_core(project / 'fifo' / 'fifo.ffc', 'fifo')
+    _write_core(project / 'uart' / 'uart.ffc', 'uart', ['fifo'])
+    _write_core(project / 'top.ffc', 'top', ['uart'])
+    _write_core(project / 'uart' / 'obj_dir' / 'stale.ffc', 'stale')
+    monkeypatch.setenv('FONDUE_LIBRARY_PATH', str(project))
+
+    paths = fondue.project.build.project_cores(project)
+    assert [p[len(str(project)) + 1:] for p in paths] == [
+        'top.ffc', 'fifo/fifo.ffc', 'uart/uart.ffc']
+    jobs = fondue.project.build.build_jobs(paths, project, verilator=tool)
+    assert [(job.name, job.requires) for job in jobs] == [
+        ('top.ffc', ['fifo/fifo.ffc', 'uart/uart.ffc']),
+        ('fifo/fifo.ffc', []),
+        ('uart/uart.ffc', ['fifo/fifo.ffc'])]
+
+    results = fondue.project.build.Scheduler(jobs=2).run(jobs)
+    assert [x.status for x in results] == ['built'] * 3
+    assert len(log.read_text().splitlines()) == 3
+    results = fondue.project.build.Scheduler(jobs=2).run(jobs)
+    assert [x.status for x in results] == ['up to date'] * 3
+
+
+def test_project_shared_directory(tmp_path, monkeypatch, verilator):
+    (tool, log) = verilator
+    project = tmp_path / 'project'
+    _write_core(project / 'rx.ffc', 'rx')
+    _write_core(project / 'tx.ffc', 'tx')
+    monkeypatch.setenv('FONDUE_LIBRARY_PATH', str(project))
+    jobs = fondue.project.build.build_jobs(
+        fondue.project.build.project_cores(project), project, verilator=tool)
+    results = fondue.project.build.Scheduler(jobs=2).run(jobs)
+    assert [x.status for x in results] == ['built'] * 2
+    # Each core file gets its own object directory
+    assert (project / 'obj_dir' / 'rx' / 'Vrx').exists()
+    assert (project / 'obj_dir' / 'tx' / 'Vtx').exists()
@@ -0,0 +1,146 @@
+import pytest
+
+import fondue.core.store
+import fondue.registry.client
+import fondue.registry.publish
+import fondue.registry.serve
+import fondue.resolver
+
+import click
+
+import os
+import json
+import socket
+import threading
+
+
+def _write_core(directory, name, version):
+    directory.mkdir(parents=True)
+    (directory / f'{name}.ffc').write_text(
+        f'vlnv:\n  name: {name}\n  version: "{version}"\n'
+        f'files:\n  common: {name}.v\n')
+    (directory / f'{name}.v').write_text(f'module {name}; endmodule\n')
+    return directory / f'{name}.ffc'
+
+
+@pytest.fixture
+def server(tmp_path):
+    store = fondue.core.store.CoreStore(str(tmp_path / 'registry'))
+    server = fondue.registry.serve.RegistryServer(('127.0.0.1', 0), store)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(tmp_path, server):
+    store = fondue.core.store.CoreStore(str(tmp_path / 'local'))
+    with fondue.registry.client.RegistryClient(server.url, store,
+                                               jobs=4) as client:
+        yield client
+
+
+def test_publish_and_pull(tmp_path, server, client):
+    publisher = fondue.core.store.CoreStore(str(tmp_path / 'publisher'))
+    with fondue.registry.client.RegistryClient(server.url, publisher) as c:
+        for (name, version) in [('uart', '1.0'), ('uart', '1.1'),
+                                ('spi', '1.0')]:
+            c.publish(publisher.add(_write_core(
+                tmp_path / f'{name}-{version}', name, version)))
+    assert len(server.store.cores()) == 3
+
+    index = client.index()
+    (vlnv, digest) = client.find(fondue.resolver.parse_dependency('uart'),
+                                 index)
+    assert vlnv.version == '1.1'
+    digests = [digest for (_, digest) in index]
+    stored = client.pull_many(digests)
+    assert sorted(x.digest for x in stored) == sorted(digests)
+    assert client.store.get(digest).vlnv == vlnv
+
+    checkout = tmp_path / 'project' / 'uart'
+    client.store.checkout(client.store.get(digest), str(checkout))
+    assert (checkout / 'uart.v').read_text() == 'module uart; endmodule\n'
+
+    # Pulling again downloads nothing
+    assert client.pull(digest) == client.store.get(digest)
+
+
+def test_corrupt_object(tmp_path, server, client):
+    publisher = fondue.core.store.CoreStore(str(tmp_path / 'publisher'))
+    stored = publisher.add(_write_core(tmp_path / 'uart', 'uart', '1.0'))
+    with fondue.registry.client.RegistryClient(server.url, publisher) as c:
+        c.publish(stored)
+    (_, obj) = stored.files[-1]
+    path = server.store.object_path(obj)
+    os.chmod(path, 0o644)
+    with open(path, 'w') as f:
+        f.write('module evil; endmodule\n')
+
+    with pytest.raises(fondue.registry.client.RegistryError):
+        client.pull(stored.digest)
+    assert client.store.get(stored.digest) is None
+    assert not os.path.exists(client.store.object_path(obj))
+
+
+def test_bad_upload(server, client):
+    with pytest.raises(fondue.registry.client.RegistryError):
+        client.pull('0' * 64)
+    path = f'/v1/objects/{"0" * 64}'
+    with client._request('PUT', path, b'data') as response:
+        response.read()
+    assert response.status == 400
+
+
+@pytest.mark.parametrize('vlnv', [
+    ['x/../../../escaped', 'l', 'n', '1'], ['a', 'b', 'c', 'd', 'e'],
+    ['a', '..', 'c', 'd'], [None, None, None, '1.0'], ['a', 'b', 7, 'd']])
+def test_bad_manifest_upload(tmp_path, server, client, vlnv):
+    files = []
+    digest = fondue.core.store.tree_digest(vlnv, files)
+    body = json.dumps({'vlnv': vlnv, 'files': files}).encode()
+    with client._request('PUT', f'/v1/manifests/{digest}', body,
+                         {'Content-Length': str(len(body))}) as response:
+        response.read()
+    assert response.status == 400
+    assert not os.path.exists(server.store.path + '/cores')
+    assert set(os.listdir(tmp_path)) <= {'registry', 'local'}
+    assert client.index() == []
+
+
+def test_manifest_digest_covers_vlnv(tmp_path, server, client):
+    publisher = fondue.core.store.CoreStore(str(tmp_path / 'publisher'))
+    stored = publisher.add(_write_core(tmp_path / 'uart', 'uart', '1.0'))
+    with fondue.registry.client.RegistryClient(server.url, publisher) as c:
+        c.publish(stored)
+    # The same files under another VLNV do not match the digest
+    body = json.dumps({'vlnv': ['evil', None, 'uart', '9.0'],
+                       'files': stored.files}).encode()
+    with client._request('PUT', f'/v1/manifests/{stored.digest}', body,
+                         {'Content-Length': str(len(body))}) as response:
+        response.read()
+    assert response.status == 400
+    assert [vlnv.version for (vlnv, _) in client.index()] == ['1.0']
+
+
+@pytest.mark.parametrize('length', ['abc', '-1', ''])
+def test_bad_content_length(server, length):
+    (host, port) = server.server_address[:2]
+    with socket.create_connection((host, port), timeout=10) as conn:
+        conn.sendall(f'PUT /v1/objects/{"0" * 64} HTTP/1.1\r\n'
+                     f'Host: {host}\r\nContent-Length: {length}\r\n\r\n'
+                     'data'.encode())
+        response = conn.makefile('rb').read()
+    assert response.startswith(b'HTTP/1.0 400 ') or \
+        response.startswith(b'HTTP/1.1 400 ')
+
+
+def test_publish_bad_vlnv(tmp_path, server, monkeypatch):
+    monkeypatch.setenv('FONDUE_STORE_DIR', str(tmp_path / 'local'))
+    core = _write_core(tmp_path / 'uart', 'uart', '1.0')
+    core.write_text('vlnv:\n  vendor: a:b\n  name: uart\n')
+    with pytest.raises(click.ClickException, match='Invalid'):
+        fondue.registry.publish.cmd.main(
+            [str(core), '--url', server.url], standalone_mode=False)
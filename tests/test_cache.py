@@ -0,0 +1,37 @@
+import pytest
+
+import fondue.cache
+
+import os
+import threading
+
+
+def test_write_atomic_threads(tmp_path):
+    path = tmp_path / 'index.json'
+    threads = [threading.Thread(target=fondue.cache.write_atomic,
+                                args=(path, str(i) * 100000))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert path.read_text() in [str(i) * 100000 for i in range(8)]
+    assert os.listdir(tmp_path) == ['index.json']
+
+
+def test_write_atomic_mode(tmp_path):
+    path = tmp_path / 'data'
+    fondue.cache.write_atomic(path, b'\0', 'wb')
+    assert path.read_bytes() == b'\0'
+    umask = os.umask(0)
+    os.umask(umask)
+    assert os.stat(path).st_mode & 0o777 == 0o666 & ~umask
+
+
+def test_write_atomic_error(tmp_path):
+    path = tmp_path / 'data'
+    path.write_text('old')
+    with pytest.raises(TypeError):
+        fondue.cache.write_atomic(path, b'new')
+    assert path.read_text() == 'old'
+    assert os.listdir(tmp_path) == ['data']
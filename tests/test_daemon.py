@@ -0,0 +1,90 @@
+import pytest
+
+import fondue.client
+import fondue.daemon
+import fondue.permissions
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    path = str(tmp_path / 'daemon.sock')
+    monkeypatch.setenv('FONDUE_DAEMON_SOCKET', path)
+    process = subprocess.Popen(
+        [sys.executable, '-c', 'import fondue.main; fondue.main.main()',
+         'daemon', '--idle-timeout', '60'])
+    deadline = time.monotonic() + 30
+    while not os.path.exists(path):
+        assert process.poll() is None
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    yield path
+    fondue.daemon.stop(path)
+    process.wait(timeout=10)
+
+
+def test_forward(daemon, tmp_path, monkeypatch, capfd):
+    monkeypatch.chdir(tmp_path)
+    assert fondue.client.forward(['core', 'init', 'uart']) == 0
+    assert (tmp_path / 'uart' / 'uart.ffc').exists()
+    assert fondue.client.forward(['core', 'find', 'nothing']) == 1
+    assert "No core matches 'nothing'" in capfd.readouterr().err
+
+    assert fondue.daemon.stop(daemon)
+    deadline = time.monotonic() + 10
+    while os.path.exists(daemon):
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    assert fondue.client.forward(['core', 'init', 'spi']) is None
+    assert not (tmp_path / 'spi').exists()
+
+
+def test_forward_umask(daemon, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    old = os.umask(0o027)
+    try:
+        assert fondue.permissions.current_umask() == 0o027
+        assert fondue.client.forward(['core', 'init', 'uart']) == 0
+    finally:
+        os.umask(old)
+    assert os.stat(tmp_path / 'uart' / 'uart.v').st_mode & 0o777 == 0o640
+
+
+def test_forward_invocations(daemon, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    log = tmp_path / 'timing.jsonl'
+    for name in ('uart', 'spi'):
+        assert fondue.client.forward(
+            ['--timing-log', str(log), 'core', 'init', name]) == 0
+    invocations = {json.loads(line)['invocation']
+                   for line in log.read_text().splitlines()}
+    assert len(invocations) == 2
+
+
+def test_untrusted_directory(tmp_path):
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    shared.chmod(0o1777)
+    path = str(shared / 'daemon.sock')
+    with open(path, 'w'):
+        pass
+    # Nothing is sent to a socket someone else could have put there
+    assert 'mode 0700' in fondue.client.check_directory(str(shared))
+    assert fondue.client.forward(['--help'], path=path) is None
+    result = subprocess.run(
+        [sys.executable, '-c', 'import fondue.main; fondue.main.main()',
+         'daemon', '--socket', path], capture_output=True, text=True)
+    assert result.returncode != 0
+    assert 'mode 0700' in result.stderr
+    assert fondue.client.check_directory(str(tmp_path)) is None
+
+
+def test_no_daemon(tmp_path):
+    path = str(tmp_path / 'nobody.sock')
+    assert fondue.client.forward(['--help'], path=path) is None
+    assert not fondue.daemon.stop(path)
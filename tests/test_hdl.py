@@ -0,0 +1,61 @@
+import pytest
+
+import fondue.hdl
+
+import sys
+
+
+@pytest.mark.parametrize('possessive', [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(
+        sys.version_info < (3, 11), reason='needs Python 3.11')),
+])
+def test_verilog(monkeypatch, possessive):
+    regex = fondue.hdl._verilog_regex(possessive)
+    assert (b'*+' in regex.pattern) == possessive
+    monkeypatch.setattr(fondue.hdl, '_VERILOG', regex)
+    source = b'''
+`include "defs.vh"
+// module commented_out;
+/* uart_rx ghost (.clk(clk)); */
+module top #(parameter W = 8) (input clk);
+  wire [7:0] data;
+  uart_rx #(.W(W)) u_rx (.clk(clk), .data(data));
+  fifo u_fifo [3:0] (.clk(clk));
+  crc u_crc(data);
+  always @(posedge clk) begin
+    if (rst) count <= $clog2(W);
+  end
+  `BUFFER u_buf (clk);
+  assign x = f(data);
+  initial $display("spi u_spi (clk);");
+endmodule
+
+interface bus_if; endinterface
+'''
+    assert fondue.hdl.scan_source(source) == (
+        {'top', 'bus_if'}, {'uart_rx', 'fifo', 'crc'})
+
+
+def test_vhdl():
+    source = b'''
+-- entity commented is
+entity Top is port (a : in std_logic); end entity Top;
+architecture rtl of top is
+begin
+  u1 : entity work.Uart port map (a => a);
+  u2 : component fifo generic map (W => 8) port map (a);
+  u3 : SPI port map (a);
+end architecture;
+'''
+    assert fondue.hdl.scan_source(source, fondue.hdl.VHDL) == (
+        {'top'}, {'uart', 'fifo', 'spi'})
+
+
+def test_scan_file(tmp_path):
+    path = tmp_path / 'top.sv'
+    path.write_text('module top; fifo u (); endmodule\n')
+    info = fondue.hdl.scan_file(str(path))
+    assert (info.declares, info.instantiates) == (('top',), ('fifo',))
+    (tmp_path / 'empty.v').write_text('')
+    assert fondue.hdl.scan_file(str(tmp_path / 'empty.v'))[1:] == ((), ())
@@ -0,0 +1,88 @@
+import pytest
+
+import fondue.logging
+import fondue.timing
+
+import json
+import logging
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    for name in ('fondue', '__main__', fondue.logging.TIMING_LOGGER):
+        monkeypatch.setattr(logging.getLogger(name), 'level',
+                            logging.getLogger(name).level)
+    yield fondue.logging.setup_logging
+    fondue.logging.stop_logging()
+
+
+def test_log_files(tmp_path, setup, capsys):
+    log_file = tmp_path / 'run.log'
+    timing_file = tmp_path / 'timing.jsonl'
+    timing_file.write_text('{"phase": "earlier"}\n')
+    setup(logging.INFO, monchrome=True, log_file=str(log_file),
+          timing_file=str(timing_file))
+
+    logger = logging.getLogger('fondue.test')
+    logger.debug('details %d', 1)
+    logger.warning('careful')
+    with fondue.timing.span('phase', core='uart') as fields:
+        fields['status'] = 'built'
+    with pytest.raises(KeyError):
+        with fondue.timing.span('broken'):
+            raise KeyError()
+    fondue.logging.stop_logging()
+
+    assert capsys.readouterr().err == 'WARNING: careful\n'
+    log = log_file.read_text()
+    assert 'DEBUG fondue.test: details 1' in log
+    assert 'WARNING fondue.test: careful' in log
+
+    (earlier, phase, broken) = [json.loads(line) for line in
+                                timing_file.read_text().splitlines()]
+    assert earlier == {'phase': 'earlier'}
+    assert phase['phase'] == 'phase'
+    assert phase['core'] == 'uart'
+    assert phase['status'] == 'built'
+    assert phase['duration'] >= 0
+    assert phase['invocation'] == fondue.timing.INVOCATION
+    assert broken['error'] == 'KeyError'
+
+
+def test_no_log_files(tmp_path, setup, capsys, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    setup(logging.INFO, monchrome=True)
+    logging.getLogger('fondue.test').info('hello')
+    fondue.timing.record('phase', 1.0)
+    fondue.logging.stop_logging()
+    assert capsys.readouterr().err == 'INFO: hello\n'
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_profile(monkeypatch):
+    monkeypatch.setattr(fondue.timing, '_profile', None)
+    assert not fondue.timing.enabled()
+    with fondue.timing.span('ignored') as fields:
+        fields['status'] = 'ignored'
+    assert fondue.timing.profile_summary() == []
+
+    fondue.timing.start_profile()
+    for duration in (0.001, 0.003):
+        fondue.timing.record('render', duration)
+    fondue.timing.record('commit', 0.01)
+    rows = fondue.timing.profile_summary()
+    assert [row[:2] for row in rows] == [('commit', 1), ('render', 2)]
+    assert rows[1][2:] == pytest.approx((0.004, 0.002, 0.003))
+    table = fondue.timing.format_profile_summary(rows).splitlines()
+    assert table[0].split() == ['phase', 'calls', 'total', 'ms', 'mean', 'ms',
+                                'max', 'ms']
+    assert table[2].split() == ['render', '2', '4.0', '2.0', '3.0']
+
+
+def test_register_once(setup, monkeypatch):
+    registered = []
+    monkeypatch.setattr(fondue.logging.atexit, 'register', registered.append)
+    monkeypatch.setattr(fondue.logging, '_registered', False)
+    for _ in range(3):
+        setup(logging.INFO)
+    assert registered == [fondue.logging.stop_logging]
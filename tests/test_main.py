@@ -0,0 +1,76 @@
+import pytest
+
+import fondue.main
+
+import os
+import subprocess
+import sys
+
+# Modules which make startup slow, and which only the commands that actually
+# render something should pull in.
+HEAVY_MODULES = ['jinja2', 'pkg_resources', 'distutils', 'fondue.core.init']
+
+
+def _imported_after(argv):
+    script = (
+        "import sys\n"
+        "import fondue.main\n"
+        f"fondue.main.main({argv!r}, standalone_mode=False)\n"
+        f"print('loaded:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script],
+                            capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()[-1].partition('loaded:')[2]
+
+
+@pytest.mark.parametrize('package', ['fondue.core', 'fondue.project',
+                                     'fondue.registry'])
+def test_manifest(package):
+    group = fondue.main._load(package + ':group')
+    discovered = fondue.main.discover_commands(package)
+    assert sorted(discovered) == group.list_commands(None)
+    for (name, cmd) in discovered.items():
+        assert group.get_command(None, name) is cmd
+        assert group._manifest[name][1] == cmd.short_help
+
+
+def test_top_level_manifest():
+    discovered = fondue.main.discover_commands('fondue')
+    assert sorted(discovered) == fondue.main.main.list_commands(None)
+
+
+def test_help_is_lazy():
+    assert _imported_after(['--help']) == ''
+
+
+def test_group_help_is_lazy():
+    assert _imported_after(['core', '--help']) == ''
+
+
+def test_unknown_command():
+    assert fondue.main.main.get_command(None, 'nope') is None
+
+
+def test_profile(tmp_path):
+    stats = tmp_path / 'run.pstats'
+    result = subprocess.run(
+        [sys.executable, '-c', 'import fondue.main; fondue.main.main()',
+         '--profile', '--profile-stats', str(stats), 'core', 'list'],
+        capture_output=True, text=True, check=True)
+    phases = [line.split()[0] for line in result.stderr.splitlines()]
+    assert 'import' in phases
+    assert 'command' in phases
+    assert stats.stat().st_size > 0
+
+
+def test_unusable_cache_dir(tmp_path):
+    (tmp_path / 'file').write_text('')
+    env = dict(os.environ, FONDUE_CACHE_DIR=str(tmp_path / 'file' / 'cache'),
+               PYTHONPATH=os.path.dirname(os.path.dirname(fondue.__file__)))
+    result = subprocess.run(
+        [sys.executable, '-c', 'import fondue.main; fondue.main.main()',
+         'core', 'init', 'uart'],
+        capture_output=True, text=True, env=env, cwd=tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert 'Traceback' not in result.stderr
+    assert (tmp_path / 'uart' / 'uart.ffc').exists()
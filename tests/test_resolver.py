@@ -0,0 +1,89 @@
+import pytest
+
+import fondue.resolver
+from fondue.resolver import (Dependency, ResolutionError, Resolver,
+                             parse_dependency, satisfies)
+from fondue.core.loader import Core, Vlnv
+
+
+def _core(name, version, *depends, vendor='acme'):
+    return Core(Vlnv(vendor, None, name, version), {}, f'{name}-{version}',
+                tuple(parse_dependency(x) for x in depends))
+
+
+def _versions(selected):
+    return {package[2]: core.vlnv.version
+            for (package, core) in selected.items()}
+
+
+@pytest.mark.parametrize('version,constraint,result', [
+    ('1.10', '>1.9', True),
+    ('1.0', '==1.0.0', True),
+    ('1.5', '>=1.2,<2', True),
+    ('2.0', '>=1.2,<2', False),
+    ('1.0', '!=1.0', False),
+    ('1.0', '', True),
+    (None, '', True),
+    (None, '>=1', False),
+    ('1.0-rc1', '<1.0.1', True),
+])
+def test_satisfies(version, constraint, result):
+    assert satisfies(version, constraint) == result
+
+
+def test_parse_dependency():
+    assert parse_dependency('uart') == Dependency(None, None, 'uart', '')
+    assert parse_dependency('acme:io:uart >=1, <2') == Dependency(
+        'acme', 'io', 'uart', '>=1, <2')
+    assert parse_dependency('acme::uart:1.2') == Dependency(
+        'acme', None, 'uart', '==1.2')
+    for bad in ['', 'a:b:c:d:e', 'uart ~1', 'a:b:c:1 >2']:
+        with pytest.raises(ValueError):
+            parse_dependency(bad)
+
+
+def test_newest():
+    cores = [_core('uart', '1.0'), _core('uart', '1.1'), _core('uart', '2.0')]
+    root = _core('top', '1', 'uart <2')
+    selected = Resolver(cores).resolve([root])
+    assert _versions(selected) == {'top': '1', 'uart': '1.1'}
+
+
+def test_backtrack():
+    cores = [
+        _core('a', '2', 'c >=2'),
+        _core('a', '1', 'c <2'),
+        _core('b', '2', 'c <2'),
+        _core('c', '2'),
+        _core('c', '1'),
+    ]
+    root = _core('top', '1', 'a', 'b')
+    selected = Resolver(cores).resolve([root])
+    assert _versions(selected) == {'top': '1', 'a': '1', 'b': '2', 'c': '1'}
+
+
+def test_conflict():
+    cores = [_core('a', '1', 'c >=2'), _core('b', '1', 'c <2'),
+             _core('c', '1'), _core('c', '2')]
+    with pytest.raises(ResolutionError, match='No version of acme::c'):
+        Resolver(cores).resolve([_core('top', '1', 'a', 'b')])
+
+
+def test_missing_and_ambiguous():
+    cores = [_core('a', '1'), _core('a', '1', vendor='other')]
+    with pytest.raises(ResolutionError, match='No core matches'):
+        Resolver(cores).resolve([_core('top', '1', 'b')])
+    with pytest.raises(ResolutionError, match='ambiguous'):
+        Resolver(cores).resolve([_core('top', '1', 'a')])
+    selected = Resolver(cores).resolve([_core('top', '1', 'other::a')])
+    assert selected[('other', None, 'a')].vlnv.vendor == 'other'
+
+
+def test_order():
+    cores = [_core('a', '1', 'c'), _core('b', '1', 'c'), _core('c', '1')]
+    resolver = Resolver(cores)
+    selected = resolver.resolve([_core('top', '1', 'a', 'b')])
+    ordered = [(core.vlnv.name, [x.vlnv.name for x in requires])
+               for (core, requires) in resolver.order(selected)]
+    assert ordered == [('c', []), ('a', ['c']), ('b', ['c']),
+                       ('top', ['a', 'b'])]
@@ -0,0 +1,122 @@
+import pytest
+
+from fondue.scheduler import Job, JobServer, Scheduler
+
+import os
+import threading
+import time
+
+
+def _job(name, requires=(), log=None, delay=0.0, fail=False):
+    def run(output):
+        if log is not None:
+            log.append(('start', name))
+        output.write(f'{name} 1\n'.encode())
+        time.sleep(delay)
+        output.write(f'{name} 2\n'.encode())
+        if log is not None:
+            log.append(('end', name))
+        if fail:
+            raise RuntimeError(f'{name} broke')
+        return 'built'
+    return Job(name, run, list(requires))
+
+
+def test_order():
+    log = []
+    jobs = [_job('top', ['a', 'b'], log), _job('a', ['c'], log, delay=0.05),
+            _job('b', ['c'], log, delay=0.05), _job('c', [], log)]
+    results = Scheduler(jobs=4).run(jobs)
+    assert [x.status for x in results] == ['built'] * 4
+    assert [x.output for x in results] == [f'{x} 1\n{x} 2\n'
+                                           for x in ('top', 'a', 'b', 'c')]
+    assert log.index(('end', 'c')) < log.index(('start', 'a'))
+    assert log.index(('end', 'b')) < log.index(('start', 'top'))
+    # a and b ran at the same time
+    assert log.index(('start', 'b')) < log.index(('end', 'a'))
+
+
+def test_limit():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def run(output):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+        return 'ok'
+
+    Scheduler(jobs=3).run([Job(str(i), run, []) for i in range(12)])
+    assert max(peak) == 3
+
+
+def test_failure():
+    reported = []
+    jobs = [_job('a', fail=True), _job('b', ['a']), _job('c', ['b']),
+            _job('d', delay=0.05)]
+    scheduler = Scheduler(jobs=1, report=lambda *x: reported.append(x))
+    results = scheduler.run(jobs)
+    assert [x.status for x in results] == ['failed', 'skipped', 'skipped',
+                                           'skipped']
+    assert str(results[0].error) == 'a broke'
+    assert [(x[0].name, x[1], x[2]) for x in reported] == [
+        ('a', 1, 4), ('b', 2, 4), ('c', 3, 4), ('d', 4, 4)]
+
+    results = Scheduler(jobs=1, keep_going=True).run(jobs)
+    assert [x.status for x in results] == ['failed', 'skipped', 'skipped',
+                                           'built']
+
+
+def test_cycle():
+    with pytest.raises(ValueError):
+        Scheduler().run([_job('a', ['b']), _job('b', ['a'])])
+    with pytest.raises(ValueError):
+        Scheduler().run([_job('a', ['x'])])
+
+
+def test_jobserver():
+    (read_fd, write_fd) = os.pipe()
+    # make -j3: two tokens besides our implicit one
+    os.write(write_fd, b'++')
+    jobserver = JobServer.from_environment(
+        {'MAKEFLAGS': f' -j3 --jobserver-auth={read_fd},{write_fd}'})
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def run(output):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+        return 'ok'
+
+    results = Scheduler(jobs=8, jobserver=jobserver).run(
+        [Job(str(i), run, []) for i in range(10)])
+    assert [x.status for x in results] == ['ok'] * 10
+    assert max(peak) == 3
+    # Every token was given back
+    assert os.read(read_fd, 10) == b'++'
+    os.close(read_fd)
+    os.close(write_fd)
+
+    assert JobServer.from_environment({'MAKEFLAGS': '-j4'}) is None
+
+
+def test_jobserver_stolen_token(monkeypatch):
+    (read_fd, write_fd) = os.pipe()
+    jobserver = JobServer.from_environment(
+        {'MAKEFLAGS': f'-j2 --jobserver-auth={read_fd},{write_fd}'})
+    # The descriptors make shares with its other clients are left alone
+    assert os.get_blocking(read_fd)
+    # Another client takes the token between select() and read()
+    monkeypatch.setattr('select.select', lambda r, w, x, t: (r, w, x))
+    assert jobserver.acquire(timeout=1) is None
+    os.close(read_fd)
+    os.close(write_fd)
@@ -0,0 +1,101 @@
+import pytest
+
+import fondue.templates
+
+import json
+import os
+
+
+def _make_tree(root):
+    for path in ['core_init/default/default/name.v.j2',
+                 'core_init/default/sim/name.h.j2',
+                 'core_init/other/default/sub/name.v.j2']:
+        path = root / path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('{{ name }}')
+
+
+def test_index(tmp_path):
+    _make_tree(tmp_path / 'templates')
+    index = fondue.templates.load_index(tmp_path / 'templates',
+                                        tmp_path / 'index.json')
+    assert index == {
+        'core_init/default': {'default': ['name.v.j2'], 'sim': ['name.h.j2']},
+        'core_init/other': {'default': ['sub/name.v.j2']},
+    }
+
+
+def test_index_cache(tmp_path):
+    root = tmp_path / 'templates'
+    cache = tmp_path / 'index.json'
+    _make_tree(root)
+    fondue.templates.load_index(root, cache)
+
+    # Prove the second load comes from the cache by tampering with it
+    cached = json.loads(cache.read_text())
+    cached['index'] = {'cached': {}}
+    cache.write_text(json.dumps(cached))
+    assert fondue.templates.load_index(root, cache) == {'cached': {}}
+
+    # Adding a template changes a directory mtime and invalidates the cache
+    (root / 'core_init/other/default/name.h.j2').write_text('')
+    os.utime(root / 'core_init/other/default', ns=(0, 0))
+    index = fondue.templates.load_index(root, cache)
+    assert index['core_init/other']['default'] == ['name.h.j2',
+                                                   'sub/name.v.j2']
+
+    # So does adding one in a nested directory
+    (root / 'core_init/other/default/sub/name.ffc.j2').write_text('')
+    os.utime(root / 'core_init/other/default/sub', ns=(0, 0))
+    index = fondue.templates.load_index(root, cache)
+    assert index['core_init/other']['default'] == [
+        'name.h.j2', 'sub/name.ffc.j2', 'sub/name.v.j2']
+
+
+def test_list_templates():
+    assert fondue.templates.list_templates('core_init') == ['default',
+                                                            'wb4-slave']
+    assert fondue.templates.list_tools('core_init') == [
+        'verilator', 'verilator-fast']
+    assert fondue.templates.list_templates('nonexistent') == []
+
+
+def test_get_templates():
+    repo = fondue.templates.TemplateRepo('core_init/default')
+    assert sorted(repo.get_templates('default')) == ['name.ffc.j2',
+                                                     'name.v.j2']
+    assert sorted(repo.get_templates('verilator')) == [
+        'name.ffc.j2', 'name.h.j2', 'verilator-main.cpp.j2']
+    assert repo.get_templates('nonexistent') == {}
+
+
+def test_shared_environment():
+    first = fondue.templates.TemplateRepo('core_init/default')
+    second = fondue.templates.TemplateRepo('core_init/default')
+    other = fondue.templates.TemplateRepo('core_init/wb4-slave')
+    assert first._env is second._env
+    assert first._env is not other._env
+
+
+def test_bytecode_cache(cache_dir, monkeypatch):
+    monkeypatch.setattr(fondue.templates, '_environments', {})
+    fondue.templates._bytecode_cache.cache_clear()
+    try:
+        repo = fondue.templates.TemplateRepo('core_init/default')
+        repo.get_templates('default')
+        assert len(os.listdir(cache_dir / 'jinja')) == 2
+    finally:
+        fondue.templates._bytecode_cache.cache_clear()
+
+
+@pytest.mark.parametrize('stream', [True, False])
+def test_render_template(tmp_path, stream):
+    repo = fondue.templates.TemplateRepo('core_init/default')
+    template = repo.get_templates('default')['name.v.j2']
+    path = tmp_path / 'sub' / 'test_core.v'
+    repo.render_template(template, str(path), {'name': 'test_core'},
+                         stream=stream)
+
+    golden = os.path.join(os.path.dirname(__file__), 'core', 'golden.v')
+    with open(golden) as fref:
+        assert path.read_text() == fref.read()
@@ -0,0 +1,109 @@
+import pytest
+
+import fondue.core.index
+import fondue.watch
+
+import os
+
+
+def _write_core(directory, name, files, depends=()):
+    directory.mkdir(parents=True, exist_ok=True)
+    lines = ['vlnv:', f'  name: {name}', 'files:', f'  common: {files}']
+    if depends:
+        lines.append('depends:')
+        lines.extend(f'  - "{x}"' for x in depends)
+    (directory / f'{name}.ffc').write_text('\n'.join(lines) + '\n')
+    for file_name in files.split():
+        (directory / file_name).write_text(f'module {file_name[:-2]}; '
+                                           'endmodule\n')
+    return directory / f'{name}.ffc'
+
+
+@pytest.fixture
+def watch(tmp_path, monkeypatch):
+    library = tmp_path / 'library'
+    _write_core(library / 'fifo', 'fifo', 'fifo.v')
+    monkeypatch.setenv('FONDUE_LIBRARY_PATH', str(library))
+    _write_core(tmp_path / 'project' / 'uart', 'uart', 'uart.v', ['fifo'])
+    with fondue.core.index.CoreIndex() as index:
+        watch = fondue.watch.Watch(index, [str(library)],
+                                   [str(tmp_path / 'project')],
+                                   str(tmp_path / 'out'), ['f'])
+        yield watch
+
+
+def _lines(path):
+    with open(path) as f:
+        return f.read().splitlines()[1:]
+
+
+def test_update(tmp_path, watch):
+    library = tmp_path / 'library'
+    output = str(tmp_path / 'out' / 'uart' / 'uart.f')
+    assert [x.path for x in watch.update()] == [output]
+    assert _lines(output) == [str(library / 'fifo' / 'fifo.v'),
+                              str(tmp_path / 'project' / 'uart' / 'uart.v')]
+
+    # A library core the project uses changes its files
+    fifo = _write_core(library / 'fifo', 'fifo', 'fifo.v ram.v')
+    (written,) = watch.update({str(fifo), str(library / 'fifo' / 'ram.v')})
+    assert written.changed
+    assert str(library / 'fifo' / 'ram.v') in _lines(output)
+    assert [x.vlnv.name for (x, path) in watch.index.providers('ram')] == [
+        'fifo']
+
+    # Unrelated changes, and the file lists themselves, change nothing
+    gpio = _write_core(library / 'gpio', 'gpio', 'gpio.v')
+    assert watch.update({str(gpio), str(library / 'gpio'), output}) == []
+    assert [x.vlnv.name for x in watch.index.cores()] == ['fifo', 'gpio']
+
+    spi = _write_core(tmp_path / 'project' / 'spi', 'spi', 'spi.v')
+    assert [x.path for x in watch.update({str(spi)})] == [
+        str(tmp_path / 'out' / 'spi' / 'spi.f')]
+
+
+def test_update_library_core(tmp_path, watch):
+    library = tmp_path / 'library'
+    out = tmp_path / 'out'
+    _write_core(tmp_path / 'project' / 'spi', 'spi', 'spi.v', ['dma'])
+    assert [x.path for x in watch.update()] == [str(out / 'uart' / 'uart.f')]
+
+    # The missing dependency appears
+    dma = _write_core(library / 'dma', 'dma', 'dma.v')
+    assert [x.path for x in watch.update({str(dma)})] == [
+        str(out / 'spi' / 'spi.f')]
+    assert str(library / 'dma' / 'dma.v') in _lines(out / 'spi' / 'spi.f')
+
+    # A library core which becomes a candidate for a dependency
+    gpio = _write_core(library / 'gpio', 'gpio', 'gpio.v')
+    assert watch.update({str(gpio)}) == []
+    gpio.write_text(gpio.read_text().replace('name: gpio', 'name: fifo'))
+    assert [x.path for x in watch.update({str(gpio)})] == [
+        str(out / 'uart' / 'uart.f')]
+
+
+@pytest.mark.parametrize('poll', [False, True])
+def test_watcher(tmp_path, poll):
+    root = tmp_path / 'root'
+    (root / 'a').mkdir(parents=True)
+    (root / 'a' / 'old.v').write_text('')
+    if poll:
+        watcher = fondue.watch.PollingWatcher([str(root)], interval=0.01)
+    else:
+        watcher = fondue.watch.InotifyWatcher([str(root)])
+    with watcher:
+        assert watcher.read(0) == set()
+        (root / 'a' / 'new.v').write_text('')
+        (root / 'b' / 'c').mkdir(parents=True)
+        (root / 'b' / 'c' / 'x.ffc').write_text('')
+        (root / '.hidden').mkdir()
+        (root / '.hidden' / 'y.ffc').write_text('')
+        os.remove(root / 'a' / 'old.v')
+        changed = watcher.read(1)
+        assert {str(root / 'a' / 'new.v'), str(root / 'b' / 'c' / 'x.ffc'),
+                str(root / 'a' / 'old.v')} <= changed
+        assert not any('y.ffc' in path for path in changed)
+
+        # Changes in new directories are seen too
+        (root / 'b' / 'c' / 'x.ffc').write_text('changed')
+        assert str(root / 'b' / 'c' / 'x.ffc') in watcher.read(1)